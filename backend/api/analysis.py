@@ -1,30 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from supabase import Client
-from database import get_db
+from fastapi.responses import Response, StreamingResponse
+from supabase import AsyncClient
+from database import get_async_db
 from service.analysis_service import AnalysisService
-from schema.analysis import VoiceAnalysisResponse
+from service.analysis_executor import AnalysisQueueFullError, AnalysisTimeoutError
+from service.voice_activity import InsufficientVoiceError
+from service.result_cache import get_result_cache
+from service.audio_ingest import AudioPayload, UploadTooLargeError, read_upload
+from service.analysis_jobs import get_analysis_job_queue, JobQueueFullError, JOB_FINISHED_STATES
+from service.metrics import get_metrics
+from schema.analysis import VoiceAnalysisResponse, AnalysisJobResponse
 from api.auth import get_current_user_id
 from config import get_settings
 import logging
-import tempfile
 import os
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/analysis", tags=["声音分析"])
 
 
-@router.post("/analyze", response_model=VoiceAnalysisResponse, status_code=status.HTTP_201_CREATED)
-async def analyze_voice(
-    audio_file: UploadFile = File(..., description="音频文件"),
-    user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_db)
-):
+async def _receive_upload(audio_file: UploadFile, spool_to_disk: bool = False) -> AudioPayload:
     """
-    上传音频文件并进行声音分析
+    校验并流式接收上传的音频文件
+    
+    Args:
+        spool_to_disk: 是否强制写入临时文件 (异步任务需要可持久化的音频路径)
+    
+    Returns:
+        AudioPayload,调用方负责 cleanup()
+        
+    Raises:
+        HTTPException: 格式不支持或文件过大
     """
     settings = get_settings()
-    analysis_service = AnalysisService(db)
     
     # 1. 验证文件格式
     file_ext = os.path.splitext(audio_file.filename)[1].lower()
@@ -34,39 +44,63 @@ async def analyze_voice(
             detail=f"不支持的音频格式，仅支持: {', '.join(settings.allowed_audio_formats)}"
         )
     
-    # 2. 验证文件大小
-    audio_file.file.seek(0, 2)  # 移动到文件末尾
-    file_size = audio_file.file.tell()  # 获取文件大小
-    audio_file.file.seek(0)  # 重置到文件开头
-    
-    max_size_bytes = settings.max_audio_size_mb * 1024 * 1024
-    if file_size > max_size_bytes:
+    # 2. 分块读取,超过大小限制立即中止 (同时计算内容哈希)
+    try:
+        return await read_upload(
+            audio_file,
+            max_bytes=settings.max_audio_size_mb * 1024 * 1024,
+            spool_to_disk=spool_to_disk
+        )
+    except UploadTooLargeError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"文件过大，最大支持 {settings.max_audio_size_mb}MB"
         )
+
+
+@router.post("/analyze", response_model=VoiceAnalysisResponse, status_code=status.HTTP_201_CREATED)
+async def analyze_voice(
+    audio_file: UploadFile = File(..., description="音频文件"),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncClient = Depends(get_async_db)
+):
+    """
+    上传音频文件并进行声音分析
+    """
+    analysis_service = AnalysisService(db)
     
-    # 3. 保存临时文件
-    temp_file = None
+    payload = await _receive_upload(audio_file)
     try:
-        # 创建临时文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-            # 写入上传的音频数据
-            content = await audio_file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        
-        logger.info(f"临时文件已保存: {temp_file_path}")
-        
-        # 4. 执行分析
+        # 3. 执行分析 (wav 等格式直接从内存解码,相同内容命中结果缓存)
         result = await analysis_service.analyze_voice(
             user_id=user_id,
-            audio_file_path=temp_file_path,
+            audio=payload,
             audio_filename=audio_file.filename
         )
         
-        return result
+        # 直接序列化一次并计时 (返回 Response 时 FastAPI 不再按 response_model 重复序列化)
+        with get_metrics().span('response_serialization'):
+            body = result.model_dump_json()
+        return Response(content=body, media_type="application/json", status_code=status.HTTP_201_CREATED)
         
+    except AnalysisQueueFullError as e:
+        logger.warning(f"分析队列已满: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="服务器繁忙，请稍后重试"
+        )
+    except InsufficientVoiceError as e:
+        logger.info(f"录音中有效人声过少: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="录音中未检测到足够的人声，请靠近麦克风重新录制"
+        )
+    except AnalysisTimeoutError as e:
+        logger.error(f"音频分析超时: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="音频分析超时，请缩短录音后重试"
+        )
     except Exception as e:
         logger.error(f"音频分析失败: {str(e)}")
         raise HTTPException(
@@ -75,23 +109,116 @@ async def analyze_voice(
         )
     
     finally:
-        # 5. 清理临时文件
-        if temp_file and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.info(f"临时文件已删除: {temp_file_path}")
-            except Exception as e:
-                logger.warning(f"删除临时文件失败: {str(e)}")
+        # 4. 清理临时文件 (仅需要落盘解码的格式)
+        payload.cleanup()
+
+
+# ==================== 异步任务模式 ====================
+
+def _to_job_response(job: dict) -> AnalysisJobResponse:
+    """任务记录 -> 响应模型"""
+    return AnalysisJobResponse(
+        job_id=job['id'],
+        status=job['status'],
+        result=job.get('result'),
+        error=job.get('error'),
+        created_at=datetime.fromtimestamp(job['created_at']),
+        updated_at=datetime.fromtimestamp(job['updated_at'])
+    )
+
+
+def _get_user_job(job_id: str, user_id: str) -> dict:
+    """获取当前用户的任务,不存在或不属于该用户时返回 404"""
+    job = get_analysis_job_queue().get(job_id)
+    if not job or job['user_id'] != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="分析任务不存在"
+        )
+    return job
+
+
+@router.post("/jobs", response_model=AnalysisJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_analysis_job(
+    audio_file: UploadFile = File(..., description="音频文件"),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    提交异步分析任务
+    立即返回 job_id,通过 GET /jobs/{job_id} 轮询或 GET /jobs/{job_id}/events 订阅结果
+    """
+    payload = await _receive_upload(audio_file, spool_to_disk=True)
+    try:
+        job = get_analysis_job_queue().submit(user_id, payload.path, audio_file.filename)
+    except BaseException as e:
+        # 任务未入队 (队列已满 / 未启动等),临时文件不会被 worker 清理
+        payload.cleanup()
+        if not isinstance(e, JobQueueFullError):
+            raise
+        logger.warning(f"分析任务队列已满: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="服务器繁忙，请稍后重试",
+            headers={"Retry-After": "5"}
+        )
+    return _to_job_response(job)
+
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job(job_id: str, user_id: str = Depends(get_current_user_id)):
+    """
+    查询异步分析任务状态和结果
+    """
+    return _to_job_response(_get_user_job(job_id, user_id))
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_analysis_job(job_id: str, user_id: str = Depends(get_current_user_id)):
+    """
+    以 SSE 推送异步分析任务状态,任务结束 (succeeded / failed) 后关闭连接
+    """
+    _get_user_job(job_id, user_id)
+    job_queue = get_analysis_job_queue()
+    
+    async def event_stream():
+        last_status = None
+        while True:
+            job = job_queue.get(job_id)
+            if not job:
+                return
+            if job['status'] != last_status:
+                last_status = job['status']
+                payload = _to_job_response(job).model_dump_json()
+                yield f"event: {last_status}\ndata: {payload}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if last_status in JOB_FINISHED_STATES:
+                return
+            await job_queue.wait_for_change(job_id, timeout=5)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/cache/stats")
+async def get_result_cache_stats(user_id: str = Depends(get_current_user_id)):
+    """
+    分析结果缓存命中统计
+    """
+    return get_result_cache().stats()
 
 
 @router.get("/{analysis_id}", response_model=VoiceAnalysisResponse)
-async def get_analysis(analysis_id: str, db: Client = Depends(get_db)):
+async def get_analysis(analysis_id: str, db: AsyncClient = Depends(get_async_db)):
     """
     获取分析结果
     """
     analysis_service = AnalysisService(db)
     
-    result = analysis_service.get_analysis_by_id(analysis_id)
+    result = await analysis_service.get_analysis_by_id(analysis_id)
     if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -105,7 +232,7 @@ async def get_analysis(analysis_id: str, db: Client = Depends(get_db)):
 async def get_user_analysis_history(
     user_id: str,
     limit: int = 10,
-    db: Client = Depends(get_db)
+    db: AsyncClient = Depends(get_async_db)
 ):
     """
     获取用户的分析历史
@@ -113,7 +240,7 @@ async def get_user_analysis_history(
     analysis_service = AnalysisService(db)
     
     try:
-        history = analysis_service.get_user_analysis_history(user_id, limit)
+        history = await analysis_service.get_user_analysis_history(user_id, limit)
         return history
     except Exception as e:
         logger.error(f"获取分析历史失败: {str(e)}")
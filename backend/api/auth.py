@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel  # ✅ 新增：用于接收前端请求体
 from config import get_settings
-from supabase import create_client, Client
+from supabase import acreate_client, AsyncClient
 
 # ✅ 关键修改：添加 prefix="/api/auth"，确保路由地址正确
 # 这样前端请求 /api/auth/create-profile 时才能找到这个文件里的接口
@@ -139,13 +139,13 @@ async def update_password(request: UpdatePasswordRequest):
         settings = get_settings()
         
         # NOTE: 使用 service_role_key 创建 Admin 客户端
-        admin_client: Client = create_client(
+        admin_client: AsyncClient = await acreate_client(
             settings.supabase_url,
             settings.supabase_service_role_key  # 使用 service_role key
         )
         
         # 调用 Admin API 更新用户密码
-        response = admin_client.auth.admin.update_user_by_id(
+        response = await admin_client.auth.admin.update_user_by_id(
             user_id,
             {"password": request.new_password}
         )
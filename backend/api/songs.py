@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import Client
-from database import get_db
+from supabase import AsyncClient
+from database import get_async_db
 from service.song_service import SongService
 from schema.song import SongResponse, FavoriteToggleRequest, FavoriteToggleResponse
+from service.song_catalog import get_song_catalog
 from api.auth import get_current_user_id
 import logging
 
@@ -12,14 +13,14 @@ router = APIRouter(prefix="/api/songs", tags=["歌曲"])
 
 
 @router.get("", response_model=list[SongResponse])
-async def get_all_songs(limit: int = 100, db: Client = Depends(get_db)):
+async def get_all_songs(limit: int = 100, db: AsyncClient = Depends(get_async_db)):
     """
     获取所有歌曲
     """
     song_service = SongService(db)
     
     try:
-        songs = song_service.get_all_songs(limit)
+        songs = await song_service.get_all_songs(limit)
         return songs
     except Exception as e:
         logger.error(f"获取歌曲列表失败: {str(e)}")
@@ -29,8 +30,19 @@ async def get_all_songs(limit: int = 100, db: Client = Depends(get_db)):
         )
 
 
+@router.post("/catalog/invalidate")
+async def invalidate_song_catalog(user_id: str = Depends(get_current_user_id)):
+    """
+    使内存歌曲目录索引失效
+    导入歌曲或更新特征向量后调用,下一次分析请求会重新加载
+    """
+    catalog = get_song_catalog()
+    catalog.invalidate()
+    return catalog.stats()
+
+
 @router.get("/recommended/{analysis_id}", response_model=list[SongResponse])
-async def get_recommended_songs(analysis_id: str, db: Client = Depends(get_db)):
+async def get_recommended_songs(analysis_id: str, db: AsyncClient = Depends(get_async_db)):
     """
     基于分析结果推荐歌曲
     """
@@ -40,7 +52,7 @@ async def get_recommended_songs(analysis_id: str, db: Client = Depends(get_db)):
     song_service = SongService(db)
     
     # 获取分析结果
-    analysis = analysis_service.get_analysis_by_id(analysis_id)
+    analysis = await analysis_service.get_analysis_by_id(analysis_id)
     if not analysis:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -49,7 +61,7 @@ async def get_recommended_songs(analysis_id: str, db: Client = Depends(get_db)):
     
     # 基于匹配歌手推荐歌曲
     try:
-        songs = song_service.get_recommended_songs(
+        songs = await song_service.get_recommended_songs(
             singer_id=analysis.matched_singer.id,
             analysis_score=analysis.score
         )
@@ -66,7 +78,7 @@ async def get_recommended_songs(analysis_id: str, db: Client = Depends(get_db)):
 async def toggle_favorite(
     request: FavoriteToggleRequest,
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_db)
+    db: AsyncClient = Depends(get_async_db)
 ):
     """
     切换收藏状态（添加或删除收藏）
@@ -74,7 +86,7 @@ async def toggle_favorite(
     song_service = SongService(db)
     
     try:
-        result = song_service.toggle_favorite(user_id, request.song_id)
+        result = await song_service.toggle_favorite(user_id, request.song_id)
         return result
     except Exception as e:
         logger.error(f"切换收藏失败: {str(e)}")
@@ -87,7 +99,7 @@ async def toggle_favorite(
 @router.get("/favorites", response_model=list[SongResponse])
 async def get_user_favorites(
     user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_db)
+    db: AsyncClient = Depends(get_async_db)
 ):
     """
     获取用户的收藏列表
@@ -95,7 +107,7 @@ async def get_user_favorites(
     song_service = SongService(db)
     
     try:
-        favorites = song_service.get_user_favorites(user_id)
+        favorites = await song_service.get_user_favorites(user_id)
         return favorites
     except Exception as e:
         logger.error(f"获取收藏列表失败: {str(e)}")
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import Client
-from database import get_db
+from supabase import AsyncClient
+from database import get_async_db
 from service.user_service import UserService
 from schema.user import UserResponse, UserUpdate, UserStats
 from api.auth import get_current_user_id
@@ -12,13 +12,13 @@ router = APIRouter(prefix="/api/users", tags=["用户"])
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: str, db: Client = Depends(get_db)):
+async def get_user(user_id: str, db: AsyncClient = Depends(get_async_db)):
     """
     获取用户信息
     """
     user_service = UserService(db)
     
-    user = user_service.get_user_by_auth_id(user_id)
+    user = await user_service.get_user_by_auth_id(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -33,7 +33,7 @@ async def update_user(
     user_id: str,
     user_update: UserUpdate,
     current_user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_db)
+    db: AsyncClient = Depends(get_async_db)
 ):
     """
     更新用户信息
@@ -48,7 +48,7 @@ async def update_user(
     user_service = UserService(db)
     
     try:
-        updated_user = user_service.update_user(user_id, user_update)
+        updated_user = await user_service.update_user(user_id, user_update)
         return updated_user
     except ValueError as e:
         raise HTTPException(
@@ -68,7 +68,7 @@ async def update_avatar(
     user_id: str,
     avatar_url: str,
     current_user_id: str = Depends(get_current_user_id),
-    db: Client = Depends(get_db)
+    db: AsyncClient = Depends(get_async_db)
 ):
     """
     更新用户头像
@@ -82,7 +82,7 @@ async def update_avatar(
     user_service = UserService(db)
     
     try:
-        updated_user = user_service.update_avatar(user_id, avatar_url)
+        updated_user = await user_service.update_avatar(user_id, avatar_url)
         return updated_user
     except Exception as e:
         logger.error(f"更新头像失败: {str(e)}")
@@ -93,14 +93,14 @@ async def update_avatar(
 
 
 @router.get("/{user_id}/stats", response_model=UserStats)
-async def get_user_stats(user_id: str, db: Client = Depends(get_db)):
+async def get_user_stats(user_id: str, db: AsyncClient = Depends(get_async_db)):
     """
     获取用户统计信息
     """
     user_service = UserService(db)
     
     try:
-        stats = user_service.get_user_stats(user_id)
+        stats = await user_service.get_user_stats(user_id)
         return stats
     except ValueError as e:
         raise HTTPException(
@@ -13,6 +13,11 @@ class Settings(BaseSettings):
     supabase_jwt_secret: str
     supabase_service_role_key: str  # NOTE: Admin API 专用 key，用于后端操作
     
+    # Supabase 异步客户端连接池配置 (API 路由使用)
+    db_timeout_s: float = 60.0
+    db_max_connections: int = 50
+    db_max_keepalive_connections: int = 20
+    
     # API 配置
     api_host: str = "0.0.0.0"
     api_port: int = 8000
@@ -25,6 +30,40 @@ class Settings(BaseSettings):
     # Supabase Storage 配置
     audio_bucket_name: str = "voice-analyses"
     
+    # 分析执行器配置
+    # NOTE: process = 预热进程池 (生产), thread = 进程内线程池 (测试/调试)
+    analysis_executor_mode: str = "process"
+    analysis_workers: int = 2
+    analysis_max_pending: int = 8  # 排队 + 执行中的任务上限,超出返回 429
+    analysis_task_timeout_s: float = 60.0
+    analysis_worker_max_tasks: int = 200  # worker 执行 N 个任务后回收,0 表示不回收
+    
+    # 异步分析任务队列配置
+    analysis_job_backend: str = "memory"  # memory | sqlite
+    analysis_job_db_path: str = "data/analysis_jobs.sqlite3"
+    analysis_job_concurrency: int = 2
+    analysis_job_max_queue: int = 32  # 等待中的任务上限,超出返回 429
+    analysis_job_ttl_s: float = 3600  # 已完成任务保留时长
+    
+    # 分析结果缓存配置 (按音频内容哈希)
+    result_cache_max_entries: int = 512
+    result_cache_dir: str = ""  # 为空时只使用内存缓存,例如 "data/result_cache"
+    result_cache_disk_max_mb: int = 256
+    
+    # 用户统计缓存配置
+    user_stats_cache_ttl_s: float = 60  # 写入时按用户失效,TTL 兜底
+    
+    # 本地头像查找表配置
+    avatar_poll_interval_s: float = 5.0  # 检查 static/avatars 修改时间的最短间隔
+    
+    # 歌曲目录索引配置
+    song_catalog_ttl_s: float = 300  # 内存索引自动刷新间隔
+    
+    # 近似最近邻 (IVF) 索引配置
+    ann_index_path: str = "data/song_ann_index.npz"  # 由 scripts/extract_features.py 增量维护,为空则禁用
+    ann_min_catalog_size: int = 5000  # 目录规模达到该值后才启用近似检索
+    ann_nprobe: int = 8  # 扫描的倒排列表数,越大召回越高、延迟越高
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,5 +1,7 @@
-from supabase import create_client, Client, ClientOptions
+from supabase import create_client, acreate_client, Client, AsyncClient, ClientOptions, AsyncClientOptions
 from config import get_settings
+import asyncio
+import httpx
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,8 +12,15 @@ class Database:
     数据库连接管理类 (网络增强版)
     封装 Supabase 客户端的创建和管理
     NOTE: 已强制增加 60秒 超时配置，防止网络波动导致的连接失败
+    
+    - 同步客户端: 离线脚本使用
+    - 异步客户端: API 路由使用,基于连接池化的 httpx.AsyncClient,
+      慢查询只挂起当前请求,不会阻塞事件循环
     """
     _client: Client | None = None
+    _async_client: AsyncClient | None = None
+    _http_client: httpx.AsyncClient | None = None
+    _async_lock: asyncio.Lock | None = None
     
     @classmethod
     def get_client(cls) -> Client:
@@ -38,6 +47,43 @@ class Database:
             logger.info("Supabase 客户端初始化成功 (已启用 60s 超时保护)")
         return cls._client
     
+    @classmethod
+    async def get_async_client(cls) -> AsyncClient:
+        """
+        获取 Supabase 异步客户端单例
+        
+        Returns:
+            Supabase 异步客户端实例 (所有请求共享同一个 HTTP 连接池)
+        """
+        if cls._async_client is not None:
+            return cls._async_client
+        if cls._async_lock is None:
+            cls._async_lock = asyncio.Lock()
+        async with cls._async_lock:
+            if cls._async_client is None:
+                settings = get_settings()
+                cls._http_client = httpx.AsyncClient(
+                    timeout=settings.db_timeout_s,
+                    limits=httpx.Limits(
+                        max_connections=settings.db_max_connections,
+                        max_keepalive_connections=settings.db_max_keepalive_connections
+                    ),
+                    follow_redirects=True
+                )
+                cls._async_client = await acreate_client(
+                    supabase_url=settings.supabase_url,
+                    supabase_key=settings.supabase_key,
+                    options=AsyncClientOptions(
+                        httpx_client=cls._http_client,
+                        storage_client_timeout=int(settings.db_timeout_s)
+                    )
+                )
+                logger.info(
+                    f"Supabase 异步客户端初始化成功 (连接池上限={settings.db_max_connections}, "
+                    f"超时={settings.db_timeout_s}s)"
+                )
+        return cls._async_client
+    
     @classmethod
     def close(cls):
         """
@@ -46,13 +92,33 @@ class Database:
         """
         cls._client = None
         logger.info("Supabase 客户端已重置")
+    
+    @classmethod
+    async def aclose(cls):
+        """关闭异步客户端的 HTTP 连接池 (应用关闭时调用)"""
+        if cls._http_client is not None:
+            await cls._http_client.aclose()
+        cls._http_client = None
+        cls._async_client = None
+        cls._async_lock = None
+        logger.info("Supabase 异步客户端已关闭")
 
 
 def get_db() -> Client:
     """
-    依赖注入函数，用于 FastAPI 路由
+    获取同步客户端 (离线脚本使用)
     
     Returns:
         Supabase 客户端实例
     """
-    return Database.get_client()
\ No newline at end of file
+    return Database.get_client()
+
+
+async def get_async_db() -> AsyncClient:
+    """
+    依赖注入函数，用于 FastAPI 路由
+    
+    Returns:
+        Supabase 异步客户端实例
+    """
+    return await Database.get_async_client()
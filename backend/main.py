@@ -1,8 +1,15 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles  # ✅ 新增：必须导入这个模块
 from fastapi.middleware.cors import CORSMiddleware
 from api import auth, users, analysis, songs
 from config import get_settings
+from service.analysis_executor import get_analysis_executor
+from service.analysis_jobs import get_analysis_job_queue
+from service.avatar_resolver import get_avatar_resolver
+from service.metrics import get_metrics
+from database import Database
+from contextlib import asynccontextmanager
 import logging
 
 # 配置日志
@@ -13,11 +20,32 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    应用生命周期
+    启动时预热分析执行器 (导入 librosa + numba 编译)、扫描头像目录并启动异步任务队列,
+    关闭时依次停止,并关闭 Supabase 异步客户端的连接池
+    """
+    executor = get_analysis_executor()
+    executor.start()
+    get_avatar_resolver().refresh(force=True)
+    job_queue = get_analysis_job_queue()
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    executor.shutdown()
+    await Database.aclose()
+
+
 # 创建 FastAPI 应用
 app = FastAPI(
     title="声音分析 API",
     description="基于 librosa 的声音分析和歌手匹配系统",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 配置 CORS - 开发环境允许所有来源
@@ -66,6 +94,17 @@ async def health_check():
     return {"status": "healthy"}
 
 
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    分析流水线各阶段耗时直方图 (Prometheus 文本格式)
+    """
+    return PlainTextResponse(
+        get_metrics().render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 if __name__ == "__main__":
     import uvicorn
     
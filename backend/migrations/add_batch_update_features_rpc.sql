@@ -0,0 +1,30 @@
+-- ========================================
+-- 批量更新特征向量 RPC 迁移脚本
+-- 功能：scripts/extract_features.py 并行模式一次请求写入一批歌曲的 feature_vector
+-- 调用：supabase.rpc('update_song_features', {'updates': [{"id": ..., "feature_vector": [...]}, ...]})
+-- 返回：实际更新的行数
+-- ========================================
+
+CREATE OR REPLACE FUNCTION update_song_features(updates JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated_count INTEGER;
+BEGIN
+    UPDATE songs AS s
+    SET feature_vector = u.feature_vector
+    FROM jsonb_to_recordset(updates) AS u(id UUID, feature_vector JSONB)
+    WHERE s.id = u.id;
+
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+    RETURN updated_count;
+END;
+$$;
+
+-- 验证
+-- SELECT update_song_features('[{"id": "<song-uuid>", "feature_vector": [0.1, 0.2]}]'::JSONB);
+
+-- ========================================
+-- 执行完成
+-- ========================================
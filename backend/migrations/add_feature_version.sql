@@ -0,0 +1,55 @@
+-- ========================================
+-- 特征向量版本迁移脚本
+-- 功能：songs 表记录 feature_vector 的提取版本 (见 service/feature_schema.py)，
+--       相似度检索只比较同一版本的向量，旧版本向量由 scripts/extract_features.py 重新提取升级
+-- 版本：1 = 13 维 MFCC 均值 (历史离线脚本)
+--       2 = 60 维 MFCC + Delta + Delta-Delta 均值
+-- NOTE: 需在 add_batch_update_features_rpc.sql 之后执行（本脚本会替换 update_song_features）
+-- ========================================
+
+-- 1. 添加版本字段
+ALTER TABLE songs
+ADD COLUMN IF NOT EXISTS feature_version SMALLINT;
+
+COMMENT ON COLUMN songs.feature_version IS '特征向量版本 (service/feature_schema.py FEATURE_SPECS)，NULL 表示按向量维度推断';
+COMMENT ON COLUMN songs.feature_vector IS 'MFCC声学特征向量，维度由 feature_version 决定 (v1=13维, v2=60维)，用于余弦相似度匹配';
+
+-- 2. 按维度回填已有向量的版本
+UPDATE songs
+SET feature_version = CASE jsonb_array_length(feature_vector)
+    WHEN 13 THEN 1
+    WHEN 60 THEN 2
+END
+WHERE feature_vector IS NOT NULL
+  AND jsonb_typeof(feature_vector) = 'array'
+  AND feature_version IS NULL;
+
+-- 3. 离线升级任务按版本筛选待升级的歌曲
+CREATE INDEX IF NOT EXISTS idx_songs_feature_version ON songs (feature_version);
+
+-- 4. 批量写入函数同时写入版本号
+CREATE OR REPLACE FUNCTION update_song_features(updates JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated_count INTEGER;
+BEGIN
+    UPDATE songs AS s
+    SET feature_vector = u.feature_vector,
+        feature_version = u.feature_version
+    FROM jsonb_to_recordset(updates) AS u(id UUID, feature_vector JSONB, feature_version SMALLINT)
+    WHERE s.id = u.id;
+
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+    RETURN updated_count;
+END;
+$$;
+
+-- 5. 验证
+-- 查看各版本的歌曲数量
+-- SELECT feature_version, COUNT(*) FROM songs WHERE feature_vector IS NOT NULL GROUP BY feature_version;
+
+-- ========================================
+-- 执行完成
+-- ========================================
@@ -0,0 +1,30 @@
+-- ========================================
+-- 歌曲 (title, artist) 唯一约束迁移脚本
+-- 功能：scripts/import_songs.py 的批量模式使用 upsert(on_conflict='title,artist')，
+--       需要 (title, artist) 上存在唯一约束
+-- ========================================
+
+-- 1. 先检查是否存在重复歌曲（存在时第 2 步会失败）
+-- 取消下面的注释查看重复项，确认后手动合并/删除
+-- NOTE: 直接删除重复行会级联删除 user_favorites 中对应的收藏
+-- SELECT title, artist, COUNT(*), array_agg(id ORDER BY created_at) AS ids
+-- FROM songs
+-- GROUP BY title, artist
+-- HAVING COUNT(*) > 1;
+
+-- 2. 添加唯一约束
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'songs'::regclass
+          AND conname = 'songs_title_artist_key'
+    ) THEN
+        ALTER TABLE songs
+        ADD CONSTRAINT songs_title_artist_key UNIQUE (title, artist);
+    END IF;
+END $$;
+
+-- ========================================
+-- 执行完成
+-- ========================================
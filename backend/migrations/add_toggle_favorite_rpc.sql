@@ -0,0 +1,57 @@
+-- ========================================
+-- 收藏切换 RPC 迁移脚本
+-- 功能：一次往返完成 "检查歌曲 -> 检查收藏 -> 添加/删除收藏"
+-- 调用：supabase.rpc('toggle_favorite', {'p_user_id': ..., 'p_song_id': ...})
+-- 返回：{"song_exists": bool, "is_favorited": bool}
+-- ========================================
+
+-- 1. 确保 (user_id, song_id) 唯一（init_database.sql 已创建，此处兼容旧库）
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'user_favorites'::regclass
+          AND contype = 'u'
+          AND conname = 'user_favorites_user_id_song_id_key'
+    ) THEN
+        ALTER TABLE user_favorites
+        ADD CONSTRAINT user_favorites_user_id_song_id_key UNIQUE (user_id, song_id);
+    END IF;
+END $$;
+
+-- 2. 切换函数
+-- 同一用户对同一首歌的并发切换用事务级 advisory lock 串行化，
+-- 连续两次点击的结果一定是 "收藏 -> 取消"，不会出现两次都插入/都删除
+CREATE OR REPLACE FUNCTION toggle_favorite(p_user_id UUID, p_song_id UUID)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM songs WHERE id = p_song_id) THEN
+        RETURN jsonb_build_object('song_exists', FALSE, 'is_favorited', FALSE);
+    END IF;
+
+    PERFORM pg_advisory_xact_lock(hashtext(p_user_id::TEXT || ':' || p_song_id::TEXT));
+
+    -- 已收藏则删除
+    DELETE FROM user_favorites
+    WHERE user_id = p_user_id AND song_id = p_song_id;
+    IF FOUND THEN
+        RETURN jsonb_build_object('song_exists', TRUE, 'is_favorited', FALSE);
+    END IF;
+
+    -- 未收藏则添加
+    INSERT INTO user_favorites (user_id, song_id)
+    VALUES (p_user_id, p_song_id)
+    ON CONFLICT (user_id, song_id) DO NOTHING;
+    RETURN jsonb_build_object('song_exists', TRUE, 'is_favorited', TRUE);
+END;
+$$;
+
+-- 3. 验证
+-- 取消下面的注释，连续执行两次应依次返回 is_favorited = true / false
+-- SELECT toggle_favorite('<user-uuid>', '<song-uuid>');
+
+-- ========================================
+-- 执行完成
+-- ========================================
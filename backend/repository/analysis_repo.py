@@ -1,4 +1,4 @@
-from supabase import Client
+from supabase import AsyncClient
 from typing import Any
 import logging
 
@@ -11,10 +11,10 @@ class AnalysisRepository:
     负责所有与声音分析记录相关的数据库操作
     """
     
-    def __init__(self, db: Client):
+    def __init__(self, db: AsyncClient):
         self.db = db
     
-    def create(self, analysis_data: dict[str, Any]) -> dict[str, Any]:
+    async def create(self, analysis_data: dict[str, Any]) -> dict[str, Any]:
         """
         创建声音分析记录
         
@@ -24,11 +24,11 @@ class AnalysisRepository:
         Returns:
             创建的分析记录
         """
-        response = self.db.table('voice_analyses').insert(analysis_data).execute()
+        response = await self.db.table('voice_analyses').insert(analysis_data).execute()
         logger.info(f"创建分析记录成功 user_id={analysis_data.get('user_id')}")
         return response.data[0]
     
-    def get_by_id(self, analysis_id: str) -> dict[str, Any] | None:
+    async def get_by_id(self, analysis_id: str) -> dict[str, Any] | None:
         """
         根据ID获取分析记录
         
@@ -40,7 +40,7 @@ class AnalysisRepository:
         """
         try:
             # 联表查询，获取匹配歌手信息
-            response = (
+            response = await (
                 self.db.table('voice_analyses')
                 .select('*, matched_singers(*)')
                 .eq('id', analysis_id)
@@ -52,7 +52,7 @@ class AnalysisRepository:
             logger.error(f"获取分析记录失败 analysis_id={analysis_id}: {str(e)}")
             return None
     
-    def get_user_analyses(self, user_id: str, limit: int = 10) -> list[dict[str, Any]]:
+    async def get_user_analyses(self, user_id: str, limit: int = 10) -> list[dict[str, Any]]:
         """
         获取用户的分析历史
         
@@ -64,7 +64,7 @@ class AnalysisRepository:
             分析记录列表
         """
         try:
-            response = (
+            response = await (
                 self.db.table('voice_analyses')
                 .select('*, matched_singers(*)')
                 .eq('user_id', user_id)
@@ -84,10 +84,10 @@ class SingerRepository:
     负责所有与匹配歌手相关的数据库操作
     """
     
-    def __init__(self, db: Client):
+    def __init__(self, db: AsyncClient):
         self.db = db
     
-    def get_by_id(self, singer_id: str) -> dict[str, Any] | None:
+    async def get_by_id(self, singer_id: str) -> dict[str, Any] | None:
         """
         根据ID获取歌手信息
         
@@ -98,13 +98,13 @@ class SingerRepository:
             歌手数据，如果不存在返回None
         """
         try:
-            response = self.db.table('matched_singers').select('*').eq('id', singer_id).single().execute()
+            response = await self.db.table('matched_singers').select('*').eq('id', singer_id).single().execute()
             return response.data if response.data else None
         except Exception as e:
             logger.error(f"获取歌手信息失败 singer_id={singer_id}: {str(e)}")
             return None
     
-    def get_all(self) -> list[dict[str, Any]]:
+    async def get_all(self) -> list[dict[str, Any]]:
         """
         获取所有歌手
         
@@ -112,13 +112,13 @@ class SingerRepository:
             歌手列表
         """
         try:
-            response = self.db.table('matched_singers').select('*').execute()
+            response = await self.db.table('matched_singers').select('*').execute()
             return response.data if response.data else []
         except Exception as e:
             logger.error(f"获取所有歌手失败: {str(e)}")
             return []
     
-    def create(self, singer_data: dict[str, Any]) -> dict[str, Any]:
+    async def create(self, singer_data: dict[str, Any]) -> dict[str, Any]:
         """
         创建歌手记录
         
@@ -128,6 +128,6 @@ class SingerRepository:
         Returns:
             创建的歌手数据
         """
-        response = self.db.table('matched_singers').insert(singer_data).execute()
+        response = await self.db.table('matched_singers').insert(singer_data).execute()
         logger.info(f"创建歌手成功 name={singer_data.get('name')}")
         return response.data[0]
@@ -1,4 +1,5 @@
-from supabase import Client
+from supabase import AsyncClient
+from postgrest.exceptions import APIError
 from typing import Any
 import logging
 
@@ -11,57 +12,79 @@ class SongRepository:
     负责所有与歌曲相关的数据库操作
     """
     
-    def __init__(self, db: Client):
+    def __init__(self, db: AsyncClient):
         self.db = db
     
-    def get_by_id(self, song_id: str) -> dict[str, Any] | None:
+    async def get_by_id(self, song_id: str) -> dict[str, Any] | None:
         """根据ID获取歌曲信息"""
         try:
             # ✅ 优化：使用 maybe_single()，如果找不到返回 None 而不是报错
-            response = self.db.table('songs').select('*').eq('id', song_id).maybe_single().execute()
+            response = await self.db.table('songs').select('*').eq('id', song_id).maybe_single().execute()
             return response.data
         except Exception as e:
             logger.error(f"获取歌曲失败 song_id={song_id}: {str(e)}")
             return None
     
-    def get_all(self, limit: int = 100) -> list[dict[str, Any]]:
+    async def get_all(self, limit: int = 100) -> list[dict[str, Any]]:
         """获取所有歌曲"""
         try:
-            response = self.db.table('songs').select('*').limit(limit).execute()
+            response = await self.db.table('songs').select('*').limit(limit).execute()
             return response.data if response.data else []
         except Exception as e:
             logger.error(f"获取所有歌曲失败: {str(e)}")
             return []
     
-    def get_by_singer(self, singer_id: str) -> list[dict[str, Any]]:
+    async def get_by_singer(self, singer_id: str) -> list[dict[str, Any]]:
         """根据歌手ID获取歌曲列表"""
         try:
-            response = self.db.table('songs').select('*').eq('singer_id', singer_id).execute()
+            response = await self.db.table('songs').select('*').eq('singer_id', singer_id).execute()
             return response.data if response.data else []
         except Exception as e:
             logger.error(f"根据歌手获取歌曲失败 singer_id={singer_id}: {str(e)}")
             return []
     
-    def create(self, song_data: dict[str, Any]) -> dict[str, Any]:
+    async def create(self, song_data: dict[str, Any]) -> dict[str, Any]:
         """创建歌曲记录"""
         try:
-            response = self.db.table('songs').insert(song_data).execute()
+            response = await self.db.table('songs').insert(song_data).execute()
             logger.info(f"创建歌曲成功 title={song_data.get('title')}")
             return response.data[0] if response.data else {}
         except Exception as e:
             logger.error(f"创建歌曲失败: {e}")
             return {}
     
-    def get_all_with_features(self) -> list[dict[str, Any]]:
+    # songs.feature_version 列不存在 (未执行迁移) 时的错误码
+    COLUMN_NOT_FOUND_CODES = ('42703', 'PGRST204')
+    _feature_version_available = True
+    
+    async def get_all_with_features(self) -> list[dict[str, Any]]:
         """
         获取所有包含特征向量的歌曲
         用于声学特征匹配
+        
+        NOTE: 同时返回 feature_version (向量版本)，未执行 add_feature_version.sql 时
+              不返回该字段，由调用方按向量维度推断版本
         """
+        columns = 'id, title, artist, album, cover_url, tag, tag_label, feature_vector'
         try:
-            response = (
+            if SongRepository._feature_version_available:
+                try:
+                    response = await (
+                        self.db.table('songs')
+                        .select(f'{columns}, feature_version')
+                        .not_.is_('feature_vector', 'null')  # 仅返回有特征向量的歌曲
+                        .execute()
+                    )
+                    return response.data if response.data else []
+                except APIError as e:
+                    if e.code not in self.COLUMN_NOT_FOUND_CODES:
+                        raise
+                    SongRepository._feature_version_available = False
+                    logger.warning("songs 表缺少 feature_version 列,按向量维度推断版本 (请执行 migrations/add_feature_version.sql)")
+            response = await (
                 self.db.table('songs')
-                .select('id, title, artist, album, cover_url, tag, tag_label, feature_vector')
-                .not_.is_('feature_vector', 'null')  # 仅返回有特征向量的歌曲
+                .select(columns)
+                .not_.is_('feature_vector', 'null')
                 .execute()
             )
             # logger.info(f"获取特征向量歌曲成功，共 {len(response.data) if response.data else 0} 首")
@@ -77,13 +100,13 @@ class FavoriteRepository:
     负责所有与用户收藏相关的数据库操作
     """
     
-    def __init__(self, db: Client):
+    def __init__(self, db: AsyncClient):
         self.db = db
     
-    def get_user_favorites(self, user_id: str) -> list[dict[str, Any]]:
+    async def get_user_favorites(self, user_id: str) -> list[dict[str, Any]]:
         """获取用户的所有收藏"""
         try:
-            response = (
+            response = await (
                 self.db.table('user_favorites')
                 .select('*, songs(*)')  # 关联查询歌曲详情
                 .eq('user_id', user_id)
@@ -95,13 +118,13 @@ class FavoriteRepository:
             logger.error(f"获取用户收藏失败 user_id={user_id}: {str(e)}")
             return []
     
-    def check_favorite(self, user_id: str, song_id: str) -> bool:
+    async def check_favorite(self, user_id: str, song_id: str) -> bool:
         """
         ✅ 核心修复：检查用户是否收藏了某首歌
         使用列表查询而非 .single()，彻底解决 406 Not Acceptable 错误
         """
         try:
-            response = (
+            response = await (
                 self.db.table('user_favorites')
                 .select('id')  # 只查id即可，减少传输量
                 .eq('user_id', user_id)
@@ -114,42 +137,72 @@ class FavoriteRepository:
             logger.error(f"检查收藏状态失败 user_id={user_id}, song_id={song_id}: {str(e)}")
             return False
     
-    def add_favorite(self, user_id: str, song_id: str) -> dict[str, Any]:
+    async def add_favorite(self, user_id: str, song_id: str) -> dict[str, Any]:
         """添加收藏"""
         try:
             favorite_data = {
                 'user_id': user_id,
                 'song_id': song_id
             }
-            response = self.db.table('user_favorites').insert(favorite_data).execute()
+            response = await self.db.table('user_favorites').insert(favorite_data).execute()
             logger.info(f"添加收藏成功 user_id={user_id}, song_id={song_id}")
             return response.data[0] if response.data else {}
         except Exception as e:
             logger.error(f"添加收藏失败: {e}")
             return {}
     
-    def remove_favorite(self, user_id: str, song_id: str) -> bool:
+    async def remove_favorite(self, user_id: str, song_id: str) -> bool:
         """删除收藏"""
         try:
-            self.db.table('user_favorites').delete().eq('user_id', user_id).eq('song_id', song_id).execute()
+            await self.db.table('user_favorites').delete().eq('user_id', user_id).eq('song_id', song_id).execute()
             logger.info(f"删除收藏成功 user_id={user_id}, song_id={song_id}")
             return True
         except Exception as e:
             logger.error(f"删除收藏失败 user_id={user_id}, song_id={song_id}: {str(e)}")
             return False
 
-    def toggle_favorite(self, user_id: str, song_id: str) -> bool:
+    # PostgREST 找不到函数时的错误码 (迁移 add_toggle_favorite_rpc.sql 未执行)
+    RPC_NOT_FOUND_CODES = ('PGRST202', '42883')
+    _rpc_available = True
+
+    async def toggle_favorite(self, user_id: str, song_id: str) -> bool | None:
         """
-        ✅ 新增：智能切换收藏状态
-        Returns: True=变为已收藏(红色), False=变为未收藏(灰色)
+        ✅ 智能切换收藏状态 (一次往返)
+        调用数据库函数 toggle_favorite,在同一事务内完成 检查歌曲 -> 检查收藏 -> 添加/删除,
+        并发点击在数据库内串行化
+        
+        Returns: True=变为已收藏(红色), False=变为未收藏(灰色), None=歌曲不存在
         """
+        if FavoriteRepository._rpc_available:
+            try:
+                response = await self.db.rpc(
+                    'toggle_favorite', {'p_user_id': user_id, 'p_song_id': song_id}
+                ).execute()
+                result = response.data or {}
+                if not result.get('song_exists'):
+                    return None
+                return bool(result.get('is_favorited'))
+            except APIError as e:
+                if e.code not in self.RPC_NOT_FOUND_CODES:
+                    raise
+                FavoriteRepository._rpc_available = False
+                logger.warning("数据库缺少 toggle_favorite 函数,回退为多次查询 (请执行 migrations/add_toggle_favorite_rpc.sql)")
+        
+        return await self._toggle_favorite_fallback(user_id, song_id)
+
+    async def _toggle_favorite_fallback(self, user_id: str, song_id: str) -> bool | None:
+        """未部署 RPC 时的旧流程: 检查歌曲 -> 检查收藏 -> 添加/删除"""
+        song = await self.db.table('songs').select('id').eq('id', song_id).maybe_single().execute()
+        if not song or not song.data:
+            return None
+        
         # 1. 快速检查
-        is_fav = self.check_favorite(user_id, song_id)
+        is_fav = await self.check_favorite(user_id, song_id)
         
         # 2. 根据状态取反
         if is_fav:
-            self.remove_favorite(user_id, song_id)
+            await self.remove_favorite(user_id, song_id)
             return False
         else:
-            self.add_favorite(user_id, song_id)
-            return True
\ No newline at end of file
+            await self.add_favorite(user_id, song_id)
+            return True
@@ -1,5 +1,6 @@
-from supabase import Client
+from supabase import AsyncClient
 from typing import Any
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,10 +12,10 @@ class UserRepository:
     负责所有与用户表相关的数据库操作
     """
     
-    def __init__(self, db: Client):
+    def __init__(self, db: AsyncClient):
         self.db = db
     
-    def get_by_id(self, user_id: str) -> dict[str, Any] | None:
+    async def get_by_id(self, user_id: str) -> dict[str, Any] | None:
         """
         根据用户ID获取用户信息
         
@@ -25,13 +26,13 @@ class UserRepository:
             用户数据字典，如果不存在返回None
         """
         try:
-            response = self.db.table('users').select('*').eq('id', user_id).single().execute()
+            response = await self.db.table('users').select('*').eq('id', user_id).single().execute()
             return response.data if response.data else None
         except Exception as e:
             logger.error(f"获取用户失败 user_id={user_id}: {str(e)}")
             return None
     
-    def get_by_email(self, email: str) -> dict[str, Any] | None:
+    async def get_by_email(self, email: str) -> dict[str, Any] | None:
         """
         根据邮箱获取用户信息
         
@@ -42,13 +43,13 @@ class UserRepository:
             用户数据字典，如果不存在返回None
         """
         try:
-            response = self.db.table('users').select('*').eq('email', email).maybe_single().execute()
+            response = await self.db.table('users').select('*').eq('email', email).maybe_single().execute()
             return response.data if response.data else None
         except Exception as e:
             logger.error(f"根据邮箱获取用户失败 email={email}: {str(e)}")
             return None
     
-    def create(self, user_data: dict[str, Any]) -> dict[str, Any]:
+    async def create(self, user_data: dict[str, Any]) -> dict[str, Any]:
         """
         创建新用户
         
@@ -69,7 +70,7 @@ class UserRepository:
         while retry_count < max_retries:
             try:
                 logger.info(f"尝试创建用户 (第 {retry_count + 1}/{max_retries} 次) email={user_data.get('email')}")
-                response = self.db.table('users').insert(user_data).execute()
+                response = await self.db.table('users').insert(user_data).execute()
                 
                 if not response.data or len(response.data) == 0:
                     raise ValueError("Supabase 返回空数据")
@@ -87,8 +88,7 @@ class UserRepository:
                 
                 # 如果还有重试机会，等待后重试
                 if retry_count < max_retries:
-                    import time
-                    time.sleep(1 * retry_count)  # 递增延迟：1秒、2秒
+                    await asyncio.sleep(1 * retry_count)  # 递增延迟：1秒、2秒
                     continue
                 
                 # 所有重试都失败了
@@ -98,7 +98,7 @@ class UserRepository:
                 )
                 raise Exception(f"创建用户失败: {str(last_error)}") from last_error
     
-    def update(self, user_id: str, user_data: dict[str, Any]) -> dict[str, Any]:
+    async def update(self, user_id: str, user_data: dict[str, Any]) -> dict[str, Any]:
         """
         更新用户信息
         
@@ -109,11 +109,11 @@ class UserRepository:
         Returns:
             更新后的用户数据
         """
-        response = self.db.table('users').update(user_data).eq('id', user_id).execute()
+        response = await self.db.table('users').update(user_data).eq('id', user_id).execute()
         logger.info(f"更新用户成功 user_id={user_id}")
         return response.data[0]
     
-    def get_analysis_count(self, user_id: str) -> int:
+    async def get_analysis_count(self, user_id: str) -> int:
         """
         获取用户分析次数
         
@@ -124,13 +124,13 @@ class UserRepository:
             分析次数
         """
         try:
-            response = self.db.table('voice_analyses').select('id', count='exact').eq('user_id', user_id).execute()
+            response = await self.db.table('voice_analyses').select('id', count='exact').eq('user_id', user_id).execute()
             return response.count if response.count else 0
         except Exception as e:
             logger.error(f"获取分析次数失败 user_id={user_id}: {str(e)}")
             return 0
     
-    def get_favorites_count(self, user_id: str) -> int:
+    async def get_favorites_count(self, user_id: str) -> int:
         """
         获取用户收藏数量
         
@@ -141,7 +141,7 @@ class UserRepository:
             收藏数量
         """
         try:
-            response = self.db.table('user_favorites').select('id', count='exact').eq('user_id', user_id).execute()
+            response = await self.db.table('user_favorites').select('id', count='exact').eq('user_id', user_id).execute()
             return response.count if response.count else 0
         except Exception as e:
             logger.error(f"获取收藏数量失败 user_id={user_id}: {str(e)}")
@@ -32,6 +32,14 @@ class MatchedSingerResponse(MatchedSingerBase):
         from_attributes = True
 
 
+class SingerCandidateResponse(BaseModel):
+    """
+    备选匹配歌手
+    """
+    name: str
+    score: int = Field(..., ge=0, le=100, description="匹配度")
+
+
 class VoiceAnalysisCreate(BaseModel):
     """
     声音分析创建请求模型
@@ -71,11 +79,25 @@ class VoiceAnalysisResponse(BaseModel):
     recommended_songs_challenge: list[RecommendedSongResponse] | None = None
     matched_song_title: str | None = None  # 新增：匹配的歌曲名
     matched_song_id: str | None = None     # 新增：匹配的歌曲ID
+    alternate_singers: list[SingerCandidateResponse] | None = None  # 新增：其他接近的歌手 (按匹配度降序)
     
     class Config:
         from_attributes = True
 
 
+class AnalysisJobResponse(BaseModel):
+    """
+    异步分析任务响应模型
+    status: pending / running / succeeded / failed
+    """
+    job_id: str
+    status: str = Field(..., description="任务状态: pending, running, succeeded, failed")
+    result: VoiceAnalysisResponse | None = None
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+
+
 class AudioFeatures(BaseModel):
     """
     音频特征数据模型
@@ -1,13 +1,43 @@
 # backend/scripts/batch_download_avatars.py
+"""
+歌手头像预取 (异步 + 限速 + 本地压缩)
+
+用法:
+    python scripts/batch_download_avatars.py                      # 搜索并下载缺失的头像
+    python scripts/batch_download_avatars.py --format webp        # 输出 256px WebP
+    python scripts/batch_download_avatars.py --reprocess          # 把已有的原图压缩为 256px
+    python scripts/batch_download_avatars.py --backend stub --stub-file urls.json  # 本地桩搜索 (测试用)
+
+- 搜索请求走令牌桶限速 (默认每 5 秒 1 次，与原来的 sleep 相同)，图片下载并发进行
+- 图片居中裁剪并缩放为固定尺寸 (默认 256px JPEG)，不再把全尺寸原图放进 /static
+- 每处理完一位歌手就更新清单 data/avatar_manifest.json: 歌手 -> 文件 -> SHA-256
+- 缩放/转码使用 Pillow (见 requirements.txt)
+- --reprocess 压缩后删除原图 (原图与新文件同名时直接覆盖)
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
 import os
 import time
-import requests
-from duckduckgo_search import DDGS
+from pathlib import Path
+from typing import Dict, List, Protocol
+
+import httpx
+from PIL import Image, ImageOps
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
 
 # 1. 定义要保存的路径
-SAVE_DIR = "../static/avatars"
-if not os.path.exists(SAVE_DIR):
-    os.makedirs(SAVE_DIR)
+SAVE_DIR = BACKEND_DIR / "static" / "avatars"
+MANIFEST_PATH = BACKEND_DIR / "data" / "avatar_manifest.json"
+
+# 本地头像支持的扩展名 (service/avatar_resolver.py 不区分大小写)
+AVATAR_EXTENSIONS = [".jpg", ".jpeg", ".png", ".webp", ".JPG", ".PNG", ".JPEG"]
+
+# 下载图片的大小上限
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
 
 # 2. 模拟从数据库获取歌手列表
 # 实际项目中，你应该从 database 读取：
@@ -16,51 +46,282 @@ if not os.path.exists(SAVE_DIR):
 # 这里为了演示，我们假设这是你的歌手列表：
 singers = ["伍佰", "邓紫棋", "陈奕迅", "周杰伦", "Taylor Swift", "Adele", "林俊杰"]
 
-def download_image(url, save_path):
-    try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            with open(save_path, 'wb') as f:
-                f.write(response.content)
-            return True
-    except Exception as e:
-        print(f"下载失败: {e}")
-    return False
-
-def search_and_download():
-    print(f"开始为 {len(singers)} 位歌手下载头像...")
-    
-    with DDGS() as ddgs:
-        for singer in singers:
-            filename = f"{singer}.jpg"
-            save_path = os.path.join(SAVE_DIR, filename)
-            
-            # 如果文件已存在，跳过
-            if os.path.exists(save_path):
+
+class TokenBucket:
+    """
+    异步令牌桶
+
+    Args:
+        rate: 每秒补充的令牌数
+        capacity: 桶容量 (允许的突发请求数)
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """取一个令牌，桶空时等待补充"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SearchBackend(Protocol):
+    """图片搜索后端"""
+
+    async def search(self, singer: str, max_results: int) -> List[str]:
+        """返回候选图片 URL (按优先级排列)"""
+        ...
+
+
+class DuckDuckGoBackend:
+    """DuckDuckGo 图片搜索 (duckduckgo_search 是同步库，放到线程中执行)"""
+
+    async def search(self, singer: str, max_results: int) -> List[str]:
+        from duckduckgo_search import DDGS
+
+        # 搜索“歌手名 + 歌手头像”
+        keywords = f"{singer} singer face profile"
+
+        def _search() -> List[str]:
+            with DDGS() as ddgs:
+                return [r['image'] for r in ddgs.images(keywords, max_results=max_results)]
+
+        return await asyncio.to_thread(_search)
+
+
+class StubBackend:
+    """
+    本地桩搜索后端 (测试 / 离线环境)
+
+    Args:
+        urls: 歌手 -> 图片 URL 列表
+    """
+
+    def __init__(self, urls: Dict[str, List[str]]):
+        self.urls = urls
+
+    async def search(self, singer: str, max_results: int) -> List[str]:
+        return list(self.urls.get(singer, []))[:max_results]
+
+
+def encode_avatar(data: bytes, size: int, fmt: str) -> tuple[bytes, str]:
+    """
+    居中裁剪为正方形并缩放到 size × size
+
+    Returns:
+        (编码后的图片, 扩展名)
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        image = ImageOps.fit(image, (size, size), method=Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        if fmt == "webp":
+            image.save(out, format="WEBP", quality=80, method=6)
+            return out.getvalue(), ".webp"
+        image.save(out, format="JPEG", quality=85, optimize=True, progressive=True)
+        return out.getvalue(), ".jpg"
+
+
+def find_existing_avatar(singer: str) -> Path | None:
+    """本地已有的头像文件"""
+    for ext in AVATAR_EXTENSIONS:
+        path = SAVE_DIR / f"{singer}{ext}"
+        if path.exists():
+            return path
+    return None
+
+
+class AvatarPrefetcher:
+    """
+    头像预取器
+
+    Args:
+        backend: 图片搜索后端
+        size: 输出边长 (像素)
+        fmt: 输出格式 jpeg / webp
+        concurrency: 同时下载/处理的图片数
+        search_interval: 两次搜索之间的平均间隔 (秒)
+        burst: 允许连续发出的搜索数
+    """
+
+    def __init__(self, backend: SearchBackend, size: int = 256, fmt: str = "jpeg",
+                 concurrency: int = 4, search_interval: float = 5.0, burst: int = 1):
+        self.backend = backend
+        self.size = size
+        self.fmt = fmt
+        self.bucket = TokenBucket(rate=1.0 / search_interval, capacity=burst)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.manifest: Dict[str, Dict] = self._load_manifest()
+        self.stats = {'downloaded': 0, 'reprocessed': 0, 'skipped': 0, 'failed': 0}
+
+    @staticmethod
+    def _load_manifest() -> Dict[str, Dict]:
+        if not MANIFEST_PATH.exists():
+            return {}
+        try:
+            return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"⚠️  清单损坏，将重新生成: {e}")
+            return {}
+
+    def _save_manifest(self) -> None:
+        """原子写入清单 (先写临时文件再替换)"""
+        MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = MANIFEST_PATH.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, MANIFEST_PATH)
+
+    async def _store(self, singer: str, data: bytes, source: str) -> Path:
+        """压缩 -> 原子写入 -> 记录清单"""
+        encoded, ext = await asyncio.to_thread(encode_avatar, data, self.size, self.fmt)
+        save_path = SAVE_DIR / f"{singer}{ext}"
+        tmp_path = save_path.with_name(save_path.name + ".part")
+        tmp_path.write_bytes(encoded)
+        os.replace(tmp_path, save_path)
+
+        self.manifest[singer] = {
+            'file': save_path.name,
+            'sha256': hashlib.sha256(encoded).hexdigest(),
+            'bytes': len(encoded),
+            'original_bytes': len(data),
+            'source': source,
+            'updated_at': time.time()
+        }
+        self._save_manifest()
+        return save_path
+
+    async def _download(self, client: httpx.AsyncClient, url: str) -> bytes | None:
+        """流式下载图片,超过 MAX_IMAGE_BYTES 立即中止"""
+        try:
+            async with client.stream("GET", url, timeout=10) as response:
+                if response.status_code != 200:
+                    return None
+                if not response.headers.get("content-type", "image/").startswith("image/"):
+                    return None
+                if int(response.headers.get("content-length") or 0) > MAX_IMAGE_BYTES:
+                    print(f"   图片过大，跳过: {url}")
+                    return None
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body.extend(chunk)
+                    if len(body) > MAX_IMAGE_BYTES:
+                        print(f"   图片过大，已中止下载: {url}")
+                        return None
+                return bytes(body)
+        except httpx.HTTPError as e:
+            print(f"   下载失败: {e}")
+            return None
+
+    async def fetch(self, client: httpx.AsyncClient, singer: str, reprocess: bool = False) -> None:
+        """处理单个歌手"""
+        # 清单中记录的文件仍在且未被替换，说明已处理过
+        entry = self.manifest.get(singer)
+        processed = SAVE_DIR / entry['file'] if entry else None
+        if processed is not None and processed.exists() and processed.stat().st_size == entry['bytes']:
+            print(f"✅ [跳过] {singer} 已处理")
+            self.stats['skipped'] += 1
+            return
+        
+        existing = find_existing_avatar(singer)
+        if existing is not None:
+            # 如果文件已存在，跳过 (--reprocess 时把原图压缩为固定尺寸)
+            if not reprocess:
                 print(f"✅ [跳过] {singer} 已存在")
-                continue
-                
-            print(f"🔍 正在搜索: {singer} ...")
-            try:
-                # 搜索“歌手名 + 歌手头像”
-                keywords = f"{singer} singer face profile"
-                results = list(ddgs.images(keywords, max_results=1))
-                
-                if results:
-                    image_url = results[0]['image']
-                    print(f"   ⬇️ 找到图片，正在下载...")
-                    if download_image(image_url, save_path):
-                        print(f"   ✅ 成功保存: {filename}")
-                    else:
-                        print(f"   ❌ 下载出错")
-                else:
-                    print(f"   ⚠️ 未找到相关图片")
-                    
-            except Exception as e:
-                print(f"   ❌ 搜索出错: {e}")
-            
-            # 休息一下，防止被封 IP
-            time.sleep(5.0)
+                self.stats['skipped'] += 1
+                return
+            async with self.semaphore:
+                data = existing.read_bytes()
+                saved = await self._store(singer, data, source=existing.name)
+                if existing.exists() and not existing.samefile(saved):
+                    # 格式或扩展名变了 (如 .png -> .jpg / --format webp),删除全尺寸原图
+                    existing.unlink()
+            print(f"🗜️  [压缩] {singer}: {len(data) / 1024:.0f}KB -> {saved.stat().st_size / 1024:.0f}KB ({saved.name})")
+            self.stats['reprocessed'] += 1
+            return
+
+        await self.bucket.acquire()  # 搜索限速，防止被封 IP
+        print(f"🔍 正在搜索: {singer} ...")
+        try:
+            urls = await self.backend.search(singer, max_results=3)
+        except Exception as e:
+            print(f"   ❌ 搜索出错: {e}")
+            self.stats['failed'] += 1
+            return
+
+        async with self.semaphore:
+            for url in urls:
+                data = await self._download(client, url)
+                if data is None:
+                    continue
+                try:
+                    saved = await self._store(singer, data, source=url)
+                except Exception as e:
+                    print(f"   ⚠️ 图片无法解析，尝试下一张: {e}")
+                    continue
+                print(f"   ✅ 成功保存: {saved.name} ({saved.stat().st_size / 1024:.0f}KB)")
+                self.stats['downloaded'] += 1
+                return
+
+        print(f"   ⚠️ 未找到可用图片: {singer}")
+        self.stats['failed'] += 1
+
+    async def run(self, names: List[str], reprocess: bool = False) -> Dict[str, int]:
+        """并发处理所有歌手"""
+        SAVE_DIR.mkdir(parents=True, exist_ok=True)
+        print(f"开始为 {len(names)} 位歌手下载头像...")
+        async with httpx.AsyncClient(follow_redirects=True, headers={"User-Agent": "Mozilla/5.0"}) as client:
+            await asyncio.gather(*(self.fetch(client, singer, reprocess) for singer in names))
+        print(f"📊 完成: {self.stats}  清单: {MANIFEST_PATH}")
+        return self.stats
+
+
+def search_and_download(backend: SearchBackend | None = None, **options) -> Dict[str, int]:
+    """同步入口"""
+    reprocess = options.pop('reprocess', False)
+    prefetcher = AvatarPrefetcher(backend or DuckDuckGoBackend(), **options)
+    return asyncio.run(prefetcher.run(singers, reprocess=reprocess))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量下载并压缩歌手头像")
+    parser.add_argument('--size', type=int, default=256, help="输出边长 (像素)")
+    parser.add_argument('--format', choices=['jpeg', 'webp'], default='jpeg', help="输出格式")
+    parser.add_argument('--concurrency', type=int, default=4, help="同时下载的图片数")
+    parser.add_argument('--search-interval', type=float, default=5.0, help="两次搜索的平均间隔 (秒)")
+    parser.add_argument('--burst', type=int, default=1, help="允许连续发出的搜索数")
+    parser.add_argument('--reprocess', action='store_true', help="把已有的本地头像压缩为固定尺寸")
+    parser.add_argument('--backend', choices=['ddg', 'stub'], default='ddg', help="图片搜索后端")
+    parser.add_argument('--stub-file', help="stub 后端使用的 JSON 文件: {歌手: [图片URL, ...]}")
+    args = parser.parse_args()
+
+    backend: SearchBackend
+    if args.backend == 'stub':
+        with open(args.stub_file, 'r', encoding='utf-8') as f:
+            backend = StubBackend(json.load(f))
+    else:
+        backend = DuckDuckGoBackend()
+
+    search_and_download(
+        backend,
+        size=args.size,
+        fmt=args.format,
+        concurrency=args.concurrency,
+        search_interval=args.search_interval,
+        burst=args.burst,
+        reprocess=args.reprocess
+    )
+
 
 if __name__ == "__main__":
-    search_and_download()
\ No newline at end of file
+    main()
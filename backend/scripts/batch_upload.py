@@ -1,10 +1,24 @@
 """
 批量上传 MP3 文件到 Supabase Storage
-使用 UUID 重命名文件以避免中文和特殊字符导致的上传失败
+使用内容哈希命名文件以避免中文和特殊字符导致的上传失败
+
+用法:
+    python scripts/batch_upload.py                       # 上传 TARGET_FOLDER，4 个并发
+    python scripts/batch_upload.py --folder D:/music --workers 8
+
+- 线程池并发上传，文件以流的形式分块发送，不再整首读入内存
+- 每个文件上传完成后立即追加到清单文件 (JSON Lines)，中断后重新运行会从断点继续
+- 内容哈希已上传过的文件 (包括改名/重复的文件) 直接跳过
 """
 import os
 import sys
+import json
+import time
 import uuid
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Dict, List, Tuple
 from dotenv import load_dotenv
@@ -21,11 +35,68 @@ BUCKET_NAME = 'audio-files'
 # 目标文件夹路径（请修改为您的实际路径）
 TARGET_FOLDER = r'F:\补货'
 
+# 上传清单 (断点续传 + 按内容哈希去重)
+MANIFEST_FILE = Path(__file__).parent / '.batch_upload_manifest.jsonl'
+
+# 计算内容哈希时每次读取的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path: str) -> str:
+    """分块计算文件 SHA-256 (不整首读入内存)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadManifest:
+    """
+    上传清单 (JSON Lines，每上传完一个文件追加一行)
+    
+    - uploaded: 内容哈希 -> 上传成功的记录
+    - known_hashes: (路径, 大小, 修改时间) -> 内容哈希，续传时未变化的文件不必重新计算哈希
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.uploaded: Dict[str, Dict] = {}
+        self.known_hashes: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 写入中途崩溃只会损坏最后一行
+                    print(f"⚠️  清单第 {line_no} 行损坏，已忽略")
+                    continue
+                self.known_hashes[(entry['path'], entry['size'], entry['mtime_ns'])] = entry['content_hash']
+                if entry['status'] == 'success':
+                    self.uploaded[entry['content_hash']] = entry
+    
+    def append(self, entry: Dict) -> None:
+        """追加一条记录并立即落盘"""
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.known_hashes[(entry['path'], entry['size'], entry['mtime_ns'])] = entry['content_hash']
+            if entry['status'] == 'success':
+                self.uploaded[entry['content_hash']] = entry
+
 
 class AudioUploader:
     """音频文件批量上传器"""
     
-    def __init__(self):
+    def __init__(self, manifest_path: Path = MANIFEST_FILE, max_retries: int = 3):
         """初始化 Supabase 客户端"""
         if not SUPABASE_URL or not SUPABASE_KEY:
             raise ValueError("请在 .env 文件中设置 SUPABASE_URL 和 SUPABASE_KEY")
@@ -33,6 +104,11 @@ class AudioUploader:
         self.client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
         self.bucket_name = BUCKET_NAME
         self.upload_results: List[Dict] = []
+        self.manifest = UploadManifest(manifest_path)
+        self.max_retries = max_retries
+        # 本次运行中正在上传的内容哈希，避免重复文件被并发上传两次
+        self._in_progress: Dict[str, threading.Event] = {}
+        self._claim_lock = threading.Lock()
     
     def generate_safe_filename(self, original_filename: str) -> str:
         """
@@ -52,32 +128,33 @@ class AudioUploader:
         
         return safe_name
     
-    def upload_file(self, file_path: str, original_name: str) -> Tuple[bool, str, str]:
+    def upload_file(self, file_path: str, original_name: str,
+                    storage_name: str | None = None) -> Tuple[bool, str, str]:
         """
         上传单个文件到 Supabase Storage
         
         Args:
             file_path: 本地文件路径
             original_name: 原始文件名
+            storage_name: 存储中的文件名，为空时生成 UUID 文件名
             
         Returns:
             (是否成功, 公开 URL, 错误信息)
         """
         try:
             # 生成安全的文件名
-            safe_filename = self.generate_safe_filename(original_name)
-            
-            # 读取文件内容
-            with open(file_path, 'rb') as f:
-                file_content = f.read()
+            safe_filename = storage_name or self.generate_safe_filename(original_name)
             
             # 上传到 Supabase Storage
-            response = self.client.storage.from_(self.bucket_name).upload(
+            # NOTE: 传入文件路径，由 httpx 以流的方式分块发送 multipart 请求体，不整首读入内存
+            #       同一内容总是使用同一个文件名，重试时 upsert 覆盖中断的上传
+            self.client.storage.from_(self.bucket_name).upload(
                 path=safe_filename,
-                file=file_content,
+                file=file_path,
                 file_options={
                     "content-type": "audio/mpeg",
-                    "cache-control": "3600"
+                    "cache-control": "3600",
+                    "upsert": "true"
                 }
             )
             
@@ -112,12 +189,79 @@ class AudioUploader:
         
         return mp3_files
     
-    def batch_upload(self, folder_path: str) -> None:
+    def _claim(self, content_hash: str) -> Dict | None | threading.Event:
+        """
+        认领一个内容哈希
+        
+        Returns:
+            已上传的清单记录 / 其他线程正在上传时返回其完成事件 / 认领成功返回 None
+        """
+        with self._claim_lock:
+            if content_hash in self.manifest.uploaded:
+                return self.manifest.uploaded[content_hash]
+            if content_hash in self._in_progress:
+                return self._in_progress[content_hash]
+            self._in_progress[content_hash] = threading.Event()
+            return None
+    
+    def process_file(self, file_path: str) -> Dict:
+        """
+        处理单个文件: 计算哈希 -> 去重 -> 带重试上传 -> 写入清单
+        
+        Returns:
+            结果记录 (status: success / skipped / failed)
+        """
+        stat = os.stat(file_path)
+        original_name = Path(file_path).name
+        entry = {
+            'path': file_path,
+            'original_name': original_name,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns
+        }
+        
+        content_hash = self.manifest.known_hashes.get((file_path, stat.st_size, stat.st_mtime_ns))
+        if content_hash is None:
+            content_hash = file_sha256(file_path)
+        entry['content_hash'] = content_hash
+        
+        claimed = self._claim(content_hash)
+        if isinstance(claimed, threading.Event):
+            # 相同内容的文件正在由其他线程上传，等待其结果
+            claimed.wait()
+            claimed = self.manifest.uploaded.get(content_hash)
+            if claimed is None:
+                # 对方重试耗尽仍失败，本文件也记为失败 (不写清单，下次运行重新上传)
+                return dict(entry, status='failed', error="相同内容的文件上传失败")
+        if claimed is not None:
+            return dict(entry, status='skipped', public_url=claimed['public_url'])
+        
+        try:
+            storage_name = f"{content_hash[:32]}{Path(file_path).suffix.lower()}"
+            error = ""
+            for attempt in range(1, self.max_retries + 1):
+                success, public_url, error = self.upload_file(file_path, original_name, storage_name)
+                if success:
+                    entry.update(status='success', storage_path=storage_name,
+                                 public_url=public_url, uploaded_at=time.time())
+                    break
+                if attempt < self.max_retries:
+                    time.sleep(2 ** (attempt - 1))
+            else:
+                entry.update(status='failed', error=error)
+            self.manifest.append(entry)
+            return entry
+        finally:
+            with self._claim_lock:
+                self._in_progress.pop(content_hash).set()
+    
+    def batch_upload(self, folder_path: str, workers: int = 4) -> None:
         """
         批量上传文件夹中的所有 MP3 文件
         
         Args:
             folder_path: 目标文件夹路径
+            workers: 并发上传数
         """
         print(f"📁 扫描文件夹: {folder_path}")
         print("-" * 80)
@@ -129,51 +273,50 @@ class AudioUploader:
             print("⚠️  未找到任何 MP3 文件")
             return
         
-        print(f"✓ 找到 {len(mp3_files)} 个 MP3 文件\n")
+        print(f"✓ 找到 {len(mp3_files)} 个 MP3 文件，清单中已上传 {len(self.manifest.uploaded)} 个 "
+              f"(并发数: {workers})\n")
         
         # 上传文件
         success_count = 0
         failed_count = 0
+        skipped_count = 0
+        uploaded_bytes = 0
+        start = time.perf_counter()
         
-        for i, file_path in enumerate(mp3_files, 1):
-            original_name = Path(file_path).name
-            file_size = Path(file_path).stat().st_size / (1024 * 1024)  # MB
-            
-            print(f"[{i}/{len(mp3_files)}] 上传中: {original_name} ({file_size:.2f} MB)")
-            
-            success, public_url, error = self.upload_file(file_path, original_name)
-            
-            if success:
-                success_count += 1
-                print(f"    ✅ [成功] 原始: {original_name}")
-                print(f"    -> 链接: {public_url}")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self.process_file, file_path): file_path for file_path in mp3_files}
+            for i, future in enumerate(as_completed(futures), 1):
+                original_name = Path(futures[future]).name
+                try:
+                    result = future.result()
+                except OSError as e:
+                    result = {'original_name': original_name, 'status': 'failed', 'error': str(e)}
                 
-                # 记录结果
-                self.upload_results.append({
-                    'original_name': original_name,
-                    'public_url': public_url,
-                    'status': 'success'
-                })
-            else:
-                failed_count += 1
-                print(f"    ❌ [失败] {original_name}")
-                print(f"    -> 错误: {error}")
+                if result['status'] == 'success':
+                    success_count += 1
+                    uploaded_bytes += result['size']
+                    elapsed = time.perf_counter() - start
+                    print(f"[{i}/{len(mp3_files)}] ✅ [成功] {original_name} ({result['size'] / (1024 * 1024):.2f} MB) "
+                          f"-> {result['public_url']}  ({uploaded_bytes / (1024 * 1024) / elapsed:.2f} MB/s)")
+                elif result['status'] == 'skipped':
+                    skipped_count += 1
+                else:
+                    failed_count += 1
+                    print(f"[{i}/{len(mp3_files)}] ❌ [失败] {original_name}")
+                    print(f"    -> 错误: {result['error']}")
                 
-                # 记录失败结果
-                self.upload_results.append({
-                    'original_name': original_name,
-                    'error': error,
-                    'status': 'failed'
-                })
-            
-            print()
+                # 记录结果
+                self.upload_results.append(result)
         
         # 打印总结
+        elapsed = time.perf_counter() - start
         print("=" * 80)
         print(f"📊 上传完成统计:")
-        print(f"   ✓ 成功: {success_count} 个文件")
-        print(f"   ✗ 失败: {failed_count} 个文件")
+        print(f"   ✓ 成功: {success_count} 个文件 ({uploaded_bytes / (1024 * 1024):.1f} MB, {elapsed:.1f}s)")
+        print(f"   ⏭️  跳过 (已上传/重复内容): {skipped_count} 个文件")
+        print(f"   ✗ 失败: {failed_count} 个文件 (重新运行即可只重试失败的文件)")
         print(f"   总计: {len(mp3_files)} 个文件")
+        print(f"   清单: {self.manifest.path}")
         print("=" * 80)
     
     def export_mapping(self, output_file: str = 'upload_mapping.txt') -> None:
@@ -189,7 +332,7 @@ class AudioUploader:
                 f.write("=" * 100 + "\n\n")
                 
                 for result in self.upload_results:
-                    if result['status'] == 'success':
+                    if result['status'] in ('success', 'skipped'):
                         f.write(f"原始文件名: {result['original_name']}\n")
                         f.write(f"公开链接:   {result['public_url']}\n")
                         f.write("-" * 100 + "\n\n")
@@ -202,22 +345,29 @@ class AudioUploader:
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="批量上传 MP3 文件到 Supabase Storage")
+    parser.add_argument('--folder', default=TARGET_FOLDER, help="要上传的文件夹")
+    parser.add_argument('--workers', type=int, default=4, help="并发上传数")
+    parser.add_argument('--max-retries', type=int, default=3, help="单个文件上传失败时的最大尝试次数")
+    parser.add_argument('--manifest', type=Path, default=MANIFEST_FILE, help="上传清单文件路径")
+    args = parser.parse_args()
+    
     print("🎵 Supabase 音频文件批量上传工具")
     print("=" * 80)
     
     # 检查文件夹路径
-    if not os.path.exists(TARGET_FOLDER):
+    if not os.path.exists(args.folder):
         print(f"\n❌ 错误: 目标文件夹不存在")
-        print(f"请修改脚本中的 TARGET_FOLDER 变量为实际路径")
-        print(f"当前设置: {TARGET_FOLDER}")
+        print(f"请通过 --folder 指定，或修改脚本中的 TARGET_FOLDER 变量为实际路径")
+        print(f"当前设置: {args.folder}")
         sys.exit(1)
     
     try:
         # 创建上传器
-        uploader = AudioUploader()
+        uploader = AudioUploader(manifest_path=args.manifest, max_retries=args.max_retries)
         
         # 批量上传
-        uploader.batch_upload(TARGET_FOLDER)
+        uploader.batch_upload(args.folder, workers=args.workers)
         
         # 导出映射表
         uploader.export_mapping()
@@ -0,0 +1,230 @@
+"""
+ANN 索引基准测试
+在合成的聚类向量数据上比较 IVF 近似检索与精确检索的 recall@k 和延迟 (p50 / p99)
+
+--catalog 额外测试线上实际调用的 SongCatalogIndex.search (带歌手过滤):
+- exclude_artist: 挑战区推荐,排除查询最近邻所属的歌手
+- artist: 舒适区推荐,只在该歌手的歌曲中检索
+每种过滤都以同样过滤条件下的精确检索为基准,另外给出 fill (返回数量 / 精确检索返回数量)
+
+用法:
+    python scripts/benchmark_ann.py --songs 50000 --dim 60 --queries 500
+    python scripts/benchmark_ann.py --nprobe 1 4 8 16 32 --json ann_report.json
+    python scripts/benchmark_ann.py --catalog --artists 2000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 允许从 backend 目录导入 service 模块
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from service.ann_index import IVFIndex
+from service.feature_schema import CURRENT_FEATURE_VERSION, FEATURE_SPECS
+from service.similarity_search import normalize_rows, top_k_cosine
+from service.song_catalog import SongCatalogIndex
+
+CATALOG_FILTERS = ('exclude_artist', 'artist')
+
+
+def make_dataset(n_songs: int, dim: int, n_queries: int, n_clusters: int, seed: int):
+    """
+    生成带簇结构的合成向量 (模拟同风格歌曲在特征空间中聚集)
+
+    Returns:
+        (歌曲向量, 查询向量)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)) * 3
+    labels = rng.integers(0, n_clusters, size=n_songs)
+    songs = centers[labels] + rng.standard_normal((n_songs, dim))
+    query_labels = rng.integers(0, n_clusters, size=n_queries)
+    queries = centers[query_labels] + rng.standard_normal((n_queries, dim))
+    return songs.astype(np.float32), queries.astype(np.float32)
+
+
+def percentile_ms(samples: list[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+
+def run_benchmark(args) -> dict:
+    songs, queries = make_dataset(args.songs, args.dim, args.queries, args.clusters, args.seed)
+    ids = np.arange(args.songs)
+    normed = normalize_rows(songs)
+
+    # 精确检索基线
+    exact_results, exact_times = [], []
+    for query in queries:
+        start = time.perf_counter()
+        indices, _ = top_k_cosine(normed, query, args.k)
+        exact_times.append(time.perf_counter() - start)
+        exact_results.append(set(indices.tolist()))
+
+    start = time.perf_counter()
+    index = IVFIndex().build(ids, songs, n_lists=args.lists)
+    build_seconds = time.perf_counter() - start
+
+    report = {
+        'songs': args.songs,
+        'dim': args.dim,
+        'queries': args.queries,
+        'k': args.k,
+        'n_lists': index.n_lists,
+        'build_seconds': round(build_seconds, 3),
+        'exact': {
+            'p50_ms': round(percentile_ms(exact_times, 50), 4),
+            'p99_ms': round(percentile_ms(exact_times, 99), 4)
+        },
+        'ivf': []
+    }
+
+    for nprobe in args.nprobe:
+        recalls, times = [], []
+        for query, truth in zip(queries, exact_results):
+            start = time.perf_counter()
+            found, _ = index.search(query, k=args.k, nprobe=nprobe)
+            times.append(time.perf_counter() - start)
+            recalls.append(len(truth & {int(i) for i in found}) / len(truth))
+        report['ivf'].append({
+            'nprobe': nprobe,
+            f'recall@{args.k}': round(float(np.mean(recalls)), 4),
+            'p50_ms': round(percentile_ms(times, 50), 4),
+            'p99_ms': round(percentile_ms(times, 99), 4)
+        })
+
+    if args.catalog:
+        report['catalog'] = run_catalog_benchmark(args, songs, queries, index)
+    return report
+
+
+def run_catalog_benchmark(args, songs: np.ndarray, queries: np.ndarray, index: IVFIndex) -> dict:
+    """
+    测试 SongCatalogIndex.search (线上推荐路径),近似检索与同一过滤条件下的精确检索对比
+
+    Returns:
+        {'artists', 'exact': {过滤: 延迟}, 'ivf': [{nprobe, filter, recall, fill, 延迟}]}
+    """
+    rng = np.random.default_rng(args.seed)
+    artists = [f"artist{i}" for i in rng.integers(0, args.artists, size=len(songs))]
+    records = [
+        {'id': i, 'title': f"song{i}", 'artist': artist,
+         'feature_vector': vector.tolist(), 'feature_version': CURRENT_FEATURE_VERSION}
+        for i, (artist, vector) in enumerate(zip(artists, songs))
+    ]
+
+    exact_catalog = SongCatalogIndex(ann_index_path="")
+    exact_catalog.load(records)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ann_path = os.path.join(tmp_dir, "ann.npz")
+        index.save(ann_path)
+        ann_catalog = SongCatalogIndex(ann_index_path=ann_path, ann_min_size=args.ann_min_size)
+        ann_catalog.load(records)
+
+    # 过滤歌手取精确最近邻所属的歌手,与线上 "匹配歌手" 的用法一致
+    query_artists = [exact_catalog.search(query, k=1)[0]['artist'] for query in queries]
+
+    def timed_search(catalog: SongCatalogIndex, query, kind: str, artist: str) -> tuple[set[str], float]:
+        start = time.perf_counter()
+        found = catalog.search(query, k=args.k, **{kind: artist})
+        return {row['id'] for row in found}, time.perf_counter() - start
+
+    report = {'artists': args.artists, 'exact': {}, 'ivf': []}
+    truths = {}
+    for kind in CATALOG_FILTERS:
+        results = [timed_search(exact_catalog, q, kind, a) for q, a in zip(queries, query_artists)]
+        truths[kind] = [found for found, _ in results]
+        times = [seconds for _, seconds in results]
+        report['exact'][kind] = {
+            'p50_ms': round(percentile_ms(times, 50), 4),
+            'p99_ms': round(percentile_ms(times, 99), 4)
+        }
+
+    for nprobe in args.nprobe:
+        ann_catalog.ann_nprobe = nprobe
+        for kind in CATALOG_FILTERS:
+            recalls, fills, times = [], [], []
+            for query, artist, truth in zip(queries, query_artists, truths[kind]):
+                found, seconds = timed_search(ann_catalog, query, kind, artist)
+                times.append(seconds)
+                if truth:
+                    recalls.append(len(truth & found) / len(truth))
+                    fills.append(len(found) / len(truth))
+            report['ivf'].append({
+                'nprobe': nprobe,
+                'filter': kind,
+                f'recall@{args.k}': round(float(np.mean(recalls)), 4) if recalls else None,
+                'fill': round(float(np.mean(fills)), 4) if fills else None,
+                'p50_ms': round(percentile_ms(times, 50), 4),
+                'p99_ms': round(percentile_ms(times, 99), 4)
+            })
+    return report
+
+
+def print_report(report: dict) -> None:
+    k = report['k']
+    print("=" * 70)
+    print(f"📊 ANN 基准: {report['songs']} 首歌, 维度 {report['dim']}, "
+          f"{report['queries']} 次查询, {report['n_lists']} 个列表 (构建 {report['build_seconds']}s)")
+    print("=" * 70)
+    print(f"{'方法':<16}{'recall@' + str(k):>12}{'p50 (ms)':>14}{'p99 (ms)':>14}")
+    print(f"{'exact':<16}{1.0:>12.4f}{report['exact']['p50_ms']:>14.4f}{report['exact']['p99_ms']:>14.4f}")
+    for row in report['ivf']:
+        name = f"ivf nprobe={row['nprobe']}"
+        print(f"{name:<16}{row[f'recall@{k}']:>12.4f}{row['p50_ms']:>14.4f}{row['p99_ms']:>14.4f}")
+    print("=" * 70)
+
+    catalog = report.get('catalog')
+    if not catalog:
+        return
+    print(f"📚 SongCatalogIndex.search ({catalog['artists']} 个歌手)")
+    print("=" * 70)
+    print(f"{'方法':<28}{'recall@' + str(k):>10}{'fill':>8}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    for kind, row in catalog['exact'].items():
+        name = f"exact {kind}"
+        print(f"{name:<28}{1.0:>10.4f}{1.0:>8.2f}{row['p50_ms']:>12.4f}{row['p99_ms']:>12.4f}")
+    for row in catalog['ivf']:
+        name = f"ivf nprobe={row['nprobe']} {row['filter']}"
+        recall = row[f'recall@{k}']
+        recall_text = f"{recall:.4f}" if recall is not None else "-"
+        fill_text = f"{row['fill']:.2f}" if row['fill'] is not None else "-"
+        print(f"{name:<28}{recall_text:>10}{fill_text:>8}{row['p50_ms']:>12.4f}{row['p99_ms']:>12.4f}")
+    print("=" * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF 近似检索 vs 精确检索基准测试")
+    parser.add_argument('--songs', type=int, default=50000, help="歌曲向量数量")
+    parser.add_argument('--dim', type=int, default=60, help="向量维度")
+    parser.add_argument('--queries', type=int, default=500, help="查询次数")
+    parser.add_argument('--clusters', type=int, default=200, help="合成数据的簇数量")
+    parser.add_argument('--lists', type=int, default=None, help="IVF 列表数量,默认 sqrt(n)")
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32], help="要测试的 nprobe 值")
+    parser.add_argument('--k', type=int, default=10, help="Top-K")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--json', type=str, default=None, help="将结果写入 JSON 文件")
+    parser.add_argument('--catalog', action='store_true',
+                        help="同时测试线上推荐路径 SongCatalogIndex.search (artist / exclude_artist 过滤)")
+    parser.add_argument('--artists', type=int, default=2000, help="--catalog 模式下合成数据的歌手数量")
+    parser.add_argument('--ann-min-size', type=int, default=5000,
+                        help="--catalog 模式下启用近似检索的最小候选数 (对应配置 ann_min_catalog_size)")
+    args = parser.parse_args()
+    catalog_dim = FEATURE_SPECS[CURRENT_FEATURE_VERSION].dim
+    if args.catalog and args.dim != catalog_dim:
+        parser.error(f"--catalog 要求 --dim 与当前特征版本一致 ({catalog_dim})")
+
+    report = run_benchmark(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✓ 结果已写入: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
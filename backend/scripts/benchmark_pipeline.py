@@ -0,0 +1,463 @@
+"""
+音频分析流水线基准测试
+在确定性的合成人声语料上测量 extract_audio_features / AudioAnalyzer.analyze_audio_file /
+AudioAnalyzer.extract_mfcc_feature_vector 的分阶段耗时 (p50 / p95)、吞吐量和峰值内存
+
+用法:
+    python scripts/benchmark_pipeline.py --json bench_before.json
+    python scripts/benchmark_pipeline.py --clips 12 --repeat 3 --targets features mfcc
+    python scripts/benchmark_pipeline.py --json bench_after.json --baseline bench_before.json
+    python scripts/benchmark_pipeline.py --compare bench_before.json bench_after.json --threshold 0.1
+
+- 语料由 --seed 完全确定: 基频 90-330Hz、带颤音和音节包络的谐波信号,时长 3-60 秒,wav / webm / mp3 轮换
+- 语料缓存在 data/bench_corpus,参数不变时直接复用 (webm 需要 ffmpeg,缺少编码器的格式会被跳过并记录在报告中)
+- 每个目标在独立的子进程中运行,峰值 RSS 互不影响;正式计时前先在短片段上预热 (librosa 导入 + numba 编译)
+- 对比两份报告时,p50 / p95 / 峰值内存变慢超过阈值即视为回归,退出码为 1
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# 允许从 backend 目录导入 service 模块
+sys.path.insert(0, str(BACKEND_DIR))
+
+CORPUS_DIR = BACKEND_DIR / "data" / "bench_corpus"
+
+# 语料生成算法版本,修改 synthesize_voice 时递增,旧缓存自动失效
+CORPUS_VERSION = 1
+
+FORMATS = ("wav", "webm", "mp3")
+TARGETS = ("features", "analyzer", "mfcc")
+
+# 对比时忽略小于该值 (毫秒) 的绝对变化,避免毫秒级阶段的抖动误报
+MIN_DELTA_MS = 2.0
+
+
+# ==================== 语料 ====================
+
+def synthesize_voice(rng: np.random.Generator, duration: float, sr: int, f0: float) -> np.ndarray:
+    """
+    生成类人声信号: 带颤音和缓慢音高漂移的谐波,叠加共振峰包络、音节起落和少量噪声
+
+    Returns:
+        float32 单声道波形
+    """
+    n = int(duration * sr)
+    t = np.arange(n) / sr
+
+    # 音高: 慢漂移 (乐句起伏) + 5-6Hz 颤音
+    drift = 1 + 0.08 * np.sin(2 * np.pi * rng.uniform(0.05, 0.2) * t + rng.uniform(0, 2 * np.pi))
+    vibrato = 1 + 0.02 * np.sin(2 * np.pi * rng.uniform(5.0, 6.5) * t)
+    f0_track = f0 * drift * vibrato
+    phase = 2 * np.pi * np.cumsum(f0_track) / sr
+
+    # 谐波幅度: 1/k 衰减,叠加两个共振峰 (约 700Hz / 1200Hz 附近)
+    formants = rng.uniform([500, 1000], [900, 1600])
+    y = np.zeros(n)
+    for k in range(1, 25):
+        freq = k * f0
+        if freq >= sr / 2 * 0.9:
+            break
+        gain = (1 / k) * (1 + sum(2 * np.exp(-((freq - fc) / 200) ** 2) for fc in formants))
+        y += gain * np.sin(k * phase)
+
+    # 音节包络: 0.2-0.6 秒一段,段间有短暂停顿
+    envelope = np.zeros(n)
+    pos = 0
+    while pos < n:
+        length = int(rng.uniform(0.2, 0.6) * sr)
+        gap = int(rng.uniform(0.03, 0.15) * sr)
+        segment = np.hanning(min(length, n - pos))
+        envelope[pos:pos + len(segment)] = segment
+        pos += length + gap
+
+    y = y * envelope
+    y = y / (np.max(np.abs(y)) + 1e-9) * 0.5
+    y += rng.standard_normal(n) * 0.003
+    return y.astype(np.float32)
+
+
+def corpus_spec(n_clips: int, seed: int, sr: int) -> list[dict]:
+    """
+    语料清单 (只由参数决定)
+
+    Returns:
+        [{name, duration, f0, format}]
+    """
+    rng = np.random.default_rng(seed)
+    durations = np.linspace(3, 60, n_clips) if n_clips > 1 else np.array([3.0])
+    f0s = rng.uniform(90, 330, size=n_clips)
+    return [
+        {
+            'name': f"clip{i:02d}_{int(durations[i])}s_{int(f0s[i])}hz",
+            'duration': float(round(durations[i], 1)),
+            'f0': float(round(f0s[i], 1)),
+            'format': FORMATS[i % len(FORMATS)],
+            'sr': sr
+        }
+        for i in range(n_clips)
+    ]
+
+
+def spec_fingerprint(spec: list[dict], seed: int) -> str:
+    payload = json.dumps({'version': CORPUS_VERSION, 'seed': seed, 'clips': spec}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def encode_clip(y: np.ndarray, sr: int, fmt: str, path: Path) -> str | None:
+    """
+    按格式写入音频
+
+    Returns:
+        使用的编码器,无可用编码器时返回 None
+    """
+    if fmt == "wav":
+        sf.write(path, y, sr, subtype='PCM_16')
+        return "soundfile"
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        codec = ["-c:a", "libopus", "-b:a", "64k"] if fmt == "webm" else ["-c:a", "libmp3lame", "-b:a", "128k"]
+        result = subprocess.run(
+            [ffmpeg, "-v", "error", "-y", "-f", "f32le", "-ar", str(sr), "-ac", "1", "-i", "pipe:0",
+             *codec, str(path)],
+            input=y.astype(np.float32).tobytes(),
+            capture_output=True
+        )
+        if result.returncode == 0:
+            return "ffmpeg"
+
+    # libsndfile >= 1.1 可以直接写 MP3
+    if fmt == "mp3" and "MP3" in sf.available_formats():
+        sf.write(path, y, sr, format='MP3')
+        return "soundfile"
+    return None
+
+
+def build_corpus(spec: list[dict], seed: int, corpus_dir: Path) -> dict:
+    """
+    生成 (或复用) 语料
+
+    Returns:
+        {fingerprint, clips: [{..., path, encoder}], skipped: [name]}
+    """
+    fingerprint = spec_fingerprint(spec, seed)
+    target_dir = corpus_dir / fingerprint
+    manifest_path = target_dir / "manifest.json"
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+        if all(Path(c['path']).exists() for c in manifest['clips']):
+            print(f"✓ 复用语料: {target_dir} ({len(manifest['clips'])} 个片段)")
+            return manifest
+
+    target_dir.mkdir(parents=True, exist_ok=True)
+    print(f"🎵 生成语料: {target_dir}")
+    clips, skipped = [], []
+    for i, clip in enumerate(spec):
+        # 每个片段使用独立的子种子,增删片段不影响其他片段的内容
+        rng = np.random.default_rng([seed, i])
+        y = synthesize_voice(rng, clip['duration'], clip['sr'], clip['f0'])
+        path = target_dir / f"{clip['name']}.{clip['format']}"
+        encoder = encode_clip(y, clip['sr'], clip['format'], path)
+        if encoder is None:
+            print(f"   ⚠️ 跳过 {path.name}: 没有可用的 {clip['format']} 编码器 (需要 ffmpeg)")
+            skipped.append(clip['name'])
+            continue
+        clips.append({**clip, 'path': str(path), 'encoder': encoder, 'bytes': path.stat().st_size})
+        print(f"   ✓ {path.name} ({clip['duration']}s, {path.stat().st_size / 1024:.0f}KB, {encoder})")
+
+    manifest = {'fingerprint': fingerprint, 'clips': clips, 'skipped': skipped}
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+    return manifest
+
+
+# ==================== 计时 (在子进程中运行) ====================
+
+def _peak_rss_mb() -> float | None:
+    """当前进程的峰值常驻内存 (Windows 上没有 resource 模块,返回 None)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB,macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _call_target(target: str, path: str):
+    """
+    调用一次目标函数
+
+    Returns:
+        {阶段: 秒}
+    """
+    from service.metrics import StageTimer
+    timer = StageTimer()
+    if target == "features":
+        from service.audio_feature_extractor import extract_audio_features
+        features = extract_audio_features(path)
+        if features.get('is_fallback'):
+            raise RuntimeError(f"特征提取失败 (返回了默认特征): {path}")
+        return features['stage_timings']
+    if target == "analyzer":
+        from service.audio_analyzer import AudioAnalyzer
+        AudioAnalyzer.analyze_audio_file(path, timer=timer)
+    else:
+        from service.audio_analyzer import AudioAnalyzer
+        AudioAnalyzer.extract_mfcc_feature_vector(path, timer=timer)
+    return timer.timings
+
+
+def run_target(target: str, clips: list[dict], repeat: int, warmup_path: str) -> dict:
+    """
+    在当前 (子) 进程中测量一个目标
+
+    Returns:
+        {samples: [{clip, format, duration, total, stages}], peak_rss_mb, wall_seconds}
+    """
+    import logging
+    logging.disable(logging.INFO)
+
+    # 预热: 导入 librosa 并触发 numba 编译,不计入结果
+    _call_target(target, warmup_path)
+
+    samples = []
+    wall_start = time.perf_counter()
+    for _ in range(repeat):
+        for clip in clips:
+            start = time.perf_counter()
+            stages = _call_target(target, clip['path'])
+            total = time.perf_counter() - start
+            samples.append({
+                'clip': clip['name'],
+                'format': clip['format'],
+                'duration': clip['duration'],
+                'total': total,
+                'stages': stages
+            })
+    return {
+        'samples': samples,
+        'wall_seconds': time.perf_counter() - wall_start,
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+
+# ==================== 报告 ====================
+
+def _summary_ms(values: list[float]) -> dict:
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)) * 1000, 3),
+        'p95_ms': round(float(np.percentile(values, 95)) * 1000, 3),
+        'mean_ms': round(float(np.mean(values)) * 1000, 3)
+    }
+
+
+def summarize(raw: dict) -> dict:
+    """单个目标的原始样本 -> 统计"""
+    samples = raw['samples']
+    audio_seconds = sum(s['duration'] for s in samples)
+    stage_names = sorted({stage for s in samples for stage in s['stages']})
+    formats = sorted({s['format'] for s in samples})
+    return {
+        'runs': len(samples),
+        'total': _summary_ms([s['total'] for s in samples]),
+        'stages': {
+            stage: _summary_ms([s['stages'].get(stage, 0.0) for s in samples])
+            for stage in stage_names
+        },
+        'by_format': {
+            fmt: _summary_ms([s['total'] for s in samples if s['format'] == fmt])
+            for fmt in formats
+        },
+        'throughput': {
+            'clips_per_s': round(len(samples) / raw['wall_seconds'], 3),
+            # 每秒墙钟时间处理的音频秒数 (实时倍率)
+            'audio_s_per_s': round(audio_seconds / raw['wall_seconds'], 2)
+        },
+        'peak_rss_mb': round(raw['peak_rss_mb'], 1) if raw['peak_rss_mb'] is not None else None
+    }
+
+
+def environment() -> dict:
+    import librosa
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'librosa': librosa.__version__,
+        'soundfile': sf.__version__,
+        'libsndfile': sf.__libsndfile_version__,
+        'ffmpeg': shutil.which("ffmpeg") is not None
+    }
+
+
+def run_benchmark(args) -> dict:
+    spec = corpus_spec(args.clips, args.seed, args.sr)
+    corpus = build_corpus(spec, args.seed, Path(args.corpus_dir))
+    if not corpus['clips']:
+        raise SystemExit("❌ 语料为空")
+
+    # 预热片段: 语料中最短的 wav
+    warmup = min((c for c in corpus['clips'] if c['format'] == 'wav'),
+                 key=lambda c: c['duration'], default=corpus['clips'][0])
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'corpus': {
+            'fingerprint': corpus['fingerprint'],
+            'seed': args.seed,
+            'clips': len(corpus['clips']),
+            'skipped': corpus['skipped'],
+            'audio_seconds': round(sum(c['duration'] for c in corpus['clips']), 1),
+            'encoders': sorted({f"{c['format']}:{c['encoder']}" for c in corpus['clips']})
+        },
+        'repeat': args.repeat,
+        'environment': environment(),
+        'targets': {}
+    }
+
+    # 每个目标一个全新的 spawn 子进程,峰值 RSS 互不影响
+    context = multiprocessing.get_context("spawn")
+    for target in args.targets:
+        print(f"⏱️  {target} ...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            raw = pool.submit(run_target, target, corpus['clips'], args.repeat, warmup['path']).result()
+        report['targets'][target] = summarize(raw)
+    return report
+
+
+def print_report(report: dict) -> None:
+    corpus = report['corpus']
+    print("=" * 78)
+    print(f"📊 流水线基准: {corpus['clips']} 个片段 ({corpus['audio_seconds']}s 音频), "
+          f"重复 {report['repeat']} 次, 语料 {corpus['fingerprint']}")
+    if corpus['skipped']:
+        print(f"⚠️  跳过的片段: {', '.join(corpus['skipped'])}")
+    print("=" * 78)
+    print(f"{'目标 / 阶段':<30}{'p50 (ms)':>12}{'p95 (ms)':>12}{'mean (ms)':>12}")
+    for target, result in report['targets'].items():
+        total = result['total']
+        print(f"{target:<30}{total['p50_ms']:>12.1f}{total['p95_ms']:>12.1f}{total['mean_ms']:>12.1f}")
+        for stage, stats in result['stages'].items():
+            print(f"{'  ' + stage:<30}{stats['p50_ms']:>12.1f}{stats['p95_ms']:>12.1f}{stats['mean_ms']:>12.1f}")
+        for fmt, stats in result['by_format'].items():
+            print(f"{'  [' + fmt + ']':<30}{stats['p50_ms']:>12.1f}{stats['p95_ms']:>12.1f}{stats['mean_ms']:>12.1f}")
+        rss = result['peak_rss_mb']
+        print(f"  吞吐: {result['throughput']['clips_per_s']} 片段/s, "
+              f"{result['throughput']['audio_s_per_s']}x 实时, 峰值 RSS: {rss if rss is not None else '-'} MB")
+    print("=" * 78)
+
+
+# ==================== 对比 ====================
+
+def compare_reports(baseline: dict, current: dict, threshold: float,
+                    min_delta_ms: float = MIN_DELTA_MS) -> list[str]:
+    """
+    对比两份报告
+
+    Args:
+        threshold: 允许的相对变慢比例 (0.1 = 10%)
+        min_delta_ms: 耗时的绝对变化不超过该值时不算回归
+
+    Returns:
+        回归描述列表,为空表示没有回归
+    """
+    if baseline['corpus']['fingerprint'] != current['corpus']['fingerprint']:
+        print("⚠️  两份报告的语料不同,对比结果仅供参考")
+
+    regressions = []
+    print("=" * 78)
+    print(f"{'指标':<44}{'基线':>10}{'当前':>10}{'变化':>10}")
+    for target, result in current['targets'].items():
+        base = baseline['targets'].get(target)
+        if base is None:
+            continue
+        rows = [(f"{target} total", base['total'], result['total'])]
+        rows += [
+            (f"{target} {stage}", base['stages'][stage], stats)
+            for stage, stats in result['stages'].items() if stage in base['stages']
+        ]
+        for label, old, new in rows:
+            for key in ('p50_ms', 'p95_ms'):
+                change = (new[key] - old[key]) / old[key] if old[key] else 0.0
+                regressed = change > threshold and new[key] - old[key] > min_delta_ms
+                mark = " ❌" if regressed else ""
+                print(f"{label + ' ' + key:<44}{old[key]:>10.1f}{new[key]:>10.1f}{change:>+10.1%}{mark}")
+                if regressed:
+                    regressions.append(f"{label} {key}: {old[key]:.1f} -> {new[key]:.1f} ms ({change:+.1%})")
+
+        old_rss, new_rss = base.get('peak_rss_mb'), result.get('peak_rss_mb')
+        if old_rss and new_rss:
+            change = (new_rss - old_rss) / old_rss
+            regressed = change > threshold
+            print(f"{target + ' peak_rss_mb':<44}{old_rss:>10.1f}{new_rss:>10.1f}{change:>+10.1%}{' ❌' if regressed else ''}")
+            if regressed:
+                regressions.append(f"{target} peak_rss_mb: {old_rss:.1f} -> {new_rss:.1f} MB ({change:+.1%})")
+    print("=" * 78)
+
+    if regressions:
+        print(f"❌ 发现 {len(regressions)} 项回归 (阈值 {threshold:.0%}):")
+        for line in regressions:
+            print(f"   - {line}")
+    else:
+        print(f"✅ 没有超过 {threshold:.0%} 的回归")
+    return regressions
+
+
+def _load_report(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="音频分析流水线基准测试")
+    parser.add_argument('--clips', type=int, default=9, help="语料片段数 (时长在 3-60 秒之间均匀分布)")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--sr', type=int, default=44100, help="语料采样率")
+    parser.add_argument('--repeat', type=int, default=1, help="每个片段重复次数")
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS),
+                        help="features=extract_audio_features, analyzer=analyze_audio_file, "
+                             "mfcc=extract_mfcc_feature_vector")
+    parser.add_argument('--corpus-dir', type=str, default=str(CORPUS_DIR), help="语料缓存目录")
+    parser.add_argument('--json', type=str, default=None, help="将结果写入 JSON 文件")
+    parser.add_argument('--baseline', type=str, default=None, help="运行后与该基线报告对比")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), default=None,
+                        help="只对比两份已有报告,不运行基准")
+    parser.add_argument('--threshold', type=float, default=0.10, help="回归阈值 (相对变慢比例)")
+    parser.add_argument('--min-delta-ms', type=float, default=MIN_DELTA_MS, help="忽略小于该值的绝对耗时变化")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare_reports(_load_report(args.compare[0]), _load_report(args.compare[1]),
+                                      args.threshold, args.min_delta_ms)
+        sys.exit(1 if regressions else 0)
+
+    report = run_benchmark(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✓ 结果已写入: {args.json}")
+
+    if args.baseline:
+        regressions = compare_reports(_load_report(args.baseline), report, args.threshold, args.min_delta_ms)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,36 @@
 离线音频特征提取脚本 (网络增强版)
 遍历本地音乐文件夹，提取 MFCC 声学特征并更新到数据库
 采用反向模糊匹配：先拉取所有数据库歌曲，然后检查文件名是否包含数据库中的 title
+
+用法:
+    python scripts/extract_features.py               # 并行模式，worker 数 = CPU 核数
+    python scripts/extract_features.py --workers 1   # 单进程逐首处理 (旧模式)
+    python scripts/extract_features.py --full        # 忽略本地特征库和数据库已有特征，全部重新提取
+    python scripts/extract_features.py --stale-only  # 只升级旧版本特征向量 (见 service/feature_schema.py)
+
+增量模式：本地特征库 (data/feature_store.sqlite3) 按 路径 + 大小 + 修改时间 + 内容哈希 记录每个文件的特征，
+未变化的文件不解码，只有新提取或尚未写入当前歌曲的特征才推送到数据库。
+断点续传只看本地特征库，启动时不再拉取数据库中的 feature_vector (只拉 id/title/artist/feature_version)；
+本地特征库为空时首次运行会重新提取全部匹配文件
+
+NOTE: 并行模式的批量写入使用 migrations/add_batch_update_features_rpc.sql 中的函数，
+      未执行迁移时自动回退为逐条更新
+NOTE: 特征向量与在线分析共用 service.feature_schema 的实现，写入时同时写入 feature_version，
+      需先执行 migrations/add_feature_version.sql；数据库中版本过旧的向量视为缺失，会被重新提取
 """
 import os
 import sys
+import time
+import queue
+import argparse
+import threading
 import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
 from typing import List, Dict, Tuple
 from dotenv import load_dotenv
 # 1. 引入 ClientOptions 用于设置超时
 from supabase import create_client, Client, ClientOptions
-import librosa
 import numpy as np
 
 # 配置日志
@@ -21,6 +41,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 允许从 backend 目录导入 service 模块
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+from service.ann_index import IVFIndex
+from service.title_matcher import TitleMatcher, MatchResult, write_ambiguity_report
+from service.feature_store import FeatureStore, file_content_hash
+from service.feature_schema import (
+    CURRENT_FEATURE_VERSION, extract_feature_vector
+)
+
 # 加载环境变量
 load_dotenv()
 
@@ -28,6 +58,15 @@ load_dotenv()
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 
+# 近似最近邻索引文件 (与后端 ann_index_path 默认值一致)
+ANN_INDEX_PATH = str(BACKEND_DIR / 'data' / 'song_ann_index.npz')
+
+# 本地特征库 (增量提取)
+FEATURE_STORE_PATH = str(BACKEND_DIR / 'data' / 'feature_store.sqlite3')
+
+# 歧义匹配报告 (文件名同时命中多首歌且无法区分时写入)
+MATCH_REPORT_PATH = str(BACKEND_DIR / 'data' / 'title_match_report.json')
+
 # 目标文件夹路径
 TARGET_FOLDERS = [
     r'F:\音乐',
@@ -35,11 +74,30 @@ TARGET_FOLDERS = [
 ]
 
 
+def _extract_job(file_path: str) -> Tuple[List[float] | None, float]:
+    """
+    进程池任务: 解码 + MFCC
+    
+    Returns:
+        (特征向量, 耗时秒数)
+    """
+    start = time.perf_counter()
+    features = FeatureExtractor.extract_mfcc_features(file_path)
+    return features, time.perf_counter() - start
+
+
 class FeatureExtractor:
     """音频特征提取器"""
     
-    def __init__(self):
-        """初始化 Supabase 客户端"""
+    def __init__(self, use_store: bool = True, full: bool = False, stale_only: bool = False):
+        """
+        初始化 Supabase 客户端
+        
+        Args:
+            use_store: 是否使用本地特征库做增量提取
+            full: 全量模式，忽略本地特征库和数据库已有特征，全部重新提取
+            stale_only: 升级模式，只处理数据库中特征向量版本过旧的歌曲
+        """
         if not SUPABASE_URL or not SUPABASE_KEY:
             raise ValueError("请在 .env 文件中设置 SUPABASE_URL 和 SUPABASE_KEY")
         
@@ -51,25 +109,31 @@ class FeatureExtractor:
             'total_files': 0,
             'success': 0,
             'failed': 0,
-            'skipped': 0
+            'skipped': 0,
+            'reused': 0
         }
+        # parallel_process 中主线程和写入线程都会更新 stats
+        self._stats_lock = threading.Lock()
+        # 写入线程遇到的第一个异常，主线程 join 之后重新抛出
+        self._writer_error: Exception | None = None
         # NOTE: 使用字典缓存数据库歌曲，key=id, value=完整歌曲记录
         self.db_songs: List[Dict] = []
+        self.matcher: TitleMatcher | None = None
+        self.last_match: MatchResult | None = None
+        self.ambiguous_matches: List[MatchResult] = []
+        # 本次运行新写入的特征，结束时增量更新 ANN 索引
+        self.new_vectors: List[Tuple[str, List[float]]] = []
+        self._batch_rpc_available = True
+        self.store: FeatureStore | None = FeatureStore(FEATURE_STORE_PATH) if use_store else None
+        self.full = full
+        self.stale_only = stale_only
     
     @staticmethod
     def extract_mfcc_features(audio_path: str) -> List[float]:
-        """提取 MFCC 声学特征向量"""
+        """提取 MFCC 声学特征向量 (当前版本，与在线分析 AudioAnalyzer.extract_mfcc_feature_vector 一致)"""
         try:
-            # 加载音频文件（统一重采样到 22050Hz，单声道，只读前2分钟提速）
-            y, sr = librosa.load(audio_path, sr=22050, mono=True, duration=120)
-            
-            # 提取 MFCC 特征（13个系数）
-            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            
-            # 对时间轴求平均值，将二维矩阵降维为一维向量
-            mfcc_mean = np.mean(mfccs, axis=1)
-            
-            return mfcc_mean.tolist()
+            # 只解码前2分钟提速，参数见 service/feature_schema.py
+            return extract_feature_vector(audio_path)
             
         except Exception as e:
             logger.error(f"特征提取失败: {str(e)}")
@@ -82,13 +146,16 @@ class FeatureExtractor:
         for attempt in range(max_retries):
             try:
                 logger.info(f"⬇️  正在从数据库拉取所有歌曲信息... (尝试 {attempt + 1}/{max_retries})")
-                # 查询时包含 feature_vector，用于断点续传
-                response = self.client.table('songs').select('id, title, artist, feature_vector').execute()
+                # 不拉取 feature_vector: 断点续传以本地特征库为准，feature_version 用于版本升级
+                response = self.client.table('songs').select('id, title, artist, feature_version').execute()
                 self.db_songs = response.data
+                self.matcher = TitleMatcher(self.db_songs)
                 
-                # 统计已有特征的歌曲数量
-                has_features = sum(1 for song in self.db_songs if song.get('feature_vector') is not None and len(song.get('feature_vector', [])) > 0)
-                logger.info(f"✅ 数据库中共有 {len(self.db_songs)} 首歌，其中 {has_features} 首已有特征。开始本地扫描匹配...\n")
+                # 统计已有特征的歌曲数量 (feature_version 由迁移脚本按向量维度回填)
+                has_features = sum(1 for song in self.db_songs if song.get('feature_version') == CURRENT_FEATURE_VERSION)
+                stale = sum(1 for song in self.db_songs if song.get('feature_version') not in (None, CURRENT_FEATURE_VERSION))
+                logger.info(f"✅ 数据库中共有 {len(self.db_songs)} 首歌，其中 {has_features} 首已有特征 (版本 {CURRENT_FEATURE_VERSION})，"
+                            f"{stale} 首特征版本过旧待升级。开始本地扫描匹配...\n")
                 return
             except Exception as e:
                 logger.warning(f"⚠️  拉取失败: {str(e)}")
@@ -118,24 +185,108 @@ class FeatureExtractor:
         return mp3_files
     
     def find_song_in_database(self, filename: str) -> Dict | None:
-        """根据文件名在数据库歌曲列表中查找对应的歌曲记录"""
-        for song in self.db_songs:
-            # 确保 title 存在且不是空字符串
-            if song['title'] and song['title'].strip() and song['title'] in filename:
-                return song
-        return None
+        """
+        根据文件名在数据库歌曲列表中查找对应的歌曲记录
+        NOTE: 通过 Aho-Corasick 索引一次扫描文件名，命中多首且无法区分时返回 None 并记入歧义报告
+        """
+        if self.matcher is None:
+            self.matcher = TitleMatcher(self.db_songs)
+        self.last_match = self.matcher.match(filename)
+        if self.last_match.ambiguous:
+            self.ambiguous_matches.append(self.last_match)
+        return self.last_match.song
     
     def update_song_features(self, song_id: str, features: List[float]) -> bool:
         """更新歌曲的特征向量到数据库"""
         try:
             self.client.table('songs').update({
-                'feature_vector': features
+                'feature_vector': features,
+                'feature_version': CURRENT_FEATURE_VERSION
             }).eq('id', song_id).execute()
             return True
         except Exception as e:
             logger.error(f"数据库更新失败: {str(e)}")
             return False
     
+    def update_song_features_batch(self, updates: List[Tuple[str, List[float]]],
+                                   max_retries: int = 3) -> List[Tuple[str, List[float]]]:
+        """
+        批量更新特征向量 (一次 RPC 写入一批)
+        
+        Returns:
+            成功写入的 [(歌曲ID, 特征向量)]
+        """
+        if self._batch_rpc_available:
+            payload = [
+                {'id': song_id, 'feature_vector': features, 'feature_version': CURRENT_FEATURE_VERSION}
+                for song_id, features in updates
+            ]
+            for attempt in range(1, max_retries + 1):
+                try:
+                    self.client.rpc('update_song_features', {'updates': payload}).execute()
+                    return updates
+                except Exception as e:
+                    if getattr(e, 'code', None) in ('PGRST202', '42883'):
+                        logger.warning("⚠️  数据库缺少 update_song_features 函数，回退为逐条更新 "
+                                       "(请执行 migrations/add_batch_update_features_rpc.sql)")
+                        self._batch_rpc_available = False
+                        break
+                    if attempt == max_retries:
+                        logger.error(f"批量更新失败 ({len(updates)} 首): {str(e)}")
+                        return []
+                    time.sleep(2 ** (attempt - 1))
+        return [(song_id, features) for song_id, features in updates
+                if self.update_song_features(song_id, features)]
+    
+    def check_local_store(self, file_path: str, song: Dict) -> Tuple[str, List[float] | None, str | None]:
+        """
+        根据本地特征库判断文件是否需要重新提取
+        
+        Returns:
+            (动作, 可复用的特征向量, 内容哈希)
+            动作: 'skip' 无需处理 / 'push' 复用本地特征写入数据库 / 'extract' 重新提取
+        """
+        remote_version = song.get('feature_version')
+        if self.stale_only and remote_version in (None, CURRENT_FEATURE_VERSION):
+            return 'skip', None, None  # 升级模式只处理旧版本向量
+        
+        if self.store is None:
+            # 不使用本地特征库时只能按数据库记录的版本跳过 (旧版本向量视为缺失)
+            has_remote = remote_version == CURRENT_FEATURE_VERSION
+            return ('extract' if self.full or not has_remote else 'skip'), None, None
+        
+        stat = os.stat(file_path)
+        if self.full:
+            return 'extract', None, file_content_hash(file_path)
+        
+        record = self.store.get(file_path)
+        content_hash = None
+        if record and record.feature_version != CURRENT_FEATURE_VERSION:
+            content_hash = record.content_hash if record.same_stat(stat) else None
+            record = None  # 本地特征版本过旧，需要重新提取
+        if record and not record.same_stat(stat):
+            content_hash = file_content_hash(file_path)
+            if record.content_hash == content_hash:
+                self.store.touch(file_path, stat)  # 只是修改时间变了 (touch / 复制)
+            else:
+                record = None  # 内容变化，必须重新提取
+        
+        if record is None:
+            content_hash = content_hash or file_content_hash(file_path)
+            moved = self.store.find_by_hash(content_hash, CURRENT_FEATURE_VERSION)
+            if moved:
+                # 改名/移动的文件，复用旧特征
+                self.store.put(file_path, stat, content_hash, moved.feature_vector,
+                               CURRENT_FEATURE_VERSION, moved.pushed_song_id)
+                if moved.pushed_song_id == song['id']:
+                    return 'skip', None, content_hash
+                return 'push', moved.feature_vector, content_hash
+            return 'extract', None, content_hash
+        
+        if record.pushed_song_id == song['id']:
+            return 'skip', None, record.content_hash
+        return 'push', record.feature_vector, record.content_hash
+    
     def process_audio_file(self, file_path: str) -> Tuple[bool, str]:
         """处理单个音频文件"""
         try:
@@ -147,24 +298,35 @@ class FeatureExtractor:
             if not matched_song:
                 # logger.warning(f"⚠️  未找到匹配: {filename}") # 太多了可以注释掉
                 self.stats['skipped'] += 1
+                if self.last_match.ambiguous:
+                    return False, "匹配到多首歌曲"
                 return False, "数据库中未找到匹配记录"
             
-            # 🔄 断点续传：检查是否已有特征向量
-            if matched_song.get('feature_vector') is not None and len(matched_song.get('feature_vector', [])) > 0:
-                # 已经有特征了，跳过
+            # 🔄 断点续传：本地特征库中已有当前歌曲的特征则跳过
+            action, features, content_hash = self.check_local_store(file_path, matched_song)
+            if action == 'skip':
                 self.stats['skipped'] += 1
                 return False, "已有特征"
             
             logger.info(f"🎯 匹配成功: [{matched_song['title']}] <== {filename}")
             
-            # 2. 提取特征
-            features = self.extract_mfcc_features(file_path)
+            # 2. 提取特征 (本地特征库中已有且内容未变时直接复用)
+            if action == 'push':
+                self.stats['reused'] += 1
+                logger.info(f"   ♻️  复用本地特征")
+            else:
+                features = self.extract_mfcc_features(file_path)
+                if features and self.store is not None:
+                    self.store.put(file_path, os.stat(file_path), content_hash, features, CURRENT_FEATURE_VERSION)
             
             if features:
                 # 3. 更新数据库
                 success = self.update_song_features(matched_song['id'], features)
                 if success:
                     logger.info(f"   ✅ 特征已上传")
+                    if self.store is not None:
+                        self.store.mark_pushed([(file_path, matched_song['id'])])
+                    self.new_vectors.append((matched_song['id'], features))
                     self.stats['success'] += 1
                     return True, "成功"
                 else:
@@ -228,6 +390,203 @@ class FeatureExtractor:
                 unmatched_samples.append(Path(file_path).stem)
         
         self._print_summary(unmatched_samples)
+        self.update_ann_index()
+    
+    def plan_jobs(self, mp3_files: List[str], unmatched_samples: List[str]) -> Tuple[List[Tuple], List[Tuple]]:
+        """
+        在主进程中完成文件名匹配和增量过滤 (字符串比较 + 本地特征库查询，不解码音频)
+        
+        Returns:
+            (待提取的 [(歌曲ID, 文件路径, 内容哈希)], 可直接推送的 [(歌曲ID, 特征向量, 文件路径)])
+        """
+        jobs = []
+        pushes = []
+        planned_ids = set()
+        for file_path in mp3_files:
+            filename = Path(file_path).stem
+            matched_song = self.find_song_in_database(filename)
+            if not matched_song:
+                self.stats['skipped'] += 1
+                if self.last_match.ambiguous:
+                    continue  # 歧义匹配，见匹配报告
+                if len(unmatched_samples) < 10:
+                    unmatched_samples.append(filename)
+                continue
+            # 🔄 断点续传：本次已安排的歌曲跳过
+            if matched_song['id'] in planned_ids:
+                self.stats['skipped'] += 1
+                continue
+            try:
+                action, features, content_hash = self.check_local_store(file_path, matched_song)
+            except OSError as e:
+                logger.error(f"❌ 读取文件失败: {filename} - {str(e)}")
+                self.stats['failed'] += 1
+                continue
+            if action == 'skip':
+                self.stats['skipped'] += 1
+                continue
+            planned_ids.add(matched_song['id'])
+            if action == 'push':
+                self.stats['reused'] += 1
+                pushes.append((matched_song['id'], features, file_path))
+            else:
+                jobs.append((matched_song['id'], file_path, content_hash))
+        return jobs, pushes
+    
+    def parallel_process(self, workers: int, batch_size: int = 100, queue_size: int = 256):
+        """
+        并行批量处理
+        
+        - 进程池并行解码 + MFCC (在途任务数限制为 workers * 2，避免一次性提交上万个任务)
+        - 结果经有界队列交给写入线程，按 batch_size 批量写库；写库变慢时队列写满，反压到提取端
+        
+        Args:
+            workers: 进程数
+            batch_size: 每批写入的歌曲数
+            queue_size: 提取结果队列容量
+        """
+        print(f"🎵 音频特征提取工具（并行模式: {workers} 个进程）")
+        print("=" * 80)
+        
+        try:
+            self.load_database_songs()
+        except:
+            return # 如果一开始就连不上网，直接退出
+        
+        if not self.db_songs:
+            logger.warning("⚠️  数据库中没有任何歌曲记录")
+            return
+        
+        mp3_files = self.scan_folders(TARGET_FOLDERS)
+        if not mp3_files:
+            logger.warning("⚠️  未找到任何 MP3 文件")
+            return
+        self.stats['total_files'] = len(mp3_files)
+        
+        unmatched_samples: List[str] = []
+        jobs, pushes = self.plan_jobs(mp3_files, unmatched_samples)
+        logger.info(f"✓ 找到 {len(mp3_files)} 个 MP3 文件，其中 {len(jobs)} 首需要提取特征，"
+                    f"{len(pushes)} 首复用本地特征\n")
+        
+        results: queue.Queue = queue.Queue(maxsize=queue_size)
+        writer = threading.Thread(target=self._writer_loop, args=(results, batch_size), daemon=True)
+        writer.start()
+        for item in pushes:
+            results.put(item)
+        
+        start = time.perf_counter()
+        extract_seconds = 0.0
+        done = 0
+        pending_jobs = iter(jobs)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = {}
+            
+            def submit_next() -> None:
+                for song_id, file_path, content_hash in pending_jobs:
+                    in_flight[pool.submit(_extract_job, file_path)] = (song_id, file_path, content_hash)
+                    return
+            
+            for _ in range(workers * 2):
+                submit_next()
+            
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    song_id, file_path, content_hash = in_flight.pop(future)
+                    submit_next()
+                    done += 1
+                    try:
+                        features, seconds = future.result()
+                    except Exception as e:
+                        logger.error(f"❌ 处理失败: {Path(file_path).stem} - {str(e)}")
+                        features, seconds = None, 0.0
+                    extract_seconds += seconds
+                    if features:
+                        if self.store is not None:
+                            self.store.put(file_path, os.stat(file_path), content_hash, features,
+                                           CURRENT_FEATURE_VERSION)
+                        results.put((song_id, features, file_path))  # 队列满时阻塞 (反压)
+                    else:
+                        with self._stats_lock:
+                            self.stats['failed'] += 1
+                    
+                    if done % 50 == 0 or done == len(jobs):
+                        elapsed = time.perf_counter() - start
+                        rate = done / elapsed if elapsed > 0 else 0.0
+                        eta = (len(jobs) - done) / rate if rate > 0 else 0.0
+                        print(f"[{done}/{len(jobs)}] {rate:.2f} 首/秒，待写入 {results.qsize()}，"
+                              f"预计剩余 {eta / 60:.1f} 分钟")
+        
+        results.put(None)  # 通知写入线程结束
+        writer.join()
+        
+        elapsed = time.perf_counter() - start
+        print(f"\n⏱️  总耗时 {elapsed:.1f}s，吞吐 {done / elapsed if elapsed > 0 else 0:.2f} 首/秒，"
+              f"单首平均提取 {extract_seconds / done if done else 0:.2f}s (并行加速约 "
+              f"{extract_seconds / elapsed if elapsed > 0 else 0:.1f}x)")
+        self._print_summary(unmatched_samples)
+        self.update_ann_index()
+        if self._writer_error is not None:
+            raise self._writer_error
+    
+    def _writer_loop(self, results: queue.Queue, batch_size: int, flush_interval: float = 5.0):
+        """写入线程: 攒够 batch_size 或距上次写入超过 flush_interval 秒时批量写库"""
+        batch: List[Tuple[str, List[float], str]] = []
+        last_flush = time.monotonic()
+        finished = False
+        while not finished:
+            try:
+                item = results.get(timeout=flush_interval)
+            except queue.Empty:
+                item = ...
+            if item is None:
+                finished = True
+            elif item is not ...:
+                batch.append(item)
+            
+            if batch and (finished or len(batch) >= batch_size or time.monotonic() - last_flush >= flush_interval):
+                try:
+                    self._flush_batch(batch)
+                except Exception as e:
+                    # 写入线程不能退出：否则主线程会永远阻塞在有界队列的 put 上。记录异常并继续消费队列
+                    logger.error(f"❌ 批量写入出错，继续处理后续批次: {str(e)}")
+                    if self._writer_error is None:
+                        self._writer_error = e
+                batch = []
+                last_flush = time.monotonic()
+    
+    def _flush_batch(self, batch: List[Tuple[str, List[float], str]]) -> None:
+        """写入一批特征，并更新统计、本地特征库推送标记和 ANN 待写入列表"""
+        try:
+            written = self.update_song_features_batch([(song_id, features) for song_id, features, _ in batch])
+        except Exception:
+            with self._stats_lock:
+                self.stats['failed'] += len(batch)
+            raise
+        with self._stats_lock:
+            self.stats['success'] += len(written)
+            self.stats['failed'] += len(batch) - len(written)
+        logger.info(f"   💾 已批量写入 {len(written)}/{len(batch)} 首")
+        self.new_vectors.extend(written)
+        if self.store is not None and written:
+            paths = {song_id: file_path for song_id, _, file_path in batch}
+            self.store.mark_pushed([(paths[song_id], song_id) for song_id, _ in written])
+    
+    def update_ann_index(self):
+        """将本次新增的特征向量增量写入 ANN 索引文件"""
+        if not self.new_vectors:
+            return
+        try:
+            ids = [song_id for song_id, _ in self.new_vectors]
+            vectors = np.array([vector for _, vector in self.new_vectors], dtype=np.float32)
+            index = IVFIndex.load_or_empty(ANN_INDEX_PATH)
+            if len(index) > 0 and index.dim != vectors.shape[1]:
+                logger.warning("⚠️  特征维度变化，重新构建 ANN 索引")
+                index = IVFIndex()
+            index.add(ids, vectors).save(ANN_INDEX_PATH)
+            print(f"🧭 ANN 索引已更新: 共 {len(index)} 个向量 -> {ANN_INDEX_PATH}")
+        except Exception as e:
+            logger.error(f"❌ ANN 索引更新失败: {str(e)}")
     
     def _print_summary(self, unmatched_samples: List[str] = None):
         """打印处理统计"""
@@ -236,7 +595,8 @@ class FeatureExtractor:
         print(f"   总文件数: {self.stats['total_files']}")
         print(f"   ✅ 成功上传: {self.stats['success']}")
         print(f"   ❌ 失败: {self.stats['failed']}")
-        print(f"   ⚠️  跳过（无记录）: {self.stats['skipped']}")
+        print(f"   ♻️  复用本地特征: {self.stats['reused']}")
+        print(f"   ⚠️  跳过（无记录/未变化）: {self.stats['skipped']}")
         print("=" * 80)
         
         # 🔍 显示未匹配文件名示例
@@ -245,11 +605,33 @@ class FeatureExtractor:
             for i, filename in enumerate(unmatched_samples, 1):
                 print(f"   {i}. {filename}")
             print("\n💡 提示：请检查这些文件名是否包含数据库中的歌曲名。")
+        
+        # 🔍 歧义匹配报告
+        if self.ambiguous_matches:
+            try:
+                os.makedirs(os.path.dirname(MATCH_REPORT_PATH), exist_ok=True)
+                write_ambiguity_report(self.ambiguous_matches, MATCH_REPORT_PATH)
+                print(f"\n⚠️  {len(self.ambiguous_matches)} 个文件同时匹配到多首歌曲，已跳过，详见: {MATCH_REPORT_PATH}")
+            except OSError as e:
+                logger.error(f"❌ 歧义匹配报告写入失败: {str(e)}")
 
 def main():
     """主函数"""
-    extractor = FeatureExtractor()
-    extractor.batch_process()
+    parser = argparse.ArgumentParser(description="离线提取歌曲 MFCC 特征并写入数据库")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="并行进程数，1 表示单进程逐首处理")
+    parser.add_argument('--batch-size', type=int, default=100, help="并行模式每批写入的歌曲数")
+    parser.add_argument('--queue-size', type=int, default=256, help="并行模式提取结果队列容量")
+    parser.add_argument('--full', action='store_true', help="忽略本地特征库和数据库已有特征，全部重新提取")
+    parser.add_argument('--no-store', action='store_true', help="不使用本地特征库 (仅按数据库记录的特征版本断点续传)")
+    parser.add_argument('--stale-only', action='store_true', help="只重新提取数据库中版本过旧的特征向量")
+    args = parser.parse_args()
+    
+    extractor = FeatureExtractor(use_store=not args.no_store, full=args.full, stale_only=args.stale_only)
+    if args.workers > 1:
+        extractor.parallel_process(args.workers, args.batch_size, args.queue_size)
+    else:
+        extractor.batch_process()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
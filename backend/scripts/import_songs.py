@@ -1,12 +1,23 @@
 """
 批量导入歌曲脚本
 自动扫描本地 MP3，解析文件名（格式：编号.歌名 - 歌手 - 其他），并将信息录入 Supabase 数据库
+
+用法:
+    python scripts/import_songs.py                      # 逐条导入 (旧模式)
+    python scripts/import_songs.py --bulk               # 批量 upsert + 断点续传
+    python scripts/import_songs.py --bulk --batch-size 1000 --folders F:/音乐 F:/补货
+
+NOTE: 批量模式需要先执行 migrations/add_song_title_artist_unique.sql
 """
 import os
 import re
+import json
+import time
+import random
+import argparse
 import logging
 from pathlib import Path
-from typing import Tuple, List
+from typing import Any, Tuple, List
 from dotenv import load_dotenv
 from supabase import create_client, Client, ClientOptions
 
@@ -23,6 +34,7 @@ load_dotenv(dotenv_path=Path(__file__).parent.parent / '.env')
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 TARGET_FOLDERS = [r'F:\音乐', r'F:\补货']
+CHECKPOINT_FILE = Path(__file__).parent / '.import_songs_checkpoint.json'
 
 # 设置超时防止断连
 options = ClientOptions(postgrest_client_timeout=60)
@@ -73,7 +85,18 @@ def parse_filename(filename: str) -> Tuple[str | None, str | None]:
     return name, None
 
 
-def scan_and_import() -> None:
+def build_song_row(title: str, artist: str | None) -> dict[str, Any]:
+    """构建待写入 songs 表的一行"""
+    return {
+        "title": title,
+        "artist": artist if artist else "未知歌手",
+        "album": "本地导入",
+        "tag": "comfort",  # 默认为舒适区，以后可以在后台修改
+        "tag_label": "舒适区"  # 必需字段：标签的中文标签
+    }
+
+
+def scan_and_import(folders: List[str] = TARGET_FOLDERS) -> None:
     """扫描文件夹并批量导入歌曲到数据库"""
     print("🚀 开始扫描并导入歌曲到数据库...")
     print("=" * 80)
@@ -94,7 +117,7 @@ def scan_and_import() -> None:
     parse_failed_count = 0
     total_files = 0
 
-    for folder in TARGET_FOLDERS:
+    for folder in folders:
         if not os.path.exists(folder):
             logger.warning(f"文件夹不存在，跳过: {folder}")
             continue
@@ -118,13 +141,7 @@ def scan_and_import() -> None:
                 continue
                 
             # 准备插入的数据
-            new_song = {
-                "title": title,
-                "artist": artist if artist else "未知歌手",
-                "album": "本地导入",
-                "tag": "comfort",  # 默认为舒适区，以后可以在后台修改
-                "tag_label": "舒适区"  # 必需字段：标签的中文标签
-            }
+            new_song = build_song_row(title, artist)
             
             try:
                 supabase.table('songs').insert(new_song).execute()
@@ -148,10 +165,161 @@ def scan_and_import() -> None:
         print("💡 提示：现在可以运行 extract_features.py 提取音频特征了。")
 
 
+# ==================== 批量模式 ====================
+
+def load_checkpoint(path: Path) -> set[str]:
+    """读取已成功写入的文件路径集合"""
+    if not path.exists():
+        return set()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return set(json.load(f).get('done_files', []))
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️  断点文件损坏，将从头开始: {e}")
+        return set()
+
+
+def save_checkpoint(path: Path, done_files: set[str]) -> None:
+    """原子写入断点文件 (先写临时文件再替换)"""
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'done_files': sorted(done_files), 'updated_at': time.time()}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def upsert_batch(rows: List[dict[str, Any]], max_retries: int) -> int:
+    """
+    批量 upsert 一批歌曲，失败时指数退避重试
+    
+    Returns:
+        实际新增的行数 (已存在的 title+artist 被忽略，不覆盖后台修改过的标签)
+        
+    Raises:
+        ValueError: max_retries 小于 1
+        Exception: 重试耗尽
+    """
+    if max_retries < 1:
+        raise ValueError(f"max_retries 必须大于等于 1: {max_retries}")
+    for attempt in range(1, max_retries + 1):
+        try:
+            response = (
+                supabase.table('songs')
+                .upsert(rows, on_conflict='title,artist', ignore_duplicates=True)
+                .execute()
+            )
+            return len(response.data) if response.data else 0
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = min(30.0, 2 ** (attempt - 1)) + random.uniform(0, 0.5)
+            logger.warning(f"   ⚠️  批次写入失败 (第 {attempt}/{max_retries} 次)，{delay:.1f}s 后重试: {e}")
+            time.sleep(delay)
+
+
+def bulk_import(folders: List[str], batch_size: int = 500, max_retries: int = 5,
+                checkpoint_path: Path = CHECKPOINT_FILE) -> None:
+    """
+    批量导入: 解析后的行先缓冲，按批 upsert，每批成功后更新断点文件
+    
+    Args:
+        folders: 扫描的文件夹
+        batch_size: 每批写入行数
+        max_retries: 单批最大重试次数
+        checkpoint_path: 断点文件路径，中断后重新运行会跳过已写入的文件
+    """
+    print("🚀 批量导入模式")
+    print("=" * 80)
+    
+    done_files = load_checkpoint(checkpoint_path)
+    if done_files:
+        print(f"📋 断点续传: 跳过 {len(done_files)} 个已导入的文件\n")
+    
+    stats = {'files': 0, 'resumed': 0, 'parse_failed': 0, 'queued': 0, 'inserted': 0, 'failed_batches': 0}
+    buffer: dict[tuple[str, str], dict[str, Any]] = {}  # (title, artist) -> row，批内去重
+    buffer_files: List[str] = []
+    start_time = time.perf_counter()
+    
+    def flush() -> None:
+        if not buffer:
+            return
+        rows = list(buffer.values())
+        try:
+            inserted = upsert_batch(rows, max_retries)
+        except Exception as e:
+            stats['failed_batches'] += 1
+            logger.error(f"   ❌ 批次写入最终失败 ({len(rows)} 行)，这些文件下次运行会重试: {e}")
+        else:
+            stats['inserted'] += inserted
+            done_files.update(buffer_files)
+            save_checkpoint(checkpoint_path, done_files)
+            elapsed = time.perf_counter() - start_time
+            print(f"   ✅ 写入 {len(rows)} 行 (新增 {inserted})，累计 {stats['queued']} 行，"
+                  f"{stats['queued'] / elapsed:.1f} 行/秒")
+        buffer.clear()
+        buffer_files.clear()
+    
+    for folder in folders:
+        if not os.path.exists(folder):
+            logger.warning(f"文件夹不存在，跳过: {folder}")
+            continue
+        
+        print(f"📂 正在扫描文件夹: {folder}")
+        for file_path in Path(folder).rglob('*.mp3'):
+            stats['files'] += 1
+            key = str(file_path)
+            if key in done_files:
+                stats['resumed'] += 1
+                continue
+            
+            title, artist = parse_filename(file_path.name)
+            if not title:
+                stats['parse_failed'] += 1
+                continue
+            
+            row = build_song_row(title, artist)
+            buffer[(row['title'], row['artist'])] = row
+            buffer_files.append(key)
+            stats['queued'] += 1
+            if len(buffer) >= batch_size:
+                flush()
+    flush()
+    
+    elapsed = time.perf_counter() - start_time
+    print("\n" + "=" * 80)
+    print("📊 批量导入统计:")
+    print(f"   总文件数: {stats['files']}")
+    print(f"   ⏭️  断点跳过: {stats['resumed']}")
+    print(f"   ❌ 解析失败: {stats['parse_failed']}")
+    print(f"   📤 提交行数: {stats['queued']}")
+    print(f"   ✅ 新增: {stats['inserted']} 首")
+    print(f"   ⚠️  失败批次: {stats['failed_batches']}")
+    print(f"   ⏱️  耗时: {elapsed:.1f}s，吞吐: {stats['queued'] / elapsed if elapsed > 0 else 0:.1f} 行/秒")
+    print("=" * 80)
+    
+    if stats['inserted'] > 0:
+        print("💡 提示：现在可以运行 extract_features.py 提取音频特征了。")
+
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="扫描本地 MP3 并导入歌曲信息")
+    parser.add_argument('--folders', nargs='+', default=TARGET_FOLDERS, help="要扫描的文件夹")
+    parser.add_argument('--bulk', action='store_true', help="批量模式: 分批 upsert + 重试 + 断点续传")
+    parser.add_argument('--batch-size', type=int, default=500, help="批量模式每批行数")
+    parser.add_argument('--max-retries', type=int, default=5, help="批量模式单批最大重试次数")
+    parser.add_argument('--checkpoint', type=Path, default=CHECKPOINT_FILE, help="断点文件路径")
+    parser.add_argument('--reset-checkpoint', action='store_true', help="忽略并删除已有断点，从头导入")
+    args = parser.parse_args()
+    if args.max_retries < 1:
+        parser.error("--max-retries 必须大于等于 1")
+    
     try:
-        scan_and_import()
+        if args.bulk:
+            if args.reset_checkpoint and args.checkpoint.exists():
+                args.checkpoint.unlink()
+            bulk_import(args.folders, args.batch_size, args.max_retries, args.checkpoint)
+        else:
+            scan_and_import(args.folders)
     except KeyboardInterrupt:
         print("\n\n⚠️  用户中断操作")
     except Exception as e:
@@ -0,0 +1,247 @@
+"""
+音频分析执行器
+
+将 CPU 密集型的 librosa 计算从事件循环中卸载:
+- process 模式: 预热的 ProcessPoolExecutor,每个 worker 只导入一次 librosa 并完成 numba 编译,
+  不与事件循环争抢 GIL;worker 执行 N 个任务后自动回收,防止内存膨胀
+- thread 模式: 进程内线程池,用于本地调试和测试
+
+统一提供排队深度上限和单任务超时;进程池 worker 异常退出 (BrokenProcessPool) 时重建池并重试一次
+"""
+
+import asyncio
+import multiprocessing
+import logging
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisQueueFullError(Exception):
+    """分析任务排队已满"""
+
+
+class AnalysisTimeoutError(Exception):
+    """分析任务执行超时"""
+
+
+def _warm_up_worker() -> None:
+    """
+    worker 初始化函数
+
+    预先导入 librosa / soxr 并在一段短噪声上跑一遍解码和特征图,
+    触发 numba JIT 编译,避免首个真实请求承担编译开销
+    """
+    import io
+    import numpy as np
+    import soundfile as sf
+    from service.audio_decoder import decode_audio
+    from service.feature_graph import SpectralFeatureGraph
+
+    noise = np.random.default_rng(0).standard_normal(44100).astype(np.float32) * 0.01
+    buffer = io.BytesIO()
+    sf.write(buffer, noise, 44100, format='WAV')
+    y = decode_audio(buffer, ext='.wav', sr=16000).y
+    graph = SpectralFeatureGraph(y, 16000)
+    graph.piptrack(fmin=60, fmax=500, threshold=0.1)
+    graph.spectral_centroid()
+    graph.rms()
+    graph.mfcc()
+
+
+def _ping() -> bool:
+    """空任务,用于启动时拉起全部 worker"""
+    return True
+
+
+class AnalysisExecutor:
+    """
+    分析执行器
+
+    NOTE: 超时只会让调用方提前返回;进程池无法中断正在执行的单个任务,
+    超时任务会在 worker 中跑完,由 max_tasks_per_worker 回收机制兜底。
+    超时任务跑完之前继续占用排队名额,max_pending 始终约束 worker 上的真实负载
+    """
+
+    MODES = ("process", "thread")
+
+    def __init__(
+        self,
+        mode: str = "process",
+        max_workers: int = 2,
+        max_pending: int = 8,
+        task_timeout: float = 60.0,
+        max_tasks_per_worker: int | None = 200
+    ):
+        if mode not in self.MODES:
+            raise ValueError(f"未知的执行器模式: {mode}, 仅支持: {', '.join(self.MODES)}")
+
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.task_timeout = task_timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+
+        self._pool: Executor | None = None
+        self._pending = 0
+        # start / 重建可能在多个线程中同时发生
+        self._start_lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """当前排队 + 执行中的任务数"""
+        return self._pending
+
+    def start(self) -> None:
+        """创建并预热执行池 (幂等,阻塞直到预热完成)"""
+        with self._start_lock:
+            if self._pool is not None:
+                return
+            self._pool = self._create_pool()
+
+        logger.info(
+            f"分析执行器已启动: mode={self.mode}, workers={self.max_workers}, "
+            f"max_pending={self.max_pending}, timeout={self.task_timeout}s"
+        )
+
+    def _create_pool(self) -> Executor:
+        """创建执行池并完成预热"""
+        if self.mode == "process":
+            # NOTE: max_tasks_per_child 要求非 fork 启动方式
+            pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up_worker,
+                max_tasks_per_child=self.max_tasks_per_worker
+            )
+            # 同时提交与 worker 数相同的空任务,确保所有 worker 在启动阶段完成预热
+            futures = [pool.submit(_ping) for _ in range(self.max_workers)]
+            for future in futures:
+                future.result()
+        else:
+            pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="analysis"
+            )
+            pool.submit(_warm_up_worker).result()
+        return pool
+
+    def _rebuild(self, broken: Executor) -> None:
+        """丢弃已损坏的进程池并重新创建 (其他任务已重建时直接返回)"""
+        with self._start_lock:
+            if self._pool is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+        self.start()
+
+    def shutdown(self) -> None:
+        """关闭执行池"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            logger.info("分析执行器已关闭")
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        在执行池中运行任务
+
+        Args:
+            func: 可被 pickle 的模块级函数 (process 模式要求)
+            *args: 位置参数
+
+        Returns:
+            任务返回值
+
+        Raises:
+            AnalysisQueueFullError: 排队任务数达到上限
+            AnalysisTimeoutError: 任务超过 task_timeout 未完成
+            BrokenProcessPool: 重建进程池重试后 worker 仍然异常退出
+        """
+        if self._pending >= self.max_pending:
+            raise AnalysisQueueFullError(f"分析队列已满 ({self.max_pending})")
+
+        self._pending += 1
+        submitted: list[Future] = []
+        try:
+            # 未在 lifespan 中启动时懒加载;预热会阻塞,放到线程中执行
+            if self._pool is None:
+                await asyncio.to_thread(self.start)
+            pool = self._pool
+            try:
+                return await self._submit(pool, submitted, func, *args)
+            except BrokenProcessPool:
+                logger.warning("⚠️ 分析进程池已损坏 (worker 异常退出),重建后重试一次")
+                await asyncio.to_thread(self._rebuild, pool)
+            pool = self._pool
+            try:
+                return await self._submit(pool, submitted, func, *args)
+            except BrokenProcessPool:
+                # 再次失败多半是任务本身导致 worker 崩溃,重建后交给调用方处理
+                logger.error(f"❌ 重试后进程池仍然损坏: {getattr(func, '__name__', func)}")
+                await asyncio.to_thread(self._rebuild, pool)
+                raise
+        finally:
+            if submitted and not submitted[-1].done():
+                # 超时或被取消时任务仍在 worker 中执行,跑完后才释放名额
+                loop = asyncio.get_running_loop()
+                submitted[-1].add_done_callback(lambda _: self._release_threadsafe(loop))
+            else:
+                self._pending -= 1
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop) -> None:
+        """在执行池线程中完成的任务,回到事件循环线程释放名额"""
+        def release() -> None:
+            self._pending -= 1
+        try:
+            loop.call_soon_threadsafe(release)
+        except RuntimeError:
+            # 事件循环已关闭 (进程退出中),名额不再有意义
+            pass
+
+    async def _submit(self, pool: Executor, submitted: list[Future], func: Callable[..., Any], *args: Any) -> Any:
+        """提交到执行池并等待结果 (带超时),提交的 Future 记录到 submitted"""
+        future = pool.submit(func, *args)
+        submitted.append(future)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.task_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"分析任务超时 ({self.task_timeout}s): {getattr(func, '__name__', func)}")
+            raise AnalysisTimeoutError(f"分析超时 ({self.task_timeout}s)")
+
+    def stats(self) -> dict[str, Any]:
+        """执行器运行状态"""
+        return {
+            'mode': self.mode,
+            'workers': self.max_workers,
+            'pending': self._pending,
+            'max_pending': self.max_pending,
+            'task_timeout': self.task_timeout,
+            'max_tasks_per_worker': self.max_tasks_per_worker
+        }
+
+
+_executor: AnalysisExecutor | None = None
+
+
+def get_analysis_executor() -> AnalysisExecutor:
+    """
+    获取分析执行器单例 (按配置创建)
+
+    Returns:
+        AnalysisExecutor 实例
+    """
+    global _executor
+    if _executor is None:
+        from config import get_settings
+        settings = get_settings()
+        _executor = AnalysisExecutor(
+            mode=settings.analysis_executor_mode,
+            max_workers=settings.analysis_workers,
+            max_pending=settings.analysis_max_pending,
+            task_timeout=settings.analysis_task_timeout_s,
+            max_tasks_per_worker=settings.analysis_worker_max_tasks or None
+        )
+    return _executor
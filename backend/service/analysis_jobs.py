@@ -0,0 +1,382 @@
+"""
+异步分析任务队列
+
+提交接口立即返回 job_id,分析在后台 worker 中完成,客户端通过轮询或 SSE 获取结果:
+- 进程内 asyncio 队列 + 可配置并发数
+- 队列满时拒绝提交 (API 层返回 429)
+- 可插拔的任务存储后端: 内存 (默认) / SQLite (进程重启后可恢复)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class JobQueueFullError(Exception):
+    """任务队列已满"""
+
+
+# ==================== 存储后端 ====================
+
+class JobBackend(ABC):
+    """
+    任务存储后端接口
+
+    任务以 dict 表示,字段: id, user_id, status, audio_path, audio_filename,
+    result, error, created_at, updated_at
+    """
+
+    @abstractmethod
+    def create(self, job: dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any) -> None:
+        ...
+
+    @abstractmethod
+    def list_unfinished(self) -> list[dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def purge_finished(self, older_than: float) -> int:
+        ...
+
+
+class InMemoryJobBackend(JobBackend):
+    """内存后端 (进程重启后任务丢失)"""
+
+    def __init__(self):
+        self._jobs: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields, updated_at=time.time())
+
+    def list_unfinished(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [dict(j) for j in self._jobs.values() if j['status'] not in JOB_FINISHED_STATES]
+
+    def purge_finished(self, older_than: float) -> int:
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job['status'] in JOB_FINISHED_STATES and job['updated_at'] < older_than
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+            return len(expired)
+
+
+class SQLiteJobBackend(JobBackend):
+    """SQLite 后端 (进程重启后可恢复未完成任务)"""
+
+    COLUMNS = ('id', 'user_id', 'status', 'audio_path', 'audio_filename',
+               'result', 'error', 'created_at', 'updated_at')
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    audio_path TEXT,
+                    audio_filename TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status ON analysis_jobs(status)"
+            )
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row | None) -> dict[str, Any] | None:
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def create(self, job: dict[str, Any]) -> None:
+        values = dict(job, result=json.dumps(job['result']) if job.get('result') else None)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO analysis_jobs ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in self.COLUMNS)})",
+                [values.get(col) for col in self.COLUMNS]
+            )
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        fields['updated_at'] = time.time()
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result']) if fields['result'] is not None else None
+        assignments = ', '.join(f"{key} = ?" for key in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE analysis_jobs SET {assignments} WHERE id = ?",
+                [*fields.values(), job_id]
+            )
+
+    def list_unfinished(self) -> list[dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM analysis_jobs WHERE status NOT IN (?, ?) ORDER BY created_at",
+                JOB_FINISHED_STATES
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def purge_finished(self, older_than: float) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM analysis_jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (*JOB_FINISHED_STATES, older_than)
+            )
+            return cursor.rowcount
+
+
+# ==================== 任务队列 ====================
+
+JobRunner = Callable[[dict[str, Any]], Awaitable[dict[str, Any]]]
+
+
+class AnalysisJobQueue:
+    """
+    进程内分析任务队列
+
+    Args:
+        backend: 任务存储后端
+        runner: 执行单个任务的协程函数,返回可 JSON 序列化的结果
+        concurrency: 同时执行的任务数
+        max_queue: 等待中的任务上限
+        ttl: 已完成任务保留时长 (秒)
+    """
+
+    def __init__(self, backend: JobBackend, runner: JobRunner,
+                 concurrency: int = 2, max_queue: int = 32, ttl: float = 3600):
+        self.backend = backend
+        self.runner = runner
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.ttl = ttl
+
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._events: dict[str, asyncio.Event] = {}
+
+    async def start(self) -> None:
+        """启动 worker,并恢复存储中未完成的任务"""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+
+        for job in self.backend.list_unfinished():
+            if job.get('audio_path') and os.path.exists(job['audio_path']) and not self._queue.full():
+                self.backend.update(job['id'], status=JOB_PENDING)
+                self._queue.put_nowait(job['id'])
+                logger.info(f"恢复未完成的分析任务 job_id={job['id']}")
+            else:
+                self.backend.update(job['id'], status=JOB_FAILED, error="服务重启，任务已丢失，请重新提交")
+
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.concurrency)
+        ]
+        logger.info(f"分析任务队列已启动: concurrency={self.concurrency}, max_queue={self.max_queue}")
+
+    async def stop(self) -> None:
+        """停止 worker (未完成任务保留在存储中)"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        logger.info("分析任务队列已停止")
+
+    def submit(self, user_id: str, audio_path: str, audio_filename: str) -> dict[str, Any]:
+        """
+        提交分析任务
+
+        Returns:
+            新建的任务记录
+
+        Raises:
+            JobQueueFullError: 等待中的任务数达到上限
+        """
+        if self._queue is None:
+            raise RuntimeError("分析任务队列未启动")
+        if self._queue.full():
+            raise JobQueueFullError(f"分析任务队列已满 ({self.max_queue})")
+
+        now = time.time()
+        job = {
+            'id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'status': JOB_PENDING,
+            'audio_path': audio_path,
+            'audio_filename': audio_filename,
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now
+        }
+        self.backend.create(job)
+        self._queue.put_nowait(job['id'])
+        self.backend.purge_finished(now - self.ttl)
+        logger.info(f"分析任务已提交 job_id={job['id']}, 队列长度={self._queue.qsize()}")
+        return job
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        """获取任务记录"""
+        return self.backend.get(job_id)
+
+    async def wait_for_change(self, job_id: str, timeout: float) -> None:
+        """
+        等待任务状态变化 (用于 SSE 推送)
+        超时后直接返回,由调用方重新读取状态;任务已结束时不再等待
+        """
+        if self._is_finished(job_id):
+            return
+        event = self._events.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            event.clear()
+            # worker 可能已在最后一次通知后移除了事件,迟到的订阅者在这里清理自己创建的事件
+            if self._is_finished(job_id):
+                self._events.pop(job_id, None)
+
+    def _is_finished(self, job_id: str) -> bool:
+        job = self.backend.get(job_id)
+        return job is None or job['status'] in JOB_FINISHED_STATES
+
+    def _notify(self, job_id: str) -> None:
+        event = self._events.get(job_id)
+        if event:
+            event.set()
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self.backend.get(job_id)
+                if not job:
+                    continue
+                self.backend.update(job_id, status=JOB_RUNNING)
+                self._notify(job_id)
+                try:
+                    result = await self.runner(job)
+                    self.backend.update(job_id, status=JOB_SUCCEEDED, result=result)
+                    logger.info(f"分析任务完成 job_id={job_id}")
+                except Exception as e:
+                    logger.error(f"分析任务失败 job_id={job_id}: {str(e)}")
+                    self.backend.update(job_id, status=JOB_FAILED, error=str(e))
+                finally:
+                    if job.get('audio_path') and os.path.exists(job['audio_path']):
+                        try:
+                            os.unlink(job['audio_path'])
+                        except OSError as e:
+                            logger.warning(f"删除任务音频失败: {str(e)}")
+                self._notify(job_id)
+                self._events.pop(job_id, None)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict[str, Any]:
+        """队列运行状态"""
+        return {
+            'queued': self._queue.qsize() if self._queue else 0,
+            'max_queue': self.max_queue,
+            'concurrency': self.concurrency
+        }
+
+
+async def _run_analysis_job(job: dict[str, Any]) -> dict[str, Any]:
+    """默认任务执行函数: 调用 AnalysisService 完成分析"""
+    from database import get_async_db
+    from service.analysis_service import AnalysisService
+
+    result = await AnalysisService(await get_async_db()).analyze_voice(
+        user_id=job['user_id'],
+        audio=job['audio_path'],
+        audio_filename=job['audio_filename']
+    )
+    from service.metrics import get_metrics
+    with get_metrics().span('response_serialization'):
+        return result.model_dump(mode='json')
+
+
+_job_queue: AnalysisJobQueue | None = None
+
+
+def get_analysis_job_queue() -> AnalysisJobQueue:
+    """
+    获取分析任务队列单例 (按配置创建)
+
+    Returns:
+        AnalysisJobQueue 实例
+    """
+    global _job_queue
+    if _job_queue is None:
+        from config import get_settings
+        settings = get_settings()
+        if settings.analysis_job_backend == "sqlite":
+            backend: JobBackend = SQLiteJobBackend(settings.analysis_job_db_path)
+        elif settings.analysis_job_backend == "memory":
+            backend = InMemoryJobBackend()
+        else:
+            raise ValueError(f"未知的任务存储后端: {settings.analysis_job_backend}")
+        _job_queue = AnalysisJobQueue(
+            backend=backend,
+            runner=_run_analysis_job,
+            concurrency=settings.analysis_job_concurrency,
+            max_queue=settings.analysis_job_max_queue,
+            ttl=settings.analysis_job_ttl_s
+        )
+    return _job_queue
@@ -1,44 +1,58 @@
-from supabase import Client
+from supabase import AsyncClient
 from repository.analysis_repo import AnalysisRepository, SingerRepository
 from repository.song_repo import SongRepository
-from service.audio_analyzer import AudioAnalyzer
 from service.ai_image_service import AIImageService
-from schema.analysis import VoiceAnalysisResponse, MatchedSingerResponse, RecommendedSongResponse
+from schema.analysis import VoiceAnalysisResponse, MatchedSingerResponse, RecommendedSongResponse, SingerCandidateResponse
 from config import get_settings
-# ✅ 引入 FastAPI 的并发工具，防止服务器卡死
+# ✅ CPU 密集型任务交给独立的分析执行器 (进程池),不与事件循环争抢 GIL
+from service.analysis_executor import get_analysis_executor
+from service.result_cache import get_result_cache, hash_file
+from service.audio_ingest import AudioPayload
+from service.song_catalog import get_song_catalog
+from service.metrics import get_metrics
+from service.user_stats_cache import get_user_stats_cache
 from fastapi.concurrency import run_in_threadpool
+import asyncio
 import logging
 import os
 import uuid
 import time
-import threading
-import numpy as np
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# 正在运行的后台保存任务 (保持引用,防止任务在完成前被垃圾回收)
+_background_tasks: set[asyncio.Task] = set()
+
 
 class AnalysisService:
     """
     声音分析业务逻辑层 (高性能优化版)
     
     设计说明:
-    - 使用 run_in_threadpool 处理 CPU 密集型任务（音频分析、特征提取）
+    - 使用 AnalysisExecutor 处理 CPU 密集型任务（音频分析、特征提取）
     - 防止阻塞 FastAPI 的异步事件循环
-    - 提升服务器并发处理能力
+    - 进程池绕开 GIL,提升服务器并发处理能力
     """
     
-    def __init__(self, db: Client):
+    def __init__(self, db: AsyncClient):
         self.db = db
         self.analysis_repo = AnalysisRepository(db)
         self.singer_repo = SingerRepository(db)
         self.song_repo = SongRepository(db)
         self.settings = get_settings()
     
-    async def analyze_voice(self, user_id: str, audio_file_path: str, audio_filename: str) -> VoiceAnalysisResponse:
+    async def analyze_voice(self, user_id: str, audio: str | AudioPayload, audio_filename: str,
+                            content_hash: str | None = None) -> VoiceAnalysisResponse:
         """
         分析用户声音 (基于真实声学特征)
         
+        Args:
+            user_id: 用户ID
+            audio: 流式接收的 AudioPayload,或音频文件路径 (异步任务落盘的音频)
+            audio_filename: 原始文件名
+            content_hash: 音频内容 SHA-256 (未提供时从文件计算),用于结果缓存
+        
         流程:
         1. 提取用户音频的声学特征 (音高、亮度、响度)
         2. 与歌手声学模型进行匹配
@@ -46,66 +60,76 @@ class AnalysisService:
         4. 推荐相似歌曲
         
         优化点:
-        - CPU 密集型任务使用 run_in_threadpool 防止阻塞
+        - CPU 密集型任务交给 AnalysisExecutor 防止阻塞
         - 只分析前30秒音频,确保快速响应
+        - 相同内容的录音命中结果缓存,跳过特征提取 (仍会记录新的分析记录)
+        - 各阶段耗时汇总到 service.metrics,通过 /metrics 暴露
         """
         start_time = time.time()
+        metrics = get_metrics()
         logger.info(f"开始分析用户声音 user_id={user_id}")
         
         # ==================== 1. 提取用户音频特征 ====================
         
-        from service.audio_feature_extractor import extract_audio_features, normalize_user_features
-        from service.singer_acoustic_profiles import get_all_singer_profiles, normalize_singer_features, get_singer_id
+        from service.audio_feature_extractor import extract_audio_features, FEATURE_PIPELINE_VERSION
+        from service.singer_acoustic_profiles import get_all_singer_profiles
         
-        # 使用线程池执行CPU密集型特征提取
-        logger.info("提取音频特征...")
-        user_features = await run_in_threadpool(
-            extract_audio_features, 
-            audio_file_path
+        # 按内容哈希查询结果缓存,重复上传的录音直接复用特征和匹配结果
+        result_cache = get_result_cache()
+        if content_hash is None and isinstance(audio, AudioPayload):
+            content_hash = audio.content_hash
+        cache_key = result_cache.make_key(
+            content_hash or await run_in_threadpool(hash_file, audio),
+            FEATURE_PIPELINE_VERSION
         )
-        
-        # 归一化用户特征
-        user_normalized = normalize_user_features(user_features)
-        
-        # ==================== 2. 匹配最佳歌手 ====================
-        
-        logger.info("匹配歌手声学模型...")
-        singer_profiles = get_all_singer_profiles()
-        
-        min_distance = float('inf')
-        best_singer_name = None
-        best_singer_profile = None
-        
-        # 计算欧氏距离,找到最匹配的歌手
-        for singer_name, profile in singer_profiles.items():
-            singer_normalized = normalize_singer_features(profile)
+        cached = await result_cache.aget(cache_key)
+        
+        if cached:
+            logger.info(f"✅ 命中分析结果缓存,跳过特征提取 key={cache_key[:16]}...")
+            user_features = cached['features']
+            best_singer_name = cached['match']['singer_name']
+            min_distance = cached['match']['distance']
+            alternates = cached['match'].get('alternates', [])
+        else:
+            # 使用分析执行器执行CPU密集型特征提取
+            logger.info("提取音频特征...")
+            with metrics.span('feature_extraction'):
+                user_features = await get_analysis_executor().run(
+                    extract_audio_features, 
+                    audio
+                )
+            # worker 进程内各阶段的耗时 (不写入结果缓存)
+            worker_timings = user_features.pop('stage_timings', None)
+            if worker_timings:
+                metrics.observe_all(worker_timings)
             
-            # 计算欧氏距离
-            distance = np.sqrt(
-                (user_normalized['pitch'] - singer_normalized['pitch'])**2 +
-                (user_normalized['brightness'] - singer_normalized['brightness'])**2 +
-                (user_normalized['energy'] - singer_normalized['energy'])**2
-            )
+            # ==================== 2. 匹配最佳歌手 ====================
             
-            if distance < min_distance:
-                min_distance = distance
-                best_singer_name = singer_name
-                best_singer_profile = profile
-        
-        # 如果没有匹配到,使用默认
-        if not best_singer_name:
-            best_singer_name = "陈奕迅"
-            best_singer_profile = singer_profiles[best_singer_name]
-            min_distance = 0.3
+            logger.info("匹配歌手声学模型...")
+            with metrics.span('singer_matching'):
+                best_singer_name, min_distance, alternates = self._match_singer(user_features)
+            
+            # 提取失败时返回的是默认特征,不能写入缓存
+            if not user_features.get('is_fallback'):
+                await result_cache.aput(cache_key, {
+                    'features': user_features,
+                    'match': {
+                        'singer_name': best_singer_name,
+                        'distance': min_distance,
+                        'alternates': alternates
+                    }
+                })
         
+        best_singer_profile = get_all_singer_profiles()[best_singer_name]
         logger.info(f"匹配结果: {best_singer_name}, 距离={min_distance:.3f}")
         
         # ==================== 3. 计算匹配度分数 ====================
         
-        # 距离越小,匹配度越高
-        # 距离范围约0-1.5,映射到60-98分
-        similarity_score = int((1 - min(min_distance, 1)) * 38 + 60)
-        similarity_score = max(60, min(98, similarity_score))
+        similarity_score = self._distance_to_score(min_distance)
+        alternate_singers = [
+            SingerCandidateResponse(name=name, score=self._distance_to_score(distance))
+            for name, distance in alternates
+        ]
         
         # ==================== 4. 生成真实雷达图 ====================
         
@@ -170,17 +194,19 @@ class AnalysisService:
         
         # ==================== 7. 推荐歌曲 ====================
         
-        # 尝试从数据库获取歌曲推荐
+        # 从内存歌曲目录索引获取推荐 (过期时才访问数据库)
         try:
-            songs = self.song_repo.get_all_with_features()
-            if songs:
-                # 筛选该歌手的歌曲作为舒适区
-                comfort_songs = [s for s in songs if s.get('artist') == best_singer_name][:5]
-                # 筛选其他歌手的歌曲作为挑战区
-                challenge_songs = [s for s in songs if s.get('artist') != best_singer_name][:5]
+            catalog = get_song_catalog()
+            with metrics.span('song_fetch'):
+                await catalog.ensure_fresh(self.song_repo)
+            if len(catalog) > 0:
+                # 该歌手的歌曲作为舒适区,其他歌手的歌曲作为挑战区 (均按与用户声音的相似度排序)
+                comfort_songs = self._recommend_songs(catalog, user_features, best_singer_name, same=True)
+                challenge_songs = self._recommend_songs(catalog, user_features, best_singer_name, same=False)
                 
-                recommended_comfort = await self._build_recommended_songs(comfort_songs, user_features, "comfortable")
-                recommended_challenge = await self._build_recommended_songs(challenge_songs, user_features, "challenge")
+                with metrics.span('recommendation_build'):
+                    recommended_comfort = await self._build_recommended_songs(comfort_songs, user_features, "comfortable")
+                    recommended_challenge = await self._build_recommended_songs(challenge_songs, user_features, "challenge")
             else:
                 recommended_comfort = []
                 recommended_challenge = []
@@ -204,30 +230,63 @@ class AnalysisService:
             recommended_songs_comfort=recommended_comfort,
             recommended_songs_challenge=recommended_challenge,
             matched_song_title=None,
-            matched_song_id=None
+            matched_song_id=None,
+            alternate_singers=alternate_singers
         )
         
-        # 异步保存到数据库
-        threading.Thread(
-            target=self._save_task_in_background, 
-            args=(user_id, best_singer_name, similarity_score, {
+        # 异步保存到数据库 (后台任务,不阻塞响应)
+        task = asyncio.create_task(self._save_task_in_background(
+            user_id, best_singer_name, similarity_score, {
                 'clarity': clarity,
                 'stability': stability,
                 'radar_data': radar_data
-            }), 
-            daemon=True
-        ).start()
+            }
+        ))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
         
         elapsed_time = time.time() - start_time
+        metrics.observe('analysis_total', elapsed_time)
         logger.info(f"✅ 分析完成,耗时: {elapsed_time:.2f}秒, 匹配歌手: {best_singer_name}, 得分: {similarity_score}")
         return final_response
 
 
     # --- 内部辅助方法 ---
 
-    def _save_task_in_background(self, user_id, singer_name, similarity_score, analysis_result):
+    # 匹配结果中附带的备选歌手数量
+    ALTERNATE_SINGERS = 3
+
+    def _match_singer(self, user_features: dict) -> tuple[str, float, list[tuple[str, float]]]:
+        """
+        在预计算的歌手特征矩阵中查找欧氏距离最近的歌手 (一次向量化计算)
+        
+        Returns:
+            (最佳歌手名称, 距离, [(备选歌手, 距离)])
+        """
+        from service.audio_feature_extractor import user_feature_vector
+        from service.singer_acoustic_profiles import match_singers
+        
+        ranked = match_singers(user_feature_vector(user_features), k=self.ALTERNATE_SINGERS + 1)
+        
+        # 如果没有匹配到,使用默认
+        if not ranked:
+            return "陈奕迅", 0.3, []
+        
+        best_singer_name, min_distance = ranked[0]
+        return best_singer_name, min_distance, ranked[1:]
+
+    @staticmethod
+    def _distance_to_score(distance: float) -> int:
+        """
+        距离越小,匹配度越高
+        距离范围约0-1.5,映射到60-98分
+        """
+        score = int((1 - min(distance, 1)) * 38 + 60)
+        return max(60, min(98, score))
+
+    async def _save_task_in_background(self, user_id, singer_name, similarity_score, analysis_result):
         """
-        后台保存任务(在独立线程中运行)
+        后台保存任务(在事件循环中作为独立任务运行)
         
         Args:
             user_id: 用户ID
@@ -258,49 +317,13 @@ class AnalysisService:
                 'audio_url': None
             }
             
-            self.analysis_repo.create(analysis_data)
+            await self.analysis_repo.create(analysis_data)
+            get_user_stats_cache().invalidate(user_id)  # 分析次数已变化
             logger.info(f"✅ [后台任务] 数据保存成功, singer_id={matched_singer_id}")
         except Exception as e:
             logger.error(f"❌ [后台任务] 保存失败: {e}")
             logger.exception(e)  # 打印完整堆栈
 
-    async def _create_fallback_response(self, user_id, audio_file_path):
-        """
-        降级方案（数据库不可用时）
-        
-        优化: 降级时也使用 run_in_threadpool 优化性能
-        """
-        # ✅ 优化点：降级时也需要优化计算性能
-        features = await run_in_threadpool(
-            AudioAnalyzer.analyze_audio_file, 
-            audio_file_path
-        )
-        res = AudioAnalyzer.generate_analysis_result(features)
-        
-        default_singer = MatchedSingerResponse(
-            id="fallback-singer",
-            name="默认音色库",
-            description="数据库不可用",
-            avatar_url=await self._generate_singer_avatar("音色"),
-            voice_characteristics={}
-        )
-        
-        return VoiceAnalysisResponse(
-            id=str(uuid.uuid4()),
-            user_id=user_id,
-            score=75,
-            clarity=res['clarity'],
-            stability=res['stability'],
-            radar_data=res['radar_data'],
-            matched_singer=default_singer,
-            audio_url=None,
-            created_at=datetime.now(),
-            recommended_songs_comfort=[],
-            recommended_songs_challenge=[],
-            matched_song_title=None,
-            matched_song_id=None
-        )
-    
     async def _generate_singer_avatar(self, artist_name):
         """生成歌手头像"""
         try:
@@ -308,6 +331,39 @@ class AnalysisService:
         except:
             return "/static/default_avatar.svg"
     
+    @staticmethod
+    def _recommend_songs(catalog, user_features: dict, artist: str, same: bool, limit: int = 5) -> list[dict]:
+        """
+        从歌曲目录选出推荐歌曲
+        
+        有用户检索向量时用 search() 按余弦相似度排序;
+        没有向量 (默认特征/旧缓存) 或有向量的歌曲不足 limit 首时,用 filter_by_artist 补齐
+        
+        Args:
+            catalog: SongCatalogIndex 实例
+            user_features: 用户音频特征
+            artist: 匹配到的歌手
+            same: True=该歌手的歌曲, False=其他歌手的歌曲
+            limit: 返回数量
+        """
+        songs = []
+        vector = user_features.get('feature_vector')
+        if vector:
+            try:
+                songs = catalog.search(
+                    vector, k=limit,
+                    artist=artist if same else None,
+                    exclude_artist=None if same else artist,
+                    feature_version=user_features.get('feature_version')
+                )
+            except ValueError as e:
+                logger.warning(f"相似度推荐不可用,改为按歌手筛选: {str(e)}")
+        if len(songs) < limit:
+            seen = {song['id'] for song in songs}
+            extra = catalog.filter_by_artist(artist, same=same, limit=limit + len(songs))
+            songs += [song for song in extra if song['id'] not in seen][:limit - len(songs)]
+        return songs
+    
     async def _build_recommended_songs(self, songs, user_features, difficulty_level):
         """
         构建推荐歌曲列表
@@ -439,9 +495,9 @@ class AnalysisService:
 
     # --- 历史查询方法 ---
     
-    def get_analysis_by_id(self, analysis_id: str) -> VoiceAnalysisResponse | None:
+    async def get_analysis_by_id(self, analysis_id: str) -> VoiceAnalysisResponse | None:
         """根据ID获取分析记录"""
-        analysis_data = self.analysis_repo.get_by_id(analysis_id)
+        analysis_data = await self.analysis_repo.get_by_id(analysis_id)
         if not analysis_data:
             return None
         singer_data = analysis_data.pop('matched_singers', None)
@@ -450,9 +506,9 @@ class AnalysisService:
             matched_singer=MatchedSingerResponse(**singer_data) if singer_data else None
         )
     
-    def get_user_analysis_history(self, user_id: str, limit: int = 10) -> list[VoiceAnalysisResponse]:
+    async def get_user_analysis_history(self, user_id: str, limit: int = 10) -> list[VoiceAnalysisResponse]:
         """获取用户的分析历史记录"""
-        analyses = self.analysis_repo.get_user_analyses(user_id, limit)
+        analyses = await self.analysis_repo.get_user_analyses(user_id, limit)
         results = []
         for analysis in analyses:
             singer_data = analysis.pop('matched_singers', None)
@@ -0,0 +1,244 @@
+"""
+近似最近邻索引 (IVF, 纯 NumPy 实现)
+
+歌曲数量达到数万首时,每次请求全量扫描特征矩阵开始变得明显。
+IVF 索引先用球面 k-means 把歌曲向量划分为若干倒排列表 (粗量化),
+查询时只扫描与查询向量最接近的 nprobe 个列表:
+- nprobe 越大,召回率越高,延迟越高 (nprobe = n_lists 时等价于精确检索)
+- 索引持久化为 .npz 文件,离线特征提取脚本写入新向量时增量更新
+"""
+
+import logging
+import os
+
+import numpy as np
+
+from service.similarity_search import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """
+    倒排文件 (IVF) 余弦相似度索引
+
+    Attributes:
+        ids: (n,) 歌曲ID
+        vectors: (n, dim) 已归一化的向量
+        assignments: (n,) 每个向量所属的列表
+        centroids: (n_lists, dim) 已归一化的列表中心
+    """
+
+    # 增量新增的向量超过构建时规模的该倍数后,自动重新聚类
+    REBUILD_GROWTH = 2.0
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=object)
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.built_size = 0
+
+        self._order = np.empty(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._id_to_row: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    # --- 构建 ---
+
+    @staticmethod
+    def default_n_lists(n: int) -> int:
+        """列表数量经验值: 约 sqrt(n)"""
+        return max(1, int(np.sqrt(n)))
+
+    def build(self, ids, vectors, n_lists: int | None = None,
+              n_iter: int = 20, seed: int = 0) -> "IVFIndex":
+        """
+        全量构建索引 (球面 k-means)
+
+        Args:
+            ids: 歌曲ID序列
+            vectors: (n, dim) 特征向量
+            n_lists: 倒排列表数量,默认 sqrt(n)
+            n_iter: k-means 迭代次数
+            seed: 随机种子
+        """
+        vectors = normalize_rows(vectors)
+        n = vectors.shape[0]
+        self.ids = np.array([str(i) for i in ids], dtype=object)
+        self.vectors = vectors
+        self.built_size = n
+
+        if n == 0:
+            self.centroids = np.empty((0, vectors.shape[1]), dtype=np.float32)
+            self.assignments = np.empty(0, dtype=np.int32)
+            self._reindex()
+            return self
+
+        n_lists = min(n_lists or self.default_n_lists(n), n)
+        rng = np.random.default_rng(seed)
+        # 训练集上限,避免超大目录聚类过慢
+        train = vectors[rng.choice(n, size=min(n, n_lists * 256), replace=False)]
+        centroids = train[rng.choice(train.shape[0], size=n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            labels = np.argmax(train @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, train)
+            counts = np.bincount(labels, minlength=n_lists)
+            # 空列表用随机样本重新初始化
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = train[rng.choice(train.shape[0], size=int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        self.centroids = centroids
+        self.assignments = self._assign(vectors)
+        self._reindex()
+        logger.info(f"IVF 索引构建完成: {n} 个向量, {n_lists} 个列表, 维度={vectors.shape[1]}")
+        return self
+
+    def add(self, ids, vectors) -> "IVFIndex":
+        """
+        增量写入向量 (已存在的ID会被覆盖)
+        新增规模超过 REBUILD_GROWTH 倍时自动重新聚类
+        """
+        ids = [str(i) for i in ids]
+        vectors = normalize_rows(vectors)
+        if len(ids) == 0:
+            return self
+        if len(self) == 0 or self.n_lists == 0:
+            return self.build(ids, vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"向量维度 {vectors.shape[1]} 与索引维度 {self.dim} 不一致")
+
+        new_ids, new_rows = [], []
+        for song_id, vector in zip(ids, vectors):
+            row = self._id_to_row.get(song_id)
+            if row is None:
+                new_ids.append(song_id)
+                new_rows.append(vector)
+            else:
+                self.vectors[row] = vector
+                self.assignments[row] = self._assign(vector[None, :])[0]
+
+        if new_rows:
+            new_rows = np.vstack(new_rows)
+            self.ids = np.concatenate([self.ids, np.array(new_ids, dtype=object)])
+            self.vectors = np.vstack([self.vectors, new_rows])
+            self.assignments = np.concatenate([self.assignments, self._assign(new_rows)])
+
+        if len(self) > self.built_size * self.REBUILD_GROWTH:
+            logger.info("IVF 索引增量规模过大,重新聚类")
+            return self.build(self.ids, self.vectors, n_lists=self.default_n_lists(len(self)))
+
+        self._reindex()
+        return self
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _reindex(self) -> None:
+        """按列表排序,生成 CSR 风格的 (order, offsets)"""
+        self._order = np.argsort(self.assignments, kind='stable')
+        counts = np.bincount(self.assignments, minlength=self.n_lists)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._id_to_row = {song_id: row for row, song_id in enumerate(self.ids)}
+
+    # --- 查询 ---
+
+    def candidates(self, query: np.ndarray, nprobe: int = 8) -> np.ndarray:
+        """
+        返回最接近的 nprobe 个列表中的全部行号
+
+        Args:
+            query: (dim,) 查询向量
+            nprobe: 扫描的列表数量
+        """
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+        nprobe = min(max(1, nprobe), self.n_lists)
+        centroid_scores = self.centroids @ np.asarray(query, dtype=np.float32)
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([
+            self._order[self._offsets[p]:self._offsets[p + 1]] for p in probe
+        ])
+
+    def candidate_ids(self, query: np.ndarray, nprobe: int = 8) -> np.ndarray:
+        """返回候选歌曲ID"""
+        return self.ids[self.candidates(query, nprobe)]
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: int = 8) -> tuple[np.ndarray, np.ndarray]:
+        """
+        近似 Top-K 检索
+
+        Returns:
+            (歌曲ID数组, 相似度数组),按相似度降序
+        """
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return np.empty(0, dtype=object), np.empty(0, dtype=np.float32)
+        query = query / norm
+
+        rows = self.candidates(query, nprobe)
+        if rows.size == 0:
+            return np.empty(0, dtype=object), np.empty(0, dtype=np.float32)
+        scores = self.vectors[rows] @ query
+        k = min(k, rows.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return self.ids[rows[top]], scores[top]
+
+    # --- 持久化 ---
+
+    def save(self, path: str) -> None:
+        """保存为 .npz (先写临时文件再替换,避免读到半成品)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            ids=self.ids.astype(str),
+            vectors=self.vectors,
+            assignments=self.assignments,
+            centroids=self.centroids,
+            built_size=np.array(self.built_size)
+        )
+        os.replace(tmp_path, path)
+        logger.info(f"IVF 索引已保存: {path} ({len(self)} 个向量)")
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        """从 .npz 加载"""
+        with np.load(path, allow_pickle=False) as data:
+            index = cls()
+            index.ids = data['ids'].astype(object)
+            index.vectors = data['vectors'].astype(np.float32)
+            index.assignments = data['assignments'].astype(np.int32)
+            index.centroids = data['centroids'].astype(np.float32)
+            index.built_size = int(data['built_size'])
+        index._reindex()
+        return index
+
+    @classmethod
+    def load_or_empty(cls, path: str) -> "IVFIndex":
+        """文件不存在或损坏时返回空索引"""
+        if not os.path.exists(path):
+            return cls()
+        try:
+            return cls.load(path)
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"加载 IVF 索引失败,将重新构建: {str(e)}")
+            return cls()
@@ -1,10 +1,12 @@
 import librosa
 import numpy as np
 from schema.analysis import AudioFeatures
+from service.pitch_contour import extract_pitch_contour
+from service.feature_graph import SpectralFeatureGraph
+from service.metrics import StageTimer
 import logging
 import tempfile
 import os
-from sklearn.metrics.pairwise import cosine_similarity
 
 logger = logging.getLogger(__name__)
 
@@ -16,64 +18,65 @@ class AudioAnalyzer:
     """
     
     @staticmethod
-    def analyze_audio_file(file_path: str) -> AudioFeatures:
+    def analyze_audio_file(file_path: str, timer: StageTimer | None = None) -> AudioFeatures:
         """
         分析音频文件并提取特征
         
         Args:
             file_path: 音频文件路径
+            timer: 可选的阶段计时器 (load / spectral_features / mfcc / pitch_tracking)
             
         Returns:
             提取的音频特征
         """
         logger.info(f"开始分析音频文件: {file_path}")
+        timer = timer or StageTimer()
         
         # 加载音频文件
         # NOTE: librosa 会自动重采样到 22050 Hz（默认），mono=True 确保单声道
-        y, sr = librosa.load(file_path, sr=None, mono=True)
-        duration = librosa.get_duration(y=y, sr=sr)
+        with timer.span('load'):
+            y, sr = librosa.load(file_path, sr=None, mono=True)
+            duration = librosa.get_duration(y=y, sr=sr)
         
         logger.info(f"音频加载成功 - 时长: {duration:.2f}s, 采样率: {sr}Hz")
         
-        # 1. 频谱特征提取
-        spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-        spectral_bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)[0]
-        spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
+        # 所有频域特征共享同一次 STFT
+        graph = SpectralFeatureGraph(y, sr)
+        
+        # 1. 频谱特征提取 (首个消费者触发 STFT,耗时计入该阶段)
+        with timer.span('spectral_features'):
+            spectral_centroids = graph.spectral_centroid()
+            spectral_bandwidth = graph.spectral_bandwidth()
+            spectral_rolloff = graph.spectral_rolloff()
         
         # 2. 音色特征 (MFCC - Mel频率倒谱系数)
         # MFCC 是音色分析的核心特征，可以捕捉声音的音色质感
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+        with timer.span('mfcc'):
+            mfccs = graph.mfcc(n_mfcc=13)
         mfcc_means = np.mean(mfccs, axis=1).tolist()
         mfcc_stds = np.std(mfccs, axis=1).tolist()
         
         # 3. 能量和音量特征
-        rms = librosa.feature.rms(y=y)[0]
+        with timer.span('spectral_features'):
+            rms = graph.rms()
         rms_mean = float(np.mean(rms))
         rms_std = float(np.std(rms))
         
         # 4. 过零率 (Zero Crossing Rate)
         # 反映音频信号的平滑度和噪音水平
-        zcr = librosa.feature.zero_crossing_rate(y)[0]
+        with timer.span('spectral_features'):
+            zcr = graph.zero_crossing_rate()
         zcr_mean = float(np.mean(zcr))
         
         # 5. 音高特征提取（使用基础的音高检测）
         # NOTE: 音高检测比较复杂，这里使用简化版本
         try:
-            pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
-            # 提取主要音高
-            pitch_values = []
-            for t in range(pitches.shape[1]):
-                index = magnitudes[:, t].argmax()
-                pitch = pitches[index, t]
-                if pitch > 0:  # 只统计有效音高
-                    pitch_values.append(pitch)
-            
-            if pitch_values:
-                pitch_mean = float(np.mean(pitch_values))
-                pitch_std = float(np.std(pitch_values))
-            else:
-                pitch_mean = None
-                pitch_std = None
+            with timer.span('pitch_tracking'):
+                pitches, magnitudes = graph.piptrack()
+                # 提取主要音高 (向量化)
+                contour = extract_pitch_contour(pitches, magnitudes)
+            pitch_mean = contour.mean
+            pitch_std = contour.std
         except Exception as e:
             logger.warning(f"音高提取失败: {str(e)}")
             pitch_mean = None
@@ -94,7 +97,7 @@ class AudioAnalyzer:
             pitch_std=pitch_std
         )
         
-        logger.info("音频特征提取完成")
+        logger.info(f"音频特征提取完成, STFT 复用情况: {graph.report()}")
         return features
     
     @staticmethod
@@ -233,50 +236,33 @@ class AudioAnalyzer:
         return "default-singer-adele"  # 这个ID需要在数据库初始化时创建
     
     @staticmethod
-    def extract_mfcc_feature_vector(file_path: str) -> list[float]:
+    def extract_mfcc_feature_vector(file_path: str, timer: StageTimer | None = None) -> list[float]:
         """
         提取 MFCC 特征向量（用于歌曲匹配）
         
         【修复5】升级为 20 阶 MFCC + Delta + Delta-Delta 特征
         
-        NOTE: 此方法使用的参数必须与离线特征提取脚本完全一致
+        NOTE: 参数由 service.feature_schema 统一定义，离线特征提取脚本使用同一实现，
+              返回向量的版本为 CURRENT_FEATURE_VERSION
         
         Args:
             file_path: 音频文件路径
+            timer: 可选的阶段计时器 (decode / mfcc)
         
         Returns:
             60维 MFCC 特征向量 (20 MFCC + 20 Delta + 20 Delta-Delta)
         """
+        from service.feature_schema import extract_feature_vector, CURRENT_FEATURE_VERSION
+        
         logger.info(f"提取增强型 MFCC 特征向量: {file_path}")
         
         try:
-            # 加载音频文件（统一重采样到 22050Hz，单声道）
-            y, sr = librosa.load(file_path, sr=22050, mono=True)
-            
-            # 【升级1】提取 20 阶 MFCC 特征（原本是13阶）
-            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
-            
-            # 【升级2】计算 Delta 特征（一阶导数，反映时间变化）
-            delta_mfccs = librosa.feature.delta(mfccs)
+            combined_features = extract_feature_vector(file_path, timer=timer)
             
-            # 【升级3】计算 Delta-Delta 特征（二阶导数，反映加速度变化）
-            delta2_mfccs = librosa.feature.delta(mfccs, order=2)
+            logger.info(f"✅ 增强型 MFCC 特征向量提取完成，维度: {len(combined_features)} "
+                        f"(版本 {CURRENT_FEATURE_VERSION})")
             
-            # 对时间轴求平均值，将二维矩阵降维为一维向量
-            mfcc_mean = np.mean(mfccs, axis=1)          # 20 维
-            delta_mean = np.mean(delta_mfccs, axis=1)   # 20 维
-            delta2_mean = np.mean(delta2_mfccs, axis=1) # 20 维
-            
-            # 【升级4】拼接所有特征为一个完整向量
-            combined_features = np.concatenate([
-                mfcc_mean,
-                delta_mean,
-                delta2_mean
-            ])
-            
-            logger.info(f"✅ 增强型 MFCC 特征向量提取完成，维度: {len(combined_features)} (20+20+20)")
-            
-            return combined_features.tolist()
+            return combined_features
             
         except Exception as e:
             logger.error(f"❌ MFCC 特征提取失败: {str(e)}", exc_info=True)
@@ -295,11 +281,15 @@ class AudioAnalyzer:
         Returns:
             相似度得分 (0-1之间，越高越相似)
         """
-        # 将列表转换为 numpy 数组
-        vec1_array = np.array(vec1).reshape(1, -1)
-        vec2_array = np.array(vec2).reshape(1, -1)
+        # NOTE: 单对向量直接用点积计算,批量检索请使用 SongCatalogIndex.search
+        vec1_array = np.asarray(vec1, dtype=np.float64)
+        vec2_array = np.asarray(vec2, dtype=np.float64)
+        
+        norm = np.linalg.norm(vec1_array) * np.linalg.norm(vec2_array)
+        if norm == 0:
+            return 0.0
         
         # 计算余弦相似度
-        similarity = cosine_similarity(vec1_array, vec2_array)[0][0]
+        similarity = np.dot(vec1_array, vec2_array) / norm
         
         return float(similarity)
@@ -0,0 +1,165 @@
+"""
+音频解码层 (只解码分析窗口)
+
+特征提取只使用前 10 秒、16kHz 的单声道音频,这里按此定制解码:
+- soundfile: 只读取窗口内的帧,随后用 soxr 低质量档 (对 16kHz 语音足够) 重采样
+- ffmpeg: 用 -t 限制解码时长,由 ffmpeg 直接输出 16kHz 单声道 float32,无需再重采样
+- audioread: 最后的兜底 (librosa.load),同样使用低质量重采样
+
+每种扩展名第一次成功解码时记住所用的后端,之后直接使用,不再逐个尝试。
+"""
+
+import io
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+# 后端名称
+BACKEND_SOUNDFILE = "soundfile"
+BACKEND_FFMPEG = "ffmpeg"
+BACKEND_AUDIOREAD = "audioread"
+
+# 重采样器: soxr 低质量档,比 librosa 默认的 soxr_hq 快数倍
+RESAMPLE_TYPE = "soxr_lq"
+
+FFMPEG_PATH = shutil.which("ffmpeg")
+
+# 扩展名 -> 上次成功的后端
+_backend_by_ext: dict[str, str] = {}
+_backend_lock = threading.Lock()
+
+
+class AudioDecodeError(Exception):
+    """所有后端都无法解码该音频"""
+
+
+@dataclass
+class DecodedAudio:
+    """
+    解码结果
+
+    Attributes:
+        y: 单声道 float32 波形
+        sr: 采样率
+        backend: 实际使用的解码后端
+        decode_ms: 解码 (含重采样) 耗时
+    """
+    y: np.ndarray
+    sr: int
+    backend: str
+    decode_ms: float
+
+
+def _resample(y: np.ndarray, orig_sr: int, sr: int) -> np.ndarray:
+    if orig_sr == sr:
+        return y
+    import soxr
+    return soxr.resample(y, orig_sr, sr, quality='LQ').astype(np.float32, copy=False)
+
+
+def _decode_soundfile(source, sr: int, duration: float) -> np.ndarray:
+    """libsndfile 解码,只读取窗口内的帧"""
+    with sf.SoundFile(source) as f:
+        y = f.read(frames=int(duration * f.samplerate), dtype='float32', always_2d=True)
+        orig_sr = f.samplerate
+    return _resample(y.mean(axis=1), orig_sr, sr)
+
+
+def _decode_ffmpeg(source, sr: int, duration: float) -> np.ndarray:
+    """ffmpeg 解码,-t 达到时长后停止,直接输出目标采样率的单声道 PCM"""
+    if FFMPEG_PATH is None:
+        raise AudioDecodeError("未安装 ffmpeg")
+    stdin = None
+    if isinstance(source, str):
+        input_arg = source
+    else:
+        input_arg, stdin = "pipe:0", source.getvalue()
+    cmd = [FFMPEG_PATH, "-hide_banner", "-loglevel", "error"]
+    if stdin is None:
+        cmd.append("-nostdin")
+    cmd += ["-t", str(duration), "-i", input_arg, "-ac", "1", "-ar", str(sr), "-f", "f32le", "pipe:1"]
+    proc = subprocess.run(cmd, input=stdin, capture_output=True, timeout=30)
+    if proc.returncode != 0:
+        raise AudioDecodeError(proc.stderr.decode('utf-8', 'replace').strip() or "ffmpeg 解码失败")
+    return np.frombuffer(proc.stdout, dtype=np.float32).copy()
+
+
+def _decode_audioread(source, sr: int, duration: float) -> np.ndarray:
+    """librosa / audioread 兜底"""
+    import librosa
+    y, _ = librosa.load(source, sr=sr, mono=True, duration=duration, res_type=RESAMPLE_TYPE)
+    return y
+
+
+_DECODERS = {
+    BACKEND_SOUNDFILE: _decode_soundfile,
+    BACKEND_FFMPEG: _decode_ffmpeg,
+    BACKEND_AUDIOREAD: _decode_audioread,
+}
+
+
+def _candidate_backends(ext: str) -> list[str]:
+    """按优先级排列的后端列表,缓存命中的后端排在最前"""
+    order = [BACKEND_SOUNDFILE, BACKEND_FFMPEG, BACKEND_AUDIOREAD]
+    if FFMPEG_PATH is None:
+        order.remove(BACKEND_FFMPEG)
+    cached = _backend_by_ext.get(ext)
+    if cached in order:
+        order.remove(cached)
+        order.insert(0, cached)
+    return order
+
+
+def decode_audio(source: str | io.BytesIO, ext: str = "", sr: int = 16000,
+                 duration: float = 10.0) -> DecodedAudio:
+    """
+    解码音频的前 duration 秒为单声道 float32
+
+    Args:
+        source: 文件路径或内存缓冲区
+        ext: 扩展名 (用于缓存后端选择),为空时从路径推断
+        sr: 目标采样率
+        duration: 解码时长上限 (秒)
+
+    Returns:
+        DecodedAudio
+
+    Raises:
+        AudioDecodeError: 所有后端都失败
+    """
+    if not ext and isinstance(source, str):
+        ext = os.path.splitext(source)[1].lower()
+
+    errors = []
+    start = time.perf_counter()
+    for backend in _candidate_backends(ext):
+        if isinstance(source, io.BytesIO):
+            source.seek(0)
+        try:
+            y = _DECODERS[backend](source, sr, duration)
+        except Exception as e:
+            errors.append(f"{backend}: {str(e)}")
+            continue
+        with _backend_lock:
+            if _backend_by_ext.get(ext) != backend:
+                _backend_by_ext[ext] = backend
+                logger.info(f"解码后端选择: {ext or '(无扩展名)'} -> {backend}")
+        decode_ms = (time.perf_counter() - start) * 1000
+        return DecodedAudio(y=y, sr=sr, backend=backend, decode_ms=decode_ms)
+
+    raise AudioDecodeError("; ".join(errors))
+
+
+def backend_choices() -> dict[str, str]:
+    """当前进程缓存的 扩展名 -> 后端 映射"""
+    with _backend_lock:
+        return dict(_backend_by_ext)
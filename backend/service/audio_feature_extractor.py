@@ -7,81 +7,112 @@
 - 响度 (RMS Energy)
 - 音准稳定性
 - 音域范围
+- 歌曲检索向量 (与 songs.feature_vector 同一版本,用于推荐排序)
 """
 
-import librosa
 import numpy as np
 import logging
 from typing import Dict, Any
+from service.pitch_contour import extract_pitch_contour
+from service.feature_graph import SpectralFeatureGraph
+from service.audio_ingest import AudioPayload
+from service.audio_decoder import decode_audio
+from service.voice_activity import trim_to_voiced, InsufficientVoiceError
+from service.metrics import StageTimer
+from service.feature_schema import CURRENT_FEATURE_VERSION, compute_query_vector
 
 logger = logging.getLogger(__name__)
 
+# 特征流水线版本号
+# NOTE: 修改特征提取逻辑 (采样率、窗长、算法等) 时必须递增,结果缓存按此版本失效
+FEATURE_PIPELINE_VERSION = 5
 
-def extract_audio_features(file_path: str) -> Dict[str, Any]:
+
+def extract_audio_features(audio: str | AudioPayload) -> Dict[str, Any]:
     """
     提取音频文件的声学特征 (性能优化版)
     
     Args:
-        file_path: 音频文件路径
+        audio: 音频文件路径,或流式接收的 AudioPayload (wav 等格式直接从内存解码)
         
     Returns:
         dict: 包含所有提取特征的字典
         
+    Raises:
+        InsufficientVoiceError: 有效人声过少
+        
     NOTE: 性能优化措施
-    - 只读取前10秒 (从30秒缩短)
-    - 采样率16000Hz (从22050Hz降低)
+    - 只解码前10秒 (从30秒缩短),读满窗口即停止
+    - 采样率16000Hz (从22050Hz降低),使用 soxr 低质量档重采样
     - 使用piptrack替代pyin (速度提升10-20倍)
+    - 音高/质心/响度共享一次 STFT (SpectralFeatureGraph)
+    - 各阶段耗时写入 features['stage_timings'],由主进程汇总到 /metrics
     """
+    timer = StageTimer()
     try:
         # 1. 加载音频 (性能优化: 10秒, 16kHz)
-        logger.info(f"开始加载音频文件: {file_path}")
-        y, sr = librosa.load(file_path, sr=16000, duration=10)
-        logger.info(f"音频加载成功: 采样率={sr}, 时长={len(y)/sr:.2f}秒")
+        # 只解码前10秒,低质量 soxr 重采样到 16kHz (见 audio_decoder)
+        if isinstance(audio, AudioPayload):
+            source, ext = audio.source(), audio.ext
+        else:
+            source, ext = audio, ""
+        logger.info(f"开始加载音频: {source if isinstance(source, str) else '内存缓冲区'}")
+        with timer.span('decode'):
+            decoded = decode_audio(source, ext=ext, sr=16000, duration=10)
+        y, sr = decoded.y, decoded.sr
+        logger.info(
+            f"音频加载成功: 采样率={sr}, 时长={len(y)/sr:.2f}秒, "
+            f"后端={decoded.backend}, 解码耗时={decoded.decode_ms:.1f}ms"
+        )
         
-        # 2. 提取音高特征 (使用piptrack替代pyin,速度快10-20倍)
+        # 2. VAD: 去掉首尾静音和噪声,只分析有声片段 (人声过少时直接拒绝)
+        with timer.span('voice_activity'):
+            activity = trim_to_voiced(y, sr)
+        y = activity.y
+        
+        # 3. 提取音高特征 (使用piptrack替代pyin,速度快10-20倍)
         logger.info("提取音高特征...")
         
+        # 所有频域特征共享同一次 STFT (STFT 耗时计入音高阶段)
+        graph = SpectralFeatureGraph(y, sr)
+        
         # 使用piptrack进行快速音高估算
-        pitches, magnitudes = librosa.piptrack(
-            y=y, 
-            sr=sr,
-            fmin=60,   # 人声最低频率
-            fmax=500,  # 人声最高频率
-            threshold=0.1
-        )
+        with timer.span('pitch_tracking'):
+            pitches, magnitudes = graph.piptrack(
+                fmin=60,   # 人声最低频率
+                fmax=500,  # 人声最高频率
+                threshold=0.1
+            )
         
-        # 提取每帧的主导音高
-        pitch_values = []
-        for t in range(pitches.shape[1]):
-            index = magnitudes[:, t].argmax()
-            pitch = pitches[index, t]
-            if pitch > 0:  # 过滤掉0值
-                pitch_values.append(pitch)
+        # 提取每帧的主导音高 (向量化)
+        with timer.span('pitch_tracking'):
+            contour = extract_pitch_contour(pitches, magnitudes)
         
-        if len(pitch_values) == 0:
+        if not contour.has_pitch:
             logger.warning("未检测到有效音高,使用默认值")
             pitch_mean = 200  # 默认中音
             pitch_std = 40
             pitch_min = 150
             pitch_max = 250
         else:
-            pitch_values = np.array(pitch_values)
-            pitch_mean = float(np.mean(pitch_values))
-            pitch_std = float(np.std(pitch_values))
-            pitch_min = float(np.min(pitch_values))
-            pitch_max = float(np.max(pitch_values))
+            pitch_mean = contour.mean
+            pitch_std = contour.std
+            pitch_min = contour.min
+            pitch_max = contour.max
         
-        # 3. 提取音色亮度 (Spectral Centroid)
+        # 4. 提取音色亮度 (Spectral Centroid)
         logger.info("提取音色亮度...")
-        spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
+        with timer.span('spectral_features'):
+            spectral_centroids = graph.spectral_centroid()
         brightness = float(np.mean(spectral_centroids))
         
-        # 4. 提取响度 (RMS Energy)
+        # 5. 提取响度 (RMS Energy)
         logger.info("提取响度...")
-        rms = librosa.feature.rms(y=y)[0]
+        with timer.span('spectral_features'):
+            rms = graph.rms()
         energy = float(np.mean(rms))
         
-        # 5. 计算音准稳定性 (基于F0方差)
+        # 6. 计算音准稳定性 (基于F0方差)
         # 方差越小,音准越稳定
         if pitch_mean > 0:
             pitch_stability_ratio = pitch_std / pitch_mean
@@ -89,21 +120,21 @@ def extract_audio_features(file_path: str) -> Dict[str, Any]:
         else:
             pitch_stability = 50  # 默认值
         
-        # 6. 计算音域范围
+        # 7. 计算音域范围
         pitch_range = pitch_max - pitch_min
         # 归一化到0-100分数 (人声音域约2-3个八度,约200-400Hz)
         pitch_range_score = min(100, (pitch_range / 300) * 100)
         
-        # 7. 计算明亮度分数 (归一化到0-100)
+        # 8. 计算明亮度分数 (归一化到0-100)
         # 频谱质心范围约1000-5000Hz
         brightness_score = min(100, ((brightness - 1000) / 4000) * 100)
         brightness_score = max(0, brightness_score)
         
-        # 8. 计算力度分数 (归一化到0-100)
+        # 9. 计算力度分数 (归一化到0-100)
         # RMS范围约0-0.3
         energy_score = min(100, (energy / 0.3) * 100)
         
-        # 9. 计算整体稳定性 (综合音高和响度的稳定性)
+        # 10. 计算整体稳定性 (综合音高和响度的稳定性)
         rms_std = float(np.std(rms))
         rms_mean = float(np.mean(rms))
         if rms_mean > 0:
@@ -114,6 +145,10 @@ def extract_audio_features(file_path: str) -> Dict[str, Any]:
         
         overall_stability = (pitch_stability + energy_stability) / 2
         
+        # 11. 歌曲检索向量: 复用 VAD 裁剪后的分析窗口,重采样到 feature_schema 规定的采样率
+        with timer.span('song_vector'):
+            feature_vector = _song_match_vector(y, sr)
+        
         features = {
             # 原始特征
             'pitch_mean': pitch_mean,
@@ -130,20 +165,46 @@ def extract_audio_features(file_path: str) -> Dict[str, Any]:
             'energy_score': energy_score,
             'stability_score': overall_stability,
             
+            # 歌曲检索向量 (提取失败时为 None,推荐退回按歌手筛选)
+            'feature_vector': feature_vector,
+            'feature_version': CURRENT_FEATURE_VERSION,
+            
             # 元数据
             'sample_rate': sr,
-            'duration': len(y) / sr
+            'duration': len(y) / sr,  # 有声片段时长
+            'voiced_ratio': activity.voiced_ratio,
+            'decode_backend': decoded.backend,
+            'decode_ms': decoded.decode_ms,
+            'stage_timings': timer.timings
         }
         
+        logger.info(f"STFT 复用情况: {graph.report()}")
         logger.info(f"特征提取完成: pitch={pitch_mean:.1f}Hz, brightness={brightness:.1f}Hz, energy={energy:.3f}")
         return features
         
+    except InsufficientVoiceError:
+        # 录音中几乎没有人声: 交给调用方拒绝请求,而不是用默认特征继续分析
+        raise
     except Exception as e:
         logger.error(f"音频特征提取失败: {str(e)}")
         # 返回默认特征
         return _get_default_features()
 
 
+def _song_match_vector(y: np.ndarray, sr: int) -> list[float] | None:
+    """
+    提取与歌曲目录同一版本的特征向量 (基于 VAD 裁剪后的分析窗口)
+    
+    Returns:
+        向量,失败时返回 None (不影响其余特征)
+    """
+    try:
+        return compute_query_vector(y, sr)
+    except Exception as e:
+        logger.warning(f"歌曲检索向量提取失败: {str(e)}")
+        return None
+
+
 def _get_default_features() -> Dict[str, Any]:
     """
     获取默认特征 (当提取失败时使用)
@@ -164,7 +225,8 @@ def _get_default_features() -> Dict[str, Any]:
         'energy_score': 50,
         'stability_score': 60,
         'sample_rate': 16000,
-        'duration': 10
+        'duration': 10,
+        'is_fallback': True  # 标记为默认值,调用方不应缓存
     }
 
 
@@ -183,3 +245,17 @@ def normalize_user_features(features: Dict[str, Any]) -> Dict[str, float]:
         'brightness': features['brightness'] / 5000.0,  # 频谱质心范围约1000-5000Hz
         'energy': features['energy']  # RMS已经在0-1范围内
     }
+
+
+def user_feature_vector(features: Dict[str, Any]) -> np.ndarray:
+    """
+    归一化用户特征向量 [音高, 亮度, 响度],与 SINGER_MATRIX 的列对齐
+    
+    Args:
+        features: 提取的音频特征
+        
+    Returns:
+        np.ndarray: 长度为3的归一化特征向量
+    """
+    normalized = normalize_user_features(features)
+    return np.array([normalized['pitch'], normalized['brightness'], normalized['energy']])
@@ -0,0 +1,135 @@
+"""
+音频上传流式接收
+
+上传文件按块读取,边读边校验大小、边计算内容哈希,不再整段 read() 后再写临时文件:
+- soundfile 能直接解码的格式 (wav / flac / ogg) 保留在内存中,解码时从 BytesIO 读取
+- 需要 ffmpeg / audioread 解码的格式 (webm / m4a / mp3) 边读边写入临时文件
+"""
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+
+from fastapi import UploadFile
+
+from service.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# libsndfile 可以直接从内存缓冲区解码的格式
+IN_MEMORY_FORMATS = frozenset({'.wav', '.flac', '.ogg'})
+
+# 每次从上传流读取的块大小
+CHUNK_SIZE = 256 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """上传文件超过大小限制"""
+
+
+@dataclass(frozen=True)
+class AudioPayload:
+    """
+    已接收的音频 (可 pickle,可直接提交给进程池)
+
+    Attributes:
+        ext: 文件扩展名 (小写,含点)
+        content_hash: 内容 SHA-256
+        size: 字节数
+        data: 内存中的音频内容 (in-memory 格式)
+        path: 临时文件路径 (需要落盘的格式)
+    """
+    ext: str
+    content_hash: str
+    size: int
+    data: bytes | None = None
+    path: str | None = None
+
+    @property
+    def in_memory(self) -> bool:
+        return self.data is not None
+
+    def source(self) -> str | io.BytesIO:
+        """返回可直接交给 librosa / soundfile 的输入 (文件路径或内存缓冲区)"""
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        return self.path
+
+    def cleanup(self) -> None:
+        """删除落盘的临时文件 (内存中的音频无需清理)"""
+        if self.path and os.path.exists(self.path):
+            try:
+                os.unlink(self.path)
+                logger.info(f"临时文件已删除: {self.path}")
+            except OSError as e:
+                logger.warning(f"删除临时文件失败: {str(e)}")
+
+
+async def read_upload(upload: UploadFile, max_bytes: int, spool_to_disk: bool = False,
+                      chunk_size: int = CHUNK_SIZE) -> AudioPayload:
+    """
+    流式读取上传的音频
+
+    Args:
+        upload: FastAPI 上传文件
+        max_bytes: 大小上限,超过时立即停止读取
+        spool_to_disk: 强制写入临时文件 (如异步任务需要持久化的音频路径)
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        AudioPayload,落盘时由调用方负责 cleanup()
+
+    Raises:
+        UploadTooLargeError: 文件超过大小限制
+    """
+    ext = os.path.splitext(upload.filename or '')[1].lower()
+
+    # 客户端声明了大小时直接拒绝,不必读取内容
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLargeError(f"文件大小 {upload.size} 超过上限 {max_bytes}")
+
+    digest = hashlib.sha256()
+    size = 0
+    to_disk = spool_to_disk or ext not in IN_MEMORY_FORMATS
+    buffer = bytearray()
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=ext) if to_disk else None
+    # 读取上传流和写入临时文件交替进行,分别计时
+    read_start = time.perf_counter()
+    write_seconds = 0.0
+
+    try:
+        while chunk := await upload.read(chunk_size):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(f"文件大小超过上限 {max_bytes}")
+            digest.update(chunk)
+            if temp_file:
+                write_start = time.perf_counter()
+                temp_file.write(chunk)
+                write_seconds += time.perf_counter() - write_start
+            else:
+                buffer.extend(chunk)
+    except BaseException:
+        if temp_file:
+            temp_file.close()
+            os.unlink(temp_file.name)
+        raise
+
+    metrics = get_metrics()
+    if temp_file:
+        write_start = time.perf_counter()
+        temp_file.close()
+        write_seconds += time.perf_counter() - write_start
+        metrics.observe('temp_write', write_seconds)
+    metrics.observe('upload_read', time.perf_counter() - read_start - write_seconds)
+
+    if temp_file:
+        logger.info(f"上传音频已写入临时文件: {temp_file.name} ({size} 字节)")
+        return AudioPayload(ext=ext, content_hash=digest.hexdigest(), size=size, path=temp_file.name)
+
+    logger.info(f"上传音频保留在内存中 ({size} 字节)")
+    return AudioPayload(ext=ext, content_hash=digest.hexdigest(), size=size, data=bytes(buffer))
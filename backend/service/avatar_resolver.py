@@ -0,0 +1,171 @@
+"""
+歌手头像 / 歌曲封面 URL 解析
+
+原来每次生成分析结果都要对 static/avatars 逐个扩展名调用 os.path.exists (最多 7 次 stat),
+推荐列表里每首歌还要重新拼一次封面 URL。这里改为:
+- 启动时扫描一次头像目录,建立 名字 -> URL 映射
+- 按目录修改时间轮询 (最多每 poll_interval 秒 stat 一次目录),新增/删除/改名后自动重建
+- 同名多种格式时优先 WebP,其次 JPEG、PNG;忽略 .part 等非图片文件
+- UI-Avatars 兜底 URL 只依赖名字,结果按名字缓存
+"""
+
+import logging
+import os
+import threading
+import time
+import urllib.parse
+from functools import lru_cache
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# 本地头像扩展名 (越靠前优先级越高,比较时不区分大小写)
+EXTENSION_PRIORITY = (".webp", ".jpg", ".jpeg", ".png")
+
+
+@lru_cache(maxsize=4096)
+def singer_fallback_url(artist_name: str | None) -> str:
+    """圆形文字头像 (UI-Avatars)"""
+    encoded_name = urllib.parse.quote(artist_name or "歌手")
+    return (
+        f"https://ui-avatars.com/api/"
+        f"?name={encoded_name}"
+        f"&background=random"  # 随机颜色
+        f"&color=fff"          # 白色文字
+        f"&size=256"
+        f"&bold=true"
+        f"&rounded=true"       # 歌手头像是圆的
+        f"&length=2"
+    )
+
+
+@lru_cache(maxsize=4096)
+def song_cover_url(song_title: str | None) -> str:
+    """方形文字封面 (UI-Avatars)"""
+    encoded_title = urllib.parse.quote(song_title or "Song")
+    return (
+        f"https://ui-avatars.com/api/"
+        f"?name={encoded_title}"
+        f"&background=random"  # 随机背景色
+        f"&color=fff"          # 白色文字
+        f"&size=512"           # 分辨率高一点
+        f"&bold=true"
+        f"&length=1"           # 封面只显示 1 个字/字母
+        f"&rounded=false"      # 歌曲封面是方的 (看起来像专辑)
+        f"&font-size=0.5"      # 字体大小
+    )
+
+
+class AvatarResolver:
+    """
+    本地头像查找表
+
+    Args:
+        avatar_dir: 头像目录
+        base_url: 静态文件对外访问的域名
+        poll_interval: 两次检查目录修改时间的最短间隔 (秒)
+    """
+
+    def __init__(self, avatar_dir: str, base_url: str, poll_interval: float = 5.0):
+        self.avatar_dir = avatar_dir
+        self.base_url = base_url
+        self.poll_interval = poll_interval
+        self._urls: dict[str, str] = {}
+        self._dir_mtime_ns: int | None = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+        self._counters = {'scans': 0, 'local_hits': 0, 'fallbacks': 0}
+
+    def _scan(self) -> dict[str, str]:
+        """扫描目录,返回 {名字: URL}"""
+        best: dict[str, tuple[int, str]] = {}
+        try:
+            entries = list(os.scandir(self.avatar_dir))
+        except FileNotFoundError:
+            return {}
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if not stem or ext not in EXTENSION_PRIORITY or not entry.is_file():
+                continue
+            rank = EXTENSION_PRIORITY.index(ext)
+            if stem not in best or rank < best[stem][0]:
+                best[stem] = (rank, entry.name)
+        return {
+            stem: f"{self.base_url}/static/avatars/{filename}"
+            for stem, (_, filename) in best.items()
+        }
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        目录有变化时重建映射
+
+        Args:
+            force: 忽略轮询间隔和修改时间,强制重新扫描
+
+        Returns:
+            是否重新扫描
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.poll_interval:
+            return False
+        with self._lock:
+            if not force and now - self._checked_at < self.poll_interval:
+                return False
+            self._checked_at = now
+            try:
+                mtime_ns = os.stat(self.avatar_dir).st_mtime_ns
+            except FileNotFoundError:
+                mtime_ns = None
+            if not force and mtime_ns == self._dir_mtime_ns:
+                return False
+            # 新文件都是先写 .part 再改名,改名会更新目录修改时间
+            self._urls = self._scan()
+            self._dir_mtime_ns = mtime_ns
+            self._counters['scans'] += 1
+        logger.info(f"🖼️ 头像目录已扫描: {len(self._urls)} 个本地头像")
+        return True
+
+    def local_avatar_url(self, artist_name: str | None) -> str | None:
+        """本地头像 URL,没有则返回 None"""
+        self.refresh()
+        return self._urls.get(artist_name) if artist_name else None
+
+    def singer_avatar_url(self, artist_name: str | None) -> str:
+        """歌手头像: 优先本地真实照片,其次文字头像"""
+        url = self.local_avatar_url(artist_name)
+        if url is not None:
+            self._counters['local_hits'] += 1
+            return url
+        self._counters['fallbacks'] += 1
+        return singer_fallback_url(artist_name)
+
+    def song_cover_url(self, song_title: str | None) -> str:
+        """歌曲封面 (自动生成)"""
+        return song_cover_url(song_title)
+
+    def stats(self) -> dict[str, Any]:
+        """查找表统计"""
+        return {'local_avatars': len(self._urls), **self._counters}
+
+
+_avatar_resolver: AvatarResolver | None = None
+
+
+def get_avatar_resolver() -> AvatarResolver:
+    """
+    获取头像解析器单例
+
+    Returns:
+        AvatarResolver 实例
+    """
+    global _avatar_resolver
+    if _avatar_resolver is None:
+        from config import get_settings
+        from service.ai_image_service import AIImageService
+        _avatar_resolver = AvatarResolver(
+            avatar_dir=AIImageService.AVATAR_DIR,
+            base_url=AIImageService.BASE_URL,
+            poll_interval=get_settings().avatar_poll_interval_s
+        )
+    return _avatar_resolver
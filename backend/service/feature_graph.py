@@ -0,0 +1,155 @@
+"""
+共享频谱特征图 (单次 STFT)
+
+每段音频只计算一次幅度谱,所有频域特征都从同一缓冲区派生:
+- 频谱质心 / 带宽 / 滚降点
+- Mel 频谱 / MFCC
+- piptrack 音高
+- RMS 能量
+
+NOTE: 过零率是时域特征,不依赖 STFT,单独计算
+"""
+
+from typing import Any
+import librosa
+import numpy as np
+import scipy.signal
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SpectralFeatureGraph:
+    """
+    频谱特征图
+
+    首次访问 magnitude 时计算 STFT,之后所有特征复用该结果;
+    派生特征按参数缓存,重复请求不会重复计算。
+    通过 report() 可以查看 STFT 被哪些特征复用。
+    """
+
+    def __init__(self, y: np.ndarray, sr: int, n_fft: int = 2048, hop_length: int = 512):
+        self.y = y
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+
+        self._magnitude: np.ndarray | None = None
+        self._power: np.ndarray | None = None
+        self._cache: dict[tuple, Any] = {}
+        self._stft_count = 0
+        self._consumers: list[str] = []
+
+    # --- 共享缓冲区 ---
+
+    @property
+    def magnitude(self) -> np.ndarray:
+        """幅度谱 |STFT| (整段音频只计算一次)"""
+        if self._magnitude is None:
+            self._magnitude = np.abs(
+                librosa.stft(self.y, n_fft=self.n_fft, hop_length=self.hop_length)
+            )
+            self._stft_count += 1
+        return self._magnitude
+
+    @property
+    def power(self) -> np.ndarray:
+        """功率谱 |STFT|^2"""
+        if self._power is None:
+            self._power = self.magnitude ** 2
+        return self._power
+
+    def _spectrum_for(self, name: str) -> np.ndarray:
+        """登记特征对 STFT 的使用并返回幅度谱"""
+        self._consumers.append(name)
+        return self.magnitude
+
+    def _memo(self, key: tuple, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    # --- 派生特征 ---
+
+    def spectral_centroid(self) -> np.ndarray:
+        """频谱质心 (每帧)"""
+        return self._memo(('centroid',), lambda: librosa.feature.spectral_centroid(
+            S=self._spectrum_for('spectral_centroid'), sr=self.sr,
+            n_fft=self.n_fft, hop_length=self.hop_length
+        )[0])
+
+    def spectral_bandwidth(self) -> np.ndarray:
+        """频谱带宽 (每帧)"""
+        return self._memo(('bandwidth',), lambda: librosa.feature.spectral_bandwidth(
+            S=self._spectrum_for('spectral_bandwidth'), sr=self.sr,
+            n_fft=self.n_fft, hop_length=self.hop_length
+        )[0])
+
+    def spectral_rolloff(self) -> np.ndarray:
+        """频谱滚降点 (每帧)"""
+        return self._memo(('rolloff',), lambda: librosa.feature.spectral_rolloff(
+            S=self._spectrum_for('spectral_rolloff'), sr=self.sr,
+            n_fft=self.n_fft, hop_length=self.hop_length
+        )[0])
+
+    def melspectrogram(self, n_mels: int = 128) -> np.ndarray:
+        """Mel 功率谱"""
+        def compute():
+            self._spectrum_for('melspectrogram')
+            return librosa.feature.melspectrogram(
+                S=self.power, sr=self.sr, n_fft=self.n_fft,
+                hop_length=self.hop_length, n_mels=n_mels
+            )
+        return self._memo(('mel', n_mels), compute)
+
+    def mfcc(self, n_mfcc: int = 13, n_mels: int = 128) -> np.ndarray:
+        """MFCC (基于共享 Mel 谱)"""
+        return self._memo(('mfcc', n_mfcc, n_mels), lambda: librosa.feature.mfcc(
+            S=librosa.power_to_db(self.melspectrogram(n_mels)), sr=self.sr, n_mfcc=n_mfcc
+        ))
+
+    def piptrack(self, fmin: float = 150.0, fmax: float = 4000.0,
+                 threshold: float = 0.1) -> tuple[np.ndarray, np.ndarray]:
+        """piptrack 音高/幅度矩阵"""
+        return self._memo(('piptrack', fmin, fmax, threshold), lambda: librosa.piptrack(
+            S=self._spectrum_for('piptrack'), sr=self.sr, n_fft=self.n_fft,
+            hop_length=self.hop_length, fmin=fmin, fmax=fmax, threshold=threshold
+        ))
+
+    def rms(self) -> np.ndarray:
+        """
+        RMS 能量 (每帧)
+
+        NOTE: 从加窗频谱计算的 RMS 会被汉宁窗能量衰减,
+        这里按窗函数均方根做补偿,使数值与时域 rms(y=...) 保持一致
+        """
+        def compute():
+            rms = librosa.feature.rms(
+                S=self._spectrum_for('rms'), frame_length=self.n_fft,
+                hop_length=self.hop_length
+            )[0]
+            window = scipy.signal.get_window('hann', self.n_fft, fftbins=True)
+            return rms / np.sqrt(np.mean(window ** 2))
+        return self._memo(('rms',), compute)
+
+    def zero_crossing_rate(self) -> np.ndarray:
+        """过零率 (时域特征,不使用 STFT)"""
+        return self._memo(('zcr',), lambda: librosa.feature.zero_crossing_rate(
+            self.y, frame_length=self.n_fft, hop_length=self.hop_length
+        )[0])
+
+    # --- 诊断 ---
+
+    def report(self) -> dict[str, Any]:
+        """
+        STFT 复用报告
+
+        Returns:
+            dict: stft_computed (实际计算次数), stft_consumers (使用共享谱的特征),
+                  stft_reused (复用次数, 即节省的 STFT 次数)
+        """
+        return {
+            'stft_computed': self._stft_count,
+            'stft_consumers': list(self._consumers),
+            'stft_reused': max(0, len(self._consumers) - self._stft_count)
+        }
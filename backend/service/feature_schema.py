@@ -0,0 +1,154 @@
+"""
+歌曲匹配特征向量规范 (带版本号)
+
+离线脚本写入 songs.feature_vector 的向量和在线从用户音频提取的向量必须出自同一套参数,
+否则余弦相似度没有意义。这里集中定义每个版本的提取参数,两条路径都只调用本模块:
+- 版本 1: 13 阶 MFCC 均值 (历史离线脚本写入的向量)
+- 版本 2: 20 阶 MFCC + Delta + Delta-Delta 均值,共 60 维
+- songs.feature_version 记录向量版本;缺失时按维度推断 (兼容迁移前写入的行)
+- 相似度检索只比较同一版本的向量,旧版本向量由离线脚本重新提取升级
+"""
+
+import io
+import logging
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from service.metrics import StageTimer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """
+    特征向量提取参数
+
+    Attributes:
+        version: 版本号
+        sr: 采样率
+        n_mfcc: MFCC 阶数
+        deltas: 是否拼接一阶/二阶差分均值
+        duration: 最多使用的音频时长 (秒)
+    """
+    version: int
+    sr: int
+    n_mfcc: int
+    deltas: bool
+    duration: float
+
+    @property
+    def dim(self) -> int:
+        """向量维度"""
+        return self.n_mfcc * (3 if self.deltas else 1)
+
+
+FEATURE_SPECS: dict[int, FeatureSpec] = {
+    1: FeatureSpec(version=1, sr=22050, n_mfcc=13, deltas=False, duration=120.0),
+    2: FeatureSpec(version=2, sr=22050, n_mfcc=20, deltas=True, duration=120.0),
+}
+
+# 当前版本: 新提取的向量一律使用该版本,检索也只使用该版本的歌曲向量
+CURRENT_FEATURE_VERSION = 2
+CURRENT_FEATURE_SPEC = FEATURE_SPECS[CURRENT_FEATURE_VERSION]
+
+
+def infer_feature_version(vector: list[float] | None) -> int | None:
+    """
+    按维度推断未记录版本号的向量版本
+
+    Returns:
+        版本号,无法识别时返回 None
+    """
+    if not vector:
+        return None
+    for spec in FEATURE_SPECS.values():
+        if spec.dim == len(vector):
+            return spec.version
+    return None
+
+
+def song_feature_version(song: dict[str, Any]) -> int | None:
+    """歌曲记录的向量版本 (优先使用 feature_version 列)"""
+    if not song.get('feature_vector'):
+        return None
+    return song.get('feature_version') or infer_feature_version(song['feature_vector'])
+
+
+def is_current(song: dict[str, Any]) -> bool:
+    """歌曲是否已有当前版本的特征向量"""
+    return song_feature_version(song) == CURRENT_FEATURE_VERSION
+
+
+def compute_feature_vector(y: np.ndarray, sr: int, spec: FeatureSpec = CURRENT_FEATURE_SPEC) -> np.ndarray:
+    """
+    从波形计算特征向量
+
+    Args:
+        y: 单声道波形 (采样率需等于 spec.sr)
+        sr: 采样率
+        spec: 特征规范
+
+    Returns:
+        (spec.dim,) float32 向量
+    """
+    import librosa
+    if sr != spec.sr:
+        raise ValueError(f"采样率 {sr} 与特征版本 {spec.version} 要求的 {spec.sr} 不一致")
+
+    mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=spec.n_mfcc)
+    parts = [np.mean(mfccs, axis=1)]
+    if spec.deltas:
+        # 一阶差分反映时间变化,二阶差分反映加速度变化
+        parts.append(np.mean(librosa.feature.delta(mfccs), axis=1))
+        parts.append(np.mean(librosa.feature.delta(mfccs, order=2), axis=1))
+    return np.concatenate(parts).astype(np.float32)
+
+
+def compute_query_vector(y: np.ndarray, sr: int, spec: FeatureSpec = CURRENT_FEATURE_SPEC) -> list[float]:
+    """
+    在线检索用的查询向量: 复用已解码、VAD 裁剪后的分析窗口,不再按 spec 重新解码整段上传
+
+    NOTE: 分析窗口是 16kHz,重采样到 spec.sr 后 8kHz 以上的频带为空,
+          与歌曲向量相比高阶 Mel 带会偏低;排序只用于推荐,可以接受
+
+    Args:
+        y: 单声道波形 (分析窗口)
+        sr: 采样率
+        spec: 特征规范
+
+    Returns:
+        spec.dim 维向量
+    """
+    if sr != spec.sr:
+        import soxr
+        y = soxr.resample(y, sr, spec.sr, quality='LQ').astype(np.float32, copy=False)
+    return compute_feature_vector(y, spec.sr, spec).tolist()
+
+
+def extract_feature_vector(source: str | io.BytesIO, ext: str = "",
+                           spec: FeatureSpec = CURRENT_FEATURE_SPEC,
+                           timer: StageTimer | None = None) -> list[float]:
+    """
+    解码音频并提取特征向量 (在线分析和离线脚本共用)
+
+    Args:
+        source: 文件路径或内存缓冲区
+        ext: 扩展名 (内存缓冲区时用于选择解码后端)
+        spec: 特征规范
+        timer: 可选的阶段计时器 (decode / mfcc)
+
+    Returns:
+        spec.dim 维向量
+
+    Raises:
+        AudioDecodeError: 无法解码
+    """
+    from service.audio_decoder import decode_audio
+    timer = timer or StageTimer()
+    with timer.span('decode'):
+        decoded = decode_audio(source, ext=ext, sr=spec.sr, duration=spec.duration)
+    with timer.span('mfcc'):
+        return compute_feature_vector(decoded.y, decoded.sr, spec).tolist()
@@ -0,0 +1,176 @@
+"""
+本地特征库 (SQLite)
+
+离线特征提取以 "文件路径 + 大小 + 修改时间 + 内容哈希" 为键,在本地记录每个音频文件的特征向量
+以及它最后一次推送到数据库时对应的歌曲:
+- 大小和修改时间都没变: 直接判定未变化,不读文件、不解码
+- 大小或修改时间变了: 重新计算内容哈希,哈希相同 (只是 touch / 复制) 仍复用旧向量
+- 改名或移动的文件: 按内容哈希找到旧记录,复用向量
+- 只有新提取或尚未推送到当前歌曲的向量才需要写入数据库
+- 记录同时保存向量版本 (feature_schema),旧版本的记录不再复用
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# 计算内容哈希时每次读取的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_content_hash(path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """
+    计算文件内容哈希 (BLAKE2b,比解码音频便宜得多)
+
+    Returns:
+        十六进制哈希字符串
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class StoredFeature:
+    """
+    本地特征记录
+
+    Attributes:
+        path: 文件路径
+        size: 文件字节数
+        mtime_ns: 修改时间 (纳秒)
+        content_hash: 内容哈希
+        feature_vector: 特征向量
+        feature_version: 特征向量版本
+        pushed_song_id: 该向量最后一次成功写入的歌曲ID,尚未推送时为 None
+    """
+    path: str
+    size: int
+    mtime_ns: int
+    content_hash: str
+    feature_vector: list[float]
+    feature_version: int
+    pushed_song_id: str | None
+
+    def same_stat(self, stat: os.stat_result) -> bool:
+        """文件大小和修改时间是否与记录一致"""
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+
+class FeatureStore:
+    """
+    SQLite 特征库 (线程安全,写入线程可直接标记推送结果)
+
+    Args:
+        db_path: 数据库文件路径
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_features (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    feature_vector TEXT NOT NULL,
+                    feature_version INTEGER NOT NULL DEFAULT 1,
+                    pushed_song_id TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(file_features)")}
+            if 'feature_version' not in columns:
+                # 引入版本号之前创建的特征库,已有记录都是版本 1
+                self._conn.execute(
+                    "ALTER TABLE file_features ADD COLUMN feature_version INTEGER NOT NULL DEFAULT 1"
+                )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_file_features_hash ON file_features(content_hash)"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM file_features").fetchone()[0]
+
+    @staticmethod
+    def _to_feature(row: sqlite3.Row | None) -> StoredFeature | None:
+        if row is None:
+            return None
+        return StoredFeature(
+            path=row['path'],
+            size=row['size'],
+            mtime_ns=row['mtime_ns'],
+            content_hash=row['content_hash'],
+            feature_vector=json.loads(row['feature_vector']),
+            feature_version=row['feature_version'],
+            pushed_song_id=row['pushed_song_id']
+        )
+
+    def get(self, path: str) -> StoredFeature | None:
+        """按路径读取记录"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM file_features WHERE path = ?", (path,)).fetchone()
+        return self._to_feature(row)
+
+    def find_by_hash(self, content_hash: str, feature_version: int) -> StoredFeature | None:
+        """按内容哈希读取指定版本的记录 (用于识别改名/移动的文件)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM file_features WHERE content_hash = ? AND feature_version = ? "
+                "ORDER BY updated_at DESC LIMIT 1",
+                (content_hash, feature_version)
+            ).fetchone()
+        return self._to_feature(row)
+
+    def put(self, path: str, stat: os.stat_result, content_hash: str, feature_vector: list[float],
+            feature_version: int, pushed_song_id: str | None = None) -> None:
+        """写入或覆盖一条记录"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_features "
+                "(path, size, mtime_ns, content_hash, feature_vector, feature_version, pushed_song_id, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, content_hash,
+                 json.dumps(feature_vector), feature_version, pushed_song_id, time.time())
+            )
+
+    def touch(self, path: str, stat: os.stat_result) -> None:
+        """内容未变,只更新大小和修改时间"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE file_features SET size = ?, mtime_ns = ?, updated_at = ? WHERE path = ?",
+                (stat.st_size, stat.st_mtime_ns, time.time(), path)
+            )
+
+    def mark_pushed(self, pushed: list[tuple[str, str]]) -> None:
+        """
+        标记已成功写入数据库的记录
+
+        Args:
+            pushed: [(文件路径, 歌曲ID)]
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE file_features SET pushed_song_id = ? WHERE path = ?",
+                [(song_id, path) for path, song_id in pushed]
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,125 @@
+"""
+分析流水线分阶段耗时统计
+
+原来只记录一次总耗时,无法判断瓶颈在 CPU (解码/音高)、Supabase 还是序列化。这里:
+- 每个阶段用 span() 计时,累积到按阶段区分的直方图
+- 进程池 worker 内的阶段用 StageTimer 计时,随特征字典返回后由主进程汇总
+- GET /metrics 以 Prometheus 文本格式输出 (不依赖 prometheus_client)
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上界 (秒),覆盖从内存查表到整段分析的量级
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_METRIC = "voicetwin_analysis_stage_seconds"
+
+
+class StageTimer:
+    """
+    单次请求内的阶段计时 (可在 worker 进程中使用,结果是普通字典)
+
+    Attributes:
+        timings: {阶段: 耗时秒数},同一阶段多次计时会累加
+    """
+
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+class StageMetrics:
+    """
+    各阶段耗时直方图
+
+    Args:
+        buckets: 桶上界 (秒,升序)
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # 阶段 -> (各桶计数 (非累积,最后一个为 +Inf), 总和, 次数)
+        self._stages: dict[str, tuple[list[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """记录一次耗时"""
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts, total, count = self._stages.get(stage) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts[index] += 1
+            self._stages[stage] = (counts, total + seconds, count + 1)
+
+    def observe_all(self, timings: dict[str, float]) -> None:
+        """记录 StageTimer 汇总的多个阶段"""
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds)
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """计时上下文,退出时记录 (异常退出同样记录)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """各阶段的次数、总耗时和平均耗时"""
+        with self._lock:
+            return {
+                stage: {'count': count, 'sum': total, 'avg': total / count if count else 0.0}
+                for stage, (_, total, count) in sorted(self._stages.items())
+            }
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文本格式 (exposition format 0.0.4)"""
+        lines = [
+            f"# HELP {STAGE_METRIC} Analysis pipeline stage latency in seconds",
+            f"# TYPE {STAGE_METRIC} histogram"
+        ]
+        with self._lock:
+            stages = sorted((stage, list(counts), total, count) for stage, (counts, total, count) in self._stages.items())
+        for stage, counts, total, count in stages:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{STAGE_METRIC}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{STAGE_METRIC}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{STAGE_METRIC}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{STAGE_METRIC}_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+
+_metrics: StageMetrics | None = None
+
+
+def get_metrics() -> StageMetrics:
+    """
+    获取阶段耗时统计单例
+
+    Returns:
+        StageMetrics 实例
+    """
+    global _metrics
+    if _metrics is None:
+        _metrics = StageMetrics()
+    return _metrics
@@ -0,0 +1,81 @@
+"""
+音高轮廓提取 (向量化版)
+
+将 librosa.piptrack 的输出 (频率 × 帧) 转换为每帧主导音高轮廓:
+- 沿频率轴 argmax 找到每帧能量最大的频点
+- 花式索引一次性取出对应音高
+- 布尔掩码标记有效 (有声) 帧
+
+供 audio_feature_extractor 和 AudioAnalyzer 共用,替代逐帧 Python 循环
+"""
+
+from dataclasses import dataclass
+import numpy as np
+
+
+@dataclass(frozen=True)
+class PitchContour:
+    """
+    音高轮廓及统计量
+
+    Attributes:
+        contour: 每帧主导音高 (Hz),无声帧为 0
+        voiced: 有声帧布尔掩码
+        mean/std/min/max: 有声帧音高统计,无有效音高时为 None
+    """
+    contour: np.ndarray
+    voiced: np.ndarray
+    mean: float | None
+    std: float | None
+    min: float | None
+    max: float | None
+
+    @property
+    def voiced_values(self) -> np.ndarray:
+        """仅包含有声帧的音高序列"""
+        return self.contour[self.voiced]
+
+    @property
+    def voiced_count(self) -> int:
+        """有声帧数量"""
+        return int(np.count_nonzero(self.voiced))
+
+    @property
+    def has_pitch(self) -> bool:
+        """是否检测到有效音高"""
+        return self.mean is not None
+
+
+def extract_pitch_contour(pitches: np.ndarray, magnitudes: np.ndarray) -> PitchContour:
+    """
+    从 piptrack 结果中提取主导音高轮廓
+
+    Args:
+        pitches: piptrack 返回的音高矩阵 (n_freq, n_frames)
+        magnitudes: piptrack 返回的幅度矩阵 (n_freq, n_frames)
+
+    Returns:
+        PitchContour: 音高轮廓和统计量
+    """
+    n_frames = pitches.shape[1]
+    if n_frames == 0 or pitches.shape[0] == 0:
+        empty = np.zeros(n_frames, dtype=pitches.dtype)
+        return PitchContour(empty, empty > 0, None, None, None, None)
+
+    # 每帧能量最大的频点索引,再用花式索引一次取出对应音高
+    index = magnitudes.argmax(axis=0)
+    contour = pitches[index, np.arange(n_frames)]
+    voiced = contour > 0  # 过滤掉0值
+
+    values = contour[voiced]
+    if values.size == 0:
+        return PitchContour(contour, voiced, None, None, None, None)
+
+    return PitchContour(
+        contour=contour,
+        voiced=voiced,
+        mean=float(values.mean()),
+        std=float(values.std()),
+        min=float(values.min()),
+        max=float(values.max())
+    )
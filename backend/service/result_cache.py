@@ -0,0 +1,246 @@
+"""
+分析结果缓存 (按音频内容哈希)
+
+用户经常重复上传同一段录音 (网络重试、前端重复提交),
+命中缓存时直接复用已提取的声学特征和歌手匹配结果,跳过整条 librosa 流水线。
+
+- 缓存键: 特征流水线版本 + 音频内容 SHA-256
+- 一级缓存: 进程内 LRU
+- 二级缓存 (可选): 磁盘 JSON 文件,按总大小淘汰最久未使用的条目
+- 锁只保护内存 LRU 和计数,磁盘读写在锁外进行;请求路径使用 aget / aput,磁盘层放到线程中执行
+- 返回和写入的都是副本,调用方修改结果不会影响缓存
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+def hash_bytes(content: bytes) -> str:
+    """计算音频内容的 SHA-256"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """分块计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AnalysisResultCache:
+    """
+    两级分析结果缓存
+
+    Args:
+        max_entries: 内存 LRU 最大条目数
+        disk_dir: 磁盘缓存目录,None 表示不启用磁盘缓存
+        disk_max_bytes: 磁盘缓存总大小上限
+    """
+
+    def __init__(self, max_entries: int = 512, disk_dir: str | None = None,
+                 disk_max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+
+        self._memory: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        # 磁盘占用统计和淘汰单独加锁,不阻塞内存层
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = 0
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._scan_disk())
+
+    @staticmethod
+    def make_key(content_hash: str, pipeline_version: int | str) -> str:
+        """缓存键 = 流水线版本 + 内容哈希,特征算法变更后旧缓存自动失效"""
+        return f"v{pipeline_version}-{content_hash}"
+
+    # --- 读写 ---
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """
+        读取缓存 (内存 -> 磁盘),磁盘命中会回填内存
+
+        Returns:
+            缓存结果的副本,未命中返回 None
+        """
+        value = self._get_memory(key)
+        if value is not None or not self.disk_dir:
+            return value
+        return self._get_disk(key)
+
+    async def aget(self, key: str) -> dict[str, Any] | None:
+        """get() 的异步版本: 内存命中直接返回,磁盘层在线程中读取,不阻塞事件循环"""
+        value = self._get_memory(key)
+        if value is not None or not self.disk_dir:
+            return value
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        """写入缓存 (内存 + 磁盘)"""
+        with self._lock:
+            self._put_memory(key, copy.deepcopy(value))
+        self._write_disk(key, value)
+
+    async def aput(self, key: str, value: dict[str, Any]) -> None:
+        """put() 的异步版本: 磁盘层在线程中写入"""
+        with self._lock:
+            self._put_memory(key, copy.deepcopy(value))
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, value)
+
+    def stats(self) -> dict[str, Any]:
+        """命中/未命中计数和容量信息"""
+        with self._lock:
+            hits = self._counters['memory_hits'] + self._counters['disk_hits']
+            total = hits + self._counters['misses']
+            return {
+                **self._counters,
+                'hits': hits,
+                'hit_ratio': round(hits / total, 4) if total else 0.0,
+                'memory_entries': len(self._memory),
+                'disk_enabled': bool(self.disk_dir),
+                'disk_bytes': self._disk_bytes
+            }
+
+    # --- 内存层 ---
+
+    def _get_memory(self, key: str) -> dict[str, Any] | None:
+        """内存命中返回副本;未命中且没有磁盘层时计为 miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return copy.deepcopy(self._memory[key])
+            if not self.disk_dir:
+                self._counters['misses'] += 1
+            return None
+
+    def _put_memory(self, key: str, value: dict[str, Any]) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # --- 磁盘层 ---
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _get_disk(self, key: str) -> dict[str, Any] | None:
+        """读取磁盘层 (锁外),命中时回填内存"""
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self._counters['misses'] += 1
+                return None
+            self._counters['disk_hits'] += 1
+            self._put_memory(key, copy.deepcopy(value))
+        return value
+
+    def _read_disk(self, key: str) -> dict[str, Any] | None:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)  # 更新 mtime,作为 LRU 依据
+            return value
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取磁盘缓存失败 key={key}: {str(e)}")
+            return None
+
+    def _write_disk(self, key: str, value: dict[str, Any]) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        # 临时文件名唯一,并发写入同一个键时互不覆盖
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False)
+            new_size = os.path.getsize(tmp_path)
+            with self._disk_lock:
+                old_size = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(tmp_path, path)
+                self._disk_bytes += new_size - old_size
+                over_limit = self._disk_bytes > self.disk_max_bytes
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"写入磁盘缓存失败 key={key}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        if over_limit:
+            with self._disk_lock:
+                self._evict_disk()
+
+    def _scan_disk(self) -> list[tuple[str, int, float]]:
+        """返回 [(路径, 大小, mtime)]"""
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict_disk(self) -> None:
+        """按 mtime 从旧到新删除,直到总大小回到上限的 90% 以下"""
+        target = int(self.disk_max_bytes * 0.9)
+        entries = sorted(self._scan_disk(), key=lambda e: e[2])
+        self._disk_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._disk_bytes -= size
+                with self._lock:
+                    self._counters['evictions'] += 1
+            except OSError:
+                continue
+
+
+_result_cache: AnalysisResultCache | None = None
+
+
+def get_result_cache() -> AnalysisResultCache:
+    """
+    获取分析结果缓存单例 (按配置创建)
+
+    Returns:
+        AnalysisResultCache 实例
+    """
+    global _result_cache
+    if _result_cache is None:
+        from config import get_settings
+        settings = get_settings()
+        _result_cache = AnalysisResultCache(
+            max_entries=settings.result_cache_max_entries,
+            disk_dir=settings.result_cache_dir or None,
+            disk_max_bytes=settings.result_cache_disk_max_mb * 1024 * 1024
+        )
+    return _result_cache
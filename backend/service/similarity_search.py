@@ -0,0 +1,67 @@
+"""
+批量余弦相似度 Top-K 检索
+
+对预先归一化的特征矩阵做一次矩阵-向量乘法得到全部相似度,
+再用 argpartition 选出 Top-K,避免逐首歌曲调用相似度函数。
+"""
+
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    按行 L2 归一化 (零向量保持为零)
+
+    Args:
+        matrix: (n, dim) 特征矩阵
+
+    Returns:
+        float32 归一化矩阵
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def top_k_cosine(normed_matrix: np.ndarray, query: np.ndarray, k: int,
+                 mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    余弦相似度 Top-K 检索
+
+    Args:
+        normed_matrix: 已按行归一化的 (n, dim) 矩阵
+        query: (dim,) 查询向量 (无需归一化)
+        k: 返回数量
+        mask: (n,) 布尔掩码,False 的行不参与排序
+
+    Returns:
+        (下标数组, 相似度数组),按相似度从高到低排列
+    """
+    query = np.asarray(query, dtype=np.float32).ravel()
+    if query.shape[0] != normed_matrix.shape[1]:
+        raise ValueError(f"查询向量维度 {query.shape[0]} 与索引维度 {normed_matrix.shape[1]} 不一致")
+
+    norm = np.linalg.norm(query)
+    if norm == 0 or normed_matrix.shape[0] == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    query = query / norm
+    if mask is None:
+        candidates = np.arange(normed_matrix.shape[0])
+        scores = normed_matrix @ query
+    else:
+        candidates = np.flatnonzero(mask)
+        if candidates.size * 2 < normed_matrix.shape[0]:
+            # 候选较少 (如 ANN 预筛选后) 时只计算候选行
+            scores = normed_matrix[candidates] @ query
+        else:
+            scores = (normed_matrix @ query)[candidates]
+
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    # argpartition 取出 Top-K (无序),再只对这 K 个排序
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return candidates[top], scores[top]
@@ -5,6 +5,7 @@
 """
 
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -161,6 +162,49 @@ SINGER_NAME_TO_ID = {
 SINGER_ID_TO_NAME = {v: k for k, v in SINGER_NAME_TO_ID.items()}
 
 
+# 特征归一化尺度: [音高, 亮度, 响度]
+# NOTE: 必须与 normalize_singer_features / normalize_user_features 保持一致
+FEATURE_SCALE = np.array([500.0, 5000.0, 1.0])  # 人声约80-500Hz, 频谱质心约1000-5000Hz, RMS已在0-1
+
+
+def _build_singer_matrix() -> tuple[list[str], np.ndarray]:
+    """
+    模块导入时构建归一化的歌手特征矩阵
+    
+    Returns:
+        (歌手名称列表, (n_singers, 3) 归一化特征矩阵),两者按行对齐
+    """
+    names = list(SINGER_PROFILES.keys())
+    raw = np.array(
+        [[p['pitch_mean'], p['brightness'], p['energy']] for p in SINGER_PROFILES.values()],
+        dtype=np.float64
+    )
+    return names, raw / FEATURE_SCALE
+
+
+SINGER_NAMES, SINGER_MATRIX = _build_singer_matrix()
+
+
+def match_singers(user_vector, k: int = 1) -> list[tuple[str, float]]:
+    """
+    一次向量化计算用户与所有歌手的欧氏距离,返回最接近的 k 位歌手
+    
+    Args:
+        user_vector: 归一化后的用户特征 [音高, 亮度, 响度] (见 normalize_user_features)
+        k: 返回数量
+        
+    Returns:
+        list: [(歌手名称, 距离)],按距离从小到大排列
+    """
+    distances = np.linalg.norm(SINGER_MATRIX - np.asarray(user_vector, dtype=np.float64), axis=1)
+    k = min(k, len(SINGER_NAMES))
+    if k <= 0:
+        return []
+    top = np.argpartition(distances, k - 1)[:k]
+    top = top[np.argsort(distances[top], kind='stable')]
+    return [(SINGER_NAMES[i], float(distances[i])) for i in top]
+
+
 def get_singer_id(singer_name: str) -> int:
     """
     根据歌手名称获取数据库ID
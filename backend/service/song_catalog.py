@@ -0,0 +1,287 @@
+"""
+歌曲目录索引 (内存常驻)
+
+一次性从数据库加载所有带特征向量的歌曲,构建:
+- 连续的 float32 特征矩阵 (n_songs × dim)
+- 并行的 id / title / artist / cover_url 数组
+
+按 TTL 自动刷新,也可以通过接口显式失效。
+只有当前特征版本 (feature_schema.CURRENT_FEATURE_VERSION) 的向量参与检索。
+目录规模较大且存在离线构建的 IVF 索引时,检索自动切换为近似最近邻;
+按歌手过滤后候选较少,或 IVF 候选不足 k 首时,仍使用精确检索。
+分析流程只查询内存索引,不再每次请求都从 Supabase 拉取全部 feature_vector。
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from typing import Any
+
+import numpy as np
+
+from service.similarity_search import normalize_rows, top_k_cosine
+from service.ann_index import IVFIndex
+from service.feature_schema import CURRENT_FEATURE_VERSION, FEATURE_SPECS, song_feature_version
+
+logger = logging.getLogger(__name__)
+
+
+class SongCatalogIndex:
+    """
+    内存歌曲目录索引
+
+    Args:
+        ttl: 自动刷新间隔 (秒)
+        ann_index_path: IVF 近似索引文件路径,为空表示只用精确检索
+        ann_min_size: 目录规模 (以及过滤后的候选数) 达到该值后才启用近似检索
+        ann_nprobe: 近似检索扫描的列表数 (召回率/延迟旋钮)
+        feature_version: 参与检索的特征向量版本
+    """
+
+    # 刷新失败 (返回空结果) 时,沿用旧数据并在该间隔后重试
+    RETRY_INTERVAL = 30.0
+
+    def __init__(self, ttl: float = 300.0, ann_index_path: str = "",
+                 ann_min_size: int = 5000, ann_nprobe: int = 8,
+                 feature_version: int = CURRENT_FEATURE_VERSION):
+        self.ttl = ttl
+        self.feature_version = feature_version
+        self.ann_index_path = ann_index_path
+        self.ann_min_size = ann_min_size
+        self.ann_nprobe = ann_nprobe
+
+        self.ids = np.empty(0, dtype=object)
+        self.titles = np.empty(0, dtype=object)
+        self.artists = np.empty(0, dtype=object)
+        self.cover_urls = np.empty(0, dtype=object)
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.normed = np.empty((0, 0), dtype=np.float32)
+        self.has_vector = np.empty(0, dtype=bool)
+        self.stale_vectors = 0  # 版本不是 feature_version 的向量数 (等待离线脚本升级)
+
+        self.ann: IVFIndex | None = None
+        self._ann_to_row = np.empty(0, dtype=np.int64)  # ANN 行号 -> 目录行号 (-1 表示不在目录中)
+        self._ann_unindexed = np.empty(0, dtype=bool)   # 目录中尚未进入 ANN 的行,始终参与检索
+        self._ann_mtime: float | None = None
+
+        self._loaded_at: float | None = None
+        self._expires_at = 0.0
+        self._lock: asyncio.Lock | None = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        """特征向量维度"""
+        return self.matrix.shape[1]
+
+    # --- 加载与刷新 ---
+
+    def load(self, songs: list[dict[str, Any]]) -> None:
+        """
+        从歌曲记录构建索引
+
+        NOTE: 只有版本为 feature_version 的向量参与检索,其他版本 (或无法识别) 的歌曲保留元数据,
+        但在 has_vector 中标记为 False
+        """
+        dim = FEATURE_SPECS[self.feature_version].dim
+        versions = Counter()
+
+        matrix = np.zeros((len(songs), dim), dtype=np.float32)
+        has_vector = np.zeros(len(songs), dtype=bool)
+        for i, song in enumerate(songs):
+            version = song_feature_version(song)
+            versions[version] += 1
+            if version == self.feature_version and len(song['feature_vector']) == dim:
+                matrix[i] = song['feature_vector']
+                has_vector[i] = True
+
+        self.ids = np.array([str(song['id']) for song in songs], dtype=object)
+        self.titles = np.array([song.get('title') or '' for song in songs], dtype=object)
+        self.artists = np.array([song.get('artist') or '' for song in songs], dtype=object)
+        self.cover_urls = np.array([song.get('cover_url') for song in songs], dtype=object)
+        self.matrix = matrix
+        self.normed = normalize_rows(matrix)  # 预先归一化,检索时只需一次矩阵乘法
+        self.has_vector = has_vector
+        self.stale_vectors = int(len(songs) - has_vector.sum() - versions[None])
+        self._load_ann_index()
+
+        self._loaded_at = time.time()
+        self._expires_at = self._loaded_at + self.ttl
+        logger.info(
+            f"歌曲目录索引已加载: {len(songs)} 首, 特征版本={self.feature_version}, 维度={dim}, "
+            f"有效向量={int(has_vector.sum())}, 内存={matrix.nbytes / 1024:.1f}KB"
+        )
+        if self.stale_vectors:
+            logger.warning(
+                f"{self.stale_vectors} 首歌曲的特征向量不是版本 {self.feature_version},不参与检索 "
+                f"(版本分布: {dict(versions)}),请运行 scripts/extract_features.py 升级"
+            )
+
+    def _load_ann_index(self) -> None:
+        """加载 (或在文件更新后重新加载) IVF 索引,并建立与目录行号的映射"""
+        if not self.ann_index_path or len(self) < self.ann_min_size:
+            self.ann = None
+            return
+        try:
+            mtime = os.path.getmtime(self.ann_index_path)
+        except OSError:
+            self.ann = None
+            return
+        if self.ann is None or mtime != self._ann_mtime:
+            self.ann = IVFIndex.load_or_empty(self.ann_index_path)
+            self._ann_mtime = mtime
+        if len(self.ann) == 0 or self.ann.dim != self.dim:
+            logger.warning("IVF 索引为空或维度与目录不一致,使用精确检索")
+            self.ann = None
+            return
+
+        row_of = {song_id: row for row, song_id in enumerate(self.ids)}
+        self._ann_to_row = np.array([row_of.get(song_id, -1) for song_id in self.ann.ids], dtype=np.int64)
+        self._ann_unindexed = self.has_vector.copy()
+        self._ann_unindexed[self._ann_to_row[self._ann_to_row >= 0]] = False
+        logger.info(f"IVF 近似索引已启用: {len(self.ann)} 个向量, nprobe={self.ann_nprobe}")
+
+    def is_stale(self) -> bool:
+        """是否需要刷新"""
+        return time.time() >= self._expires_at
+
+    def invalidate(self) -> None:
+        """显式失效,下次查询时重新加载"""
+        self._expires_at = 0.0
+        logger.info("歌曲目录索引已失效")
+
+    async def ensure_fresh(self, song_repo) -> None:
+        """
+        过期时从数据库重新加载 (并发请求只触发一次加载)
+
+        Args:
+            song_repo: SongRepository 实例 (异步)
+        """
+        if not self.is_stale():
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.is_stale():
+                return
+            songs = await song_repo.get_all_with_features()
+            if not songs and len(self) > 0:
+                # 仓储层在网络错误时返回空列表,此时保留旧索引
+                logger.warning("歌曲目录刷新返回空结果,沿用旧索引")
+                self._expires_at = time.time() + self.RETRY_INTERVAL
+                return
+            self.load(songs)
+
+    # --- 查询 ---
+
+    def rows(self, indices: np.ndarray) -> list[dict[str, Any]]:
+        """按下标取出歌曲元数据"""
+        return [
+            {
+                'id': self.ids[i],
+                'title': self.titles[i],
+                'artist': self.artists[i],
+                'cover_url': self.cover_urls[i]
+            }
+            for i in indices
+        ]
+
+    def filter_by_artist(self, artist: str, same: bool = True, limit: int = 5) -> list[dict[str, Any]]:
+        """
+        按歌手筛选歌曲
+
+        Args:
+            artist: 歌手名称
+            same: True=该歌手的歌曲, False=其他歌手的歌曲
+            limit: 返回数量上限
+        """
+        mask = self.artists == artist
+        if not same:
+            mask = ~mask
+        return self.rows(np.flatnonzero(mask)[:limit])
+
+    def search(self, query_vector, k: int = 5, artist: str | None = None,
+               exclude_artist: str | None = None, feature_version: int | None = None) -> list[dict[str, Any]]:
+        """
+        按余弦相似度检索最相似的歌曲
+
+        Args:
+            query_vector: 查询向量 (如 extract_mfcc_feature_vector 输出的 60 维向量)
+            k: 返回数量
+            artist: 只在该歌手的歌曲中检索
+            exclude_artist: 排除该歌手的歌曲
+            feature_version: 查询向量的版本,为空表示当前版本
+
+        Returns:
+            歌曲元数据列表,每项附带 score (余弦相似度),按相似度降序
+
+        Raises:
+            ValueError: 查询向量版本或维度与索引不一致
+        """
+        if feature_version is not None and feature_version != self.feature_version:
+            raise ValueError(f"查询向量版本 {feature_version} 与目录索引版本 {self.feature_version} 不一致")
+        mask = self.has_vector.copy()
+        if artist is not None:
+            mask &= self.artists == artist
+        if exclude_artist is not None:
+            mask &= self.artists != exclude_artist
+
+        # 过滤后候选很少 (如只检索某个歌手的歌曲) 时精确检索本身就很快,IVF 预筛选只会漏掉结果
+        if self.ann is not None and mask.sum() >= self.ann_min_size:
+            # 近似检索: 只保留 IVF 探测到的候选行 + 尚未建索引的行
+            query = np.asarray(query_vector, dtype=np.float32)
+            rows = self._ann_to_row[self.ann.candidates(query / (np.linalg.norm(query) or 1.0), self.ann_nprobe)]
+            ann_mask = self._ann_unindexed.copy()
+            ann_mask[rows[rows >= 0]] = True
+            ann_mask &= mask
+            # 探测到的列表里符合过滤条件的歌曲不足 k 首时退回精确检索
+            if ann_mask.sum() >= k:
+                mask = ann_mask
+
+        indices, scores = top_k_cosine(self.normed, query_vector, k, mask)
+        results = self.rows(indices)
+        for row, score in zip(results, scores):
+            row['score'] = float(score)
+        return results
+
+    def stats(self) -> dict[str, Any]:
+        """索引状态"""
+        return {
+            'songs': len(self),
+            'dim': self.dim,
+            'feature_version': self.feature_version,
+            'with_vector': int(self.has_vector.sum()),
+            'stale_vectors': self.stale_vectors,
+            'matrix_bytes': int(self.matrix.nbytes),
+            'ann_enabled': self.ann is not None,
+            'ann_nprobe': self.ann_nprobe,
+            'loaded_at': self._loaded_at,
+            'stale': self.is_stale()
+        }
+
+
+_song_catalog: SongCatalogIndex | None = None
+
+
+def get_song_catalog() -> SongCatalogIndex:
+    """
+    获取歌曲目录索引单例 (按配置创建)
+
+    Returns:
+        SongCatalogIndex 实例
+    """
+    global _song_catalog
+    if _song_catalog is None:
+        from config import get_settings
+        settings = get_settings()
+        _song_catalog = SongCatalogIndex(
+            ttl=settings.song_catalog_ttl_s,
+            ann_index_path=settings.ann_index_path,
+            ann_min_size=settings.ann_min_catalog_size,
+            ann_nprobe=settings.ann_nprobe
+        )
+    return _song_catalog
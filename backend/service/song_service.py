@@ -1,6 +1,7 @@
-from supabase import Client
+from supabase import AsyncClient
 from repository.song_repo import SongRepository, FavoriteRepository
 from schema.song import SongResponse, FavoriteToggleResponse
+from service.user_stats_cache import get_user_stats_cache
 import logging
 import random
 
@@ -13,23 +14,23 @@ class SongService:
     处理歌曲查询、推荐和收藏功能
     """
     
-    def __init__(self, db: Client):
+    def __init__(self, db: AsyncClient):
         self.song_repo = SongRepository(db)
         self.favorite_repo = FavoriteRepository(db)
     
-    def get_all_songs(self, limit: int = 100) -> list[SongResponse]:
+    async def get_all_songs(self, limit: int = 100) -> list[SongResponse]:
         """获取所有歌曲"""
-        songs = self.song_repo.get_all(limit)
+        songs = await self.song_repo.get_all(limit)
         return [SongResponse(**song) for song in songs]
     
-    def get_recommended_songs(self, singer_id: str, analysis_score: int = None) -> list[SongResponse]:
+    async def get_recommended_songs(self, singer_id: str, analysis_score: int = None) -> list[SongResponse]:
         """基于匹配歌手推荐歌曲"""
-        singer_songs = self.song_repo.get_by_singer(singer_id)
+        singer_songs = await self.song_repo.get_by_singer(singer_id)
         
         if singer_songs:
             songs = [SongResponse(**song) for song in singer_songs]
         else:
-            all_songs = self.song_repo.get_all(20)
+            all_songs = await self.song_repo.get_all(20)
             songs = [SongResponse(**song) for song in all_songs]
         
         if analysis_score and analysis_score >= 85:
@@ -45,20 +46,17 @@ class SongService:
         logger.info(f"推荐了 {len(recommended)} 首歌曲给歌手 {singer_id}")
         return recommended if recommended else songs[:3]
     
-    def toggle_favorite(self, user_id: str, song_id: str) -> FavoriteToggleResponse:
+    async def toggle_favorite(self, user_id: str, song_id: str) -> FavoriteToggleResponse:
         """
         ✅ 优化版：切换收藏状态
-        利用 Repo 层的 toggle_favorite 方法简化逻辑
+        Repo 层的 toggle_favorite 在一次数据库往返内完成歌曲校验和切换
         """
         try:
-            # 1. 检查歌曲是否存在
-            song = self.song_repo.get_by_id(song_id)
-            if not song:
+            # is_favorited = True (变红/收藏成功), False (变灰/取消收藏), None (歌曲不存在)
+            is_favorited = await self.favorite_repo.toggle_favorite(user_id, song_id)
+            if is_favorited is None:
                 raise ValueError(f"歌曲不存在: {song_id}")
-            
-            # 2. 调用 Repo 层的一键切换方法
-            # is_favorited = True (变红/收藏成功), False (变灰/取消收藏)
-            is_favorited = self.favorite_repo.toggle_favorite(user_id, song_id)
+            get_user_stats_cache().invalidate(user_id)  # 收藏数量已变化
             
             status_msg = "收藏成功" if is_favorited else "已取消收藏"
             logger.info(f"✅ {status_msg} user_id={user_id}, song_id={song_id}")
@@ -75,10 +73,10 @@ class SongService:
             logger.error(f"❌ 收藏操作异常: {str(e)}", exc_info=True)
             raise Exception(f"收藏操作失败: {str(e)}")
     
-    def get_user_favorites(self, user_id: str) -> list[SongResponse]:
+    async def get_user_favorites(self, user_id: str) -> list[SongResponse]:
         """获取用户的收藏列表"""
         try:
-            favorites = self.favorite_repo.get_user_favorites(user_id)
+            favorites = await self.favorite_repo.get_user_favorites(user_id)
             songs = []
             for favorite in favorites:
                 song_data = favorite.get('songs')
@@ -90,10 +88,10 @@ class SongService:
             logger.error(f"❌ 获取用户收藏失败: {str(e)}", exc_info=True)
             return []
     
-    def check_is_favorited(self, user_id: str, song_id: str) -> bool:
+    async def check_is_favorited(self, user_id: str, song_id: str) -> bool:
         """检查歌曲是否已被用户收藏"""
         try:
-            return self.favorite_repo.check_favorite(user_id, song_id)
+            return await self.favorite_repo.check_favorite(user_id, song_id)
         except Exception as e:
             logger.error(f"❌ 检查收藏状态失败: {str(e)}")
             return False
\ No newline at end of file
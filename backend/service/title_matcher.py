@@ -0,0 +1,248 @@
+"""
+文件名 -> 歌曲 匹配索引 (Aho-Corasick)
+
+离线特征提取需要把本地音频文件名对应到数据库歌曲。逐首歌做子串判断是
+O(文件数 × 歌曲数),且第一个碰巧命中的短歌名会"抢走"匹配 (如 "晴天" 抢走 "晴天娃娃")。
+这里把所有规范化后的歌名构建为 Aho-Corasick 自动机,每个文件名只需扫描一遍:
+- 同一文件名命中多首歌时按 (歌手是否出现, 是否整段匹配, 歌名长度) 排序
+- 被更长命中完全覆盖的短歌名降权
+- 过短的歌名 (如 "爱") 在任意文件名中都可能出现,必须整段匹配或歌手也出现才自动匹配,否则视为歧义
+- 排名最高的候选并列时视为歧义,不自动匹配,写入报告供人工确认
+"""
+
+import json
+import logging
+import re
+import unicodedata
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+# 文件名中常见的 "歌手 - 歌名" 分隔符
+_SEGMENT_SPLIT = re.compile(r'\s*(?:-|–|—|_|\||·)\s*')
+# 括号内的版本说明 (Live)、[伴奏]、（女声版）等
+_BRACKETS = re.compile(r'[\(\[（【][^\)\]）】]*[\)\]）】]')
+# 多歌手分隔符
+_ARTIST_SPLIT = re.compile(r'\s*(?:/|&|、|,|，|;|；|\bfeat\.?\b|\bft\.?\b)\s*', re.IGNORECASE)
+
+# 低于该长度的歌名需要整段匹配或歌手命中才能自动匹配 (含 CJK 字符的歌名 / 其他歌名)
+MIN_CJK_TITLE_LENGTH = 2
+MIN_LATIN_TITLE_LENGTH = 3
+
+
+def normalize_title(text: str | None) -> str:
+    """
+    规范化歌名/文件名: 全半角统一、大小写折叠、去掉空白和标点
+
+    Returns:
+        只包含字母、数字和 CJK 字符的字符串
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return ''.join(ch for ch in text if ch.isalnum())
+
+
+def is_short_title(title: str) -> bool:
+    """规范化后的歌名是否过短,容易在无关文件名中偶然出现"""
+    has_cjk = any(unicodedata.east_asian_width(ch) in ('W', 'F') for ch in title)
+    return len(title) < (MIN_CJK_TITLE_LENGTH if has_cjk else MIN_LATIN_TITLE_LENGTH)
+
+
+@dataclass(frozen=True)
+class MatchCandidate:
+    """单个候选歌曲"""
+    song: dict[str, Any]
+    artist_matched: bool
+    segment_matched: bool
+    covered: bool
+    title_length: int
+    short_title: bool = False
+
+    @property
+    def score(self) -> tuple:
+        return (self.artist_matched, not self.covered, self.segment_matched, self.title_length)
+
+    @property
+    def confident(self) -> bool:
+        """短歌名只有整段匹配或歌手命中时才可信"""
+        return not self.short_title or self.segment_matched or self.artist_matched
+
+
+@dataclass
+class MatchResult:
+    """
+    单个文件名的匹配结果
+
+    Attributes:
+        filename: 原始文件名 (不含扩展名)
+        song: 最终匹配的歌曲,未命中或歧义时为 None
+        candidates: 按得分从高到低排列的候选
+        ambiguous: 排名最高的候选并列,或只是偶然命中的短歌名
+    """
+    filename: str
+    song: dict[str, Any] | None = None
+    candidates: list[MatchCandidate] = field(default_factory=list)
+    ambiguous: bool = False
+
+
+class TitleMatcher:
+    """
+    基于 Aho-Corasick 自动机的歌名匹配器
+
+    Args:
+        songs: 数据库歌曲记录,需包含 title,可选 artist
+    """
+
+    def __init__(self, songs: Iterable[dict[str, Any]]):
+        # 节点 0 为根;每个节点: 转移表、失败指针、以该节点结尾的歌名
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[str]] = [[]]
+        self._songs_by_title: dict[str, list[dict[str, Any]]] = {}
+        self._artists: dict[int, list[str]] = {}
+
+        for song in songs:
+            title = normalize_title(song.get('title'))
+            if not title:
+                continue
+            if title not in self._songs_by_title:
+                self._songs_by_title[title] = []
+                self._insert(title)
+            self._songs_by_title[title].append(song)
+            self._artists[id(song)] = [
+                a for a in (normalize_title(part) for part in _ARTIST_SPLIT.split(song.get('artist') or '')) if a
+            ]
+        self._build_failure_links()
+        logger.info(f"歌名匹配索引构建完成: {len(self._songs_by_title)} 个歌名, {len(self._goto)} 个节点")
+
+    def __len__(self) -> int:
+        return len(self._songs_by_title)
+
+    def _insert(self, title: str) -> None:
+        node = 0
+        for ch in title:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = nxt
+        self._output[node].append(title)
+
+    def _build_failure_links(self) -> None:
+        """BFS 计算失败指针,并把失败链上的输出合并到当前节点"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+                queue.append(child)
+
+    def find_titles(self, text: str) -> list[tuple[int, str]]:
+        """
+        扫描规范化后的文本,返回所有命中的歌名
+
+        Returns:
+            [(起始位置, 歌名)]
+        """
+        hits = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for title in self._output[node]:
+                hits.append((i - len(title) + 1, title))
+        return hits
+
+    def match(self, filename: str) -> MatchResult:
+        """
+        匹配单个文件名
+
+        Args:
+            filename: 文件名 (不含扩展名)
+
+        Returns:
+            MatchResult
+        """
+        result = MatchResult(filename=filename)
+        text = normalize_title(filename)
+        hits = self.find_titles(text)
+        if not hits:
+            return result
+
+        segments = {normalize_title(seg) for seg in _SEGMENT_SPLIT.split(_BRACKETS.sub('', filename))}
+        spans = [(start, start + len(title)) for start, title in hits]
+        seen_titles = set()
+        for start, title in hits:
+            if title in seen_titles:
+                continue
+            seen_titles.add(title)
+            end = start + len(title)
+            covered = any(s <= start and end <= e and (e - s) > len(title) for s, e in spans)
+            for song in self._songs_by_title[title]:
+                result.candidates.append(MatchCandidate(
+                    song=song,
+                    artist_matched=any(a in text for a in self._artists[id(song)]),
+                    segment_matched=title in segments,
+                    covered=covered,
+                    title_length=len(title),
+                    short_title=is_short_title(title)
+                ))
+
+        result.candidates.sort(key=lambda c: c.score, reverse=True)
+        top = result.candidates[0]
+        tied = len(result.candidates) > 1 and result.candidates[1].score == top.score
+        if tied or not top.confident:
+            result.ambiguous = True
+        else:
+            result.song = top.song
+        return result
+
+    def match_all(self, filenames: Iterable[str]) -> dict[str, MatchResult]:
+        """批量匹配,返回 {文件名: MatchResult}"""
+        return {name: self.match(name) for name in filenames}
+
+
+def write_ambiguity_report(results: Iterable[MatchResult], path: str, max_candidates: int = 5) -> int:
+    """
+    把歧义匹配写入 JSON 报告
+
+    Args:
+        results: 匹配结果
+        path: 报告文件路径
+        max_candidates: 每个文件最多列出的候选数
+
+    Returns:
+        报告中的歧义文件数
+    """
+    entries = [
+        {
+            'filename': r.filename,
+            'candidates': [
+                {
+                    'id': c.song.get('id'),
+                    'title': c.song.get('title'),
+                    'artist': c.song.get('artist'),
+                    'artist_matched': c.artist_matched,
+                    'segment_matched': c.segment_matched,
+                    'covered': c.covered,
+                    'short_title': c.short_title
+                }
+                for c in r.candidates[:max_candidates]
+            ]
+        }
+        for r in results if r.ambiguous
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    return len(entries)
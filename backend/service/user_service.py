@@ -1,7 +1,9 @@
-from supabase import Client
+from supabase import AsyncClient
 from repository.user_repo import UserRepository
 from schema.user import UserCreate, UserUpdate, UserResponse, UserStats
+from service.user_stats_cache import get_user_stats_cache
 from typing import Any
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,11 +16,11 @@ class UserService:
     NOTE: Supabase Auth 负责实际的认证，此服务层主要处理用户信息管理
     """
     
-    def __init__(self, db: Client):
+    def __init__(self, db: AsyncClient):
         self.user_repo = UserRepository(db)
         self.db = db
     
-    def get_user_by_auth_id(self, auth_id: str) -> UserResponse | None:
+    async def get_user_by_auth_id(self, auth_id: str) -> UserResponse | None:
         """
         通过 Supabase Auth ID 获取用户信息
         
@@ -28,12 +30,12 @@ class UserService:
         Returns:
             用户响应模型，如果不存在返回 None
         """
-        user_data = self.user_repo.get_by_id(auth_id)
+        user_data = await self.user_repo.get_by_id(auth_id)
         if not user_data:
             return None
         return UserResponse(**user_data)
     
-    def create_user_profile(self, auth_id: str, email: str, username: str) -> UserResponse:
+    async def create_user_profile(self, auth_id: str, email: str, username: str) -> UserResponse:
         """
         创建用户资料
         当用户通过 Supabase Auth 注册后，创建对应的用户资料
@@ -53,11 +55,11 @@ class UserService:
             'level': 1
         }
         
-        created_user = self.user_repo.create(user_data)
+        created_user = await self.user_repo.create(user_data)
         logger.info(f"创建用户资料成功 user_id={auth_id}")
         return UserResponse(**created_user)
     
-    def update_user(self, user_id: str, user_update: UserUpdate) -> UserResponse:
+    async def update_user(self, user_id: str, user_update: UserUpdate) -> UserResponse:
         """
         更新用户信息
         
@@ -73,14 +75,15 @@ class UserService:
         
         if not update_data:
             # 没有需要更新的字段
-            user_data = self.user_repo.get_by_id(user_id)
+            user_data = await self.user_repo.get_by_id(user_id)
             return UserResponse(**user_data)
         
-        updated_user = self.user_repo.update(user_id, update_data)
+        updated_user = await self.user_repo.update(user_id, update_data)
+        get_user_stats_cache().invalidate(user_id)  # 等级等资料可能已变化
         logger.info(f"更新用户信息成功 user_id={user_id}")
         return UserResponse(**updated_user)
     
-    def update_avatar(self, user_id: str, avatar_url: str) -> UserResponse:
+    async def update_avatar(self, user_id: str, avatar_url: str) -> UserResponse:
         """
         更新用户头像
         
@@ -91,11 +94,12 @@ class UserService:
         Returns:
             更新后的用户响应模型
         """
-        updated_user = self.user_repo.update(user_id, {'avatar_url': avatar_url})
+        updated_user = await self.user_repo.update(user_id, {'avatar_url': avatar_url})
+        get_user_stats_cache().invalidate(user_id)
         logger.info(f"更新用户头像成功 user_id={user_id}")
         return UserResponse(**updated_user)
     
-    def get_user_stats(self, user_id: str) -> UserStats:
+    async def get_user_stats(self, user_id: str) -> UserStats:
         """
         获取用户统计信息
         
@@ -104,19 +108,30 @@ class UserService:
             
         Returns:
             用户统计信息
+            
+        NOTE: 结果按 user_id 短时缓存,写入分析记录/收藏/用户资料时失效
         """
-        # 获取用户基本信息
-        user_data = self.user_repo.get_by_id(user_id)
+        stats_cache = get_user_stats_cache()
+        cached = stats_cache.get(user_id)
+        if cached is not None:
+            return cached
+        # 查询期间若有写入使缓存失效,结果不再写回
+        generation = stats_cache.generation(user_id)
+        
+        # 用户信息和两个计数互不依赖,并发查询
+        user_data, analysis_count, saved_songs_count = await asyncio.gather(
+            self.user_repo.get_by_id(user_id),
+            self.user_repo.get_analysis_count(user_id),
+            self.user_repo.get_favorites_count(user_id)
+        )
         if not user_data:
             raise ValueError(f"用户不存在 user_id={user_id}")
         
-        # 获取统计数据
-        analysis_count = self.user_repo.get_analysis_count(user_id)
-        saved_songs_count = self.user_repo.get_favorites_count(user_id)
-        
-        return UserStats(
+        stats = UserStats(
             user_id=user_id,
             analysis_count=analysis_count,
             saved_songs_count=saved_songs_count,
             level=user_data.get('level', 1)
         )
+        stats_cache.put(user_id, stats, generation)
+        return stats
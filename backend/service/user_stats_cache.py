@@ -0,0 +1,117 @@
+"""
+用户统计缓存 (按 user_id,短 TTL)
+
+个人主页每次打开都会请求 /users/{id}/stats,其中两次 exact count 是最贵的读请求,
+而这些数字很少变化:
+- 命中时直接返回,不访问数据库
+- 新增分析记录、切换收藏、更新用户资料时按 user_id 失效
+- 失效时递增该用户的代数,查询前记下代数,写回时代数已变化则丢弃 (避免并发写入后把旧统计写回)
+"""
+
+import logging
+import itertools
+import threading
+import time
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class UserStatsCache:
+    """
+    用户统计 TTL 缓存
+
+    Args:
+        ttl: 条目有效期 (秒)
+        max_entries: 最大条目数,超出时清理过期条目,仍超出则清空
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: dict[str, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'invalidations': 0, 'stale_puts': 0}
+        # user_id -> 最近一次失效的代数 (全局递增),没有记录的用户使用 _generation_floor
+        self._generations: dict[str, int] = {}
+        self._generation_seq = itertools.count(1)
+        self._generation_floor = 0
+
+    def get(self, user_id: str) -> Any | None:
+        """读取未过期的统计,未命中返回 None"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > time.monotonic():
+                self._counters['hits'] += 1
+                return entry[1]
+            self._entries.pop(user_id, None)
+            self._counters['misses'] += 1
+            return None
+
+    def generation(self, user_id: str) -> int:
+        """该用户当前的代数,查询数据库前读取,写回时交给 put()"""
+        with self._lock:
+            return self._generations.get(user_id, self._generation_floor)
+
+    def put(self, user_id: str, value: Any, generation: int | None = None) -> bool:
+        """
+        写入统计
+
+        Args:
+            generation: 查询前读取的代数,期间发生过失效则不写入
+
+        Returns:
+            是否写入
+        """
+        with self._lock:
+            if generation is not None and self._generations.get(user_id, self._generation_floor) != generation:
+                self._counters['stale_puts'] += 1
+                return False
+            if len(self._entries) >= self.max_entries:
+                self._purge_expired()
+            self._entries[user_id] = (time.monotonic() + self.ttl, value)
+            return True
+
+    def invalidate(self, user_id: str) -> None:
+        """该用户的数据发生写入,丢弃缓存"""
+        with self._lock:
+            if len(self._generations) >= self.max_entries:
+                # 清空后抬高基准代数,查询中的请求读到的代数都已过期,写回会被丢弃
+                self._generations.clear()
+                self._generation_floor = next(self._generation_seq)
+            self._generations[user_id] = next(self._generation_seq)
+            if self._entries.pop(user_id, None) is not None:
+                self._counters['invalidations'] += 1
+
+    def stats(self) -> dict[str, Any]:
+        """命中统计"""
+        with self._lock:
+            total = self._counters['hits'] + self._counters['misses']
+            return {
+                **self._counters,
+                'hit_ratio': round(self._counters['hits'] / total, 4) if total else 0.0,
+                'entries': len(self._entries)
+            }
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+
+
+_user_stats_cache: UserStatsCache | None = None
+
+
+def get_user_stats_cache() -> UserStatsCache:
+    """
+    获取用户统计缓存单例 (按配置创建)
+
+    Returns:
+        UserStatsCache 实例
+    """
+    global _user_stats_cache
+    if _user_stats_cache is None:
+        from config import get_settings
+        _user_stats_cache = UserStatsCache(ttl=get_settings().user_stats_cache_ttl_s)
+    return _user_stats_cache
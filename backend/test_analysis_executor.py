@@ -0,0 +1,49 @@
+"""
+测试分析执行器的排队名额和超时
+"""
+import asyncio
+import time
+
+import pytest
+
+from service.analysis_executor import AnalysisExecutor, AnalysisQueueFullError, AnalysisTimeoutError
+
+
+def test_timed_out_task_keeps_slot_until_finished():
+    """超时后任务仍在 worker 中执行,跑完之前新的提交被拒绝"""
+    executor = AnalysisExecutor(mode="thread", max_workers=1, max_pending=1, task_timeout=0.2)
+    executor.start()
+
+    async def scenario():
+        with pytest.raises(AnalysisTimeoutError):
+            await executor.run(time.sleep, 0.6)
+        assert executor.pending == 1
+        with pytest.raises(AnalysisQueueFullError):
+            await executor.run(time.sleep, 0)
+
+        await asyncio.sleep(0.6)
+        assert executor.pending == 0
+        assert await executor.run(pow, 2, 3) == 8
+        assert executor.pending == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+
+def test_slot_released_after_success_and_error():
+    """正常完成或任务抛出异常后立即释放名额"""
+    executor = AnalysisExecutor(mode="thread", max_workers=1, max_pending=1, task_timeout=5)
+    executor.start()
+
+    async def scenario():
+        assert await executor.run(pow, 2, 10) == 1024
+        with pytest.raises(ZeroDivisionError):
+            await executor.run(divmod, 1, 0)
+        assert executor.pending == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
@@ -23,20 +23,20 @@ sf.write(temp_file_path, audio, sample_rate)
 print(f"测试音频: {temp_file_path}")
 
 # 直接调用分析服务
-from database import get_db
+from database import get_async_db
 from service.analysis_service import AnalysisService
 import traceback
 import asyncio
 
 async def test():
     try:
-        db = get_db() 
+        db = await get_async_db()
         service = AnalysisService(db)
         
         print("开始调用analyze_voice...")
         result = await service.analyze_voice(
             user_id="test-user-123",
-            audio_file_path=temp_file_path,
+            audio=temp_file_path,
             audio_filename="test.wav"
         )
         
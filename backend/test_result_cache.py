@@ -0,0 +1,84 @@
+"""
+测试分析结果缓存的 LRU 淘汰和磁盘层
+"""
+import asyncio
+import os
+
+from service.result_cache import AnalysisResultCache
+
+
+def _value(n: int) -> dict:
+    return {'features': {'pitch_mean': float(n), 'padding': 'x' * 200}, 'match': {'singer_name': f"歌手{n}"}}
+
+
+def test_memory_lru_evicts_least_recently_used():
+    """内存层超出上限时淘汰最久未访问的条目"""
+    cache = AnalysisResultCache(max_entries=2)
+    cache.put('a', _value(1))
+    cache.put('b', _value(2))
+    assert cache.get('a') is not None  # a 变为最近使用
+    cache.put('c', _value(3))
+    assert cache.get('b') is None
+    assert cache.get('a')['match']['singer_name'] == "歌手1"
+    assert cache.get('c') is not None
+    stats = cache.stats()
+    assert stats['memory_entries'] == 2
+    assert stats['misses'] == 1
+
+
+def test_get_returns_copy():
+    """修改返回值或写入后的原对象不影响缓存内容"""
+    cache = AnalysisResultCache(max_entries=4)
+    value = _value(1)
+    cache.put('a', value)
+    value['features']['pitch_mean'] = -1.0
+    cache.get('a')['features']['pitch_mean'] = -2.0
+    assert cache.get('a')['features']['pitch_mean'] == 1.0
+
+
+def test_disk_tier_backfills_memory(tmp_path):
+    """内存淘汰后从磁盘命中,并回填内存;新实例可读取已有磁盘缓存"""
+    cache = AnalysisResultCache(max_entries=1, disk_dir=str(tmp_path))
+    cache.put('a', _value(1))
+    cache.put('b', _value(2))
+    assert cache.get('a')['match']['singer_name'] == "歌手1"
+    assert cache.get('a') is not None
+    stats = cache.stats()
+    assert (stats['disk_hits'], stats['memory_hits']) == (1, 1)
+
+    reopened = AnalysisResultCache(max_entries=1, disk_dir=str(tmp_path))
+    assert reopened.stats()['disk_bytes'] == stats['disk_bytes']
+    assert reopened.get('b')['match']['singer_name'] == "歌手2"
+
+
+def test_disk_eviction_removes_oldest_files(tmp_path):
+    """磁盘总大小超过上限时按 mtime 从旧到新删除,直到低于上限的 90%"""
+    cache = AnalysisResultCache(max_entries=1, disk_dir=str(tmp_path / 'cache'), disk_max_bytes=10 ** 9)
+    for n in range(4):
+        cache.put(f"k{n}", _value(n))
+        # 显式设置 mtime,避免同一时钟刻度内写入的文件顺序不确定
+        os.utime(cache._disk_path(f"k{n}"), (1000 + n, 1000 + n))
+    entry_size = os.path.getsize(cache._disk_path('k0'))
+
+    cache.disk_max_bytes = entry_size * 3
+    cache.put('k4', _value(4))
+    remaining = sorted(name[:-5] for name in os.listdir(tmp_path / 'cache'))
+    assert remaining == ['k3', 'k4']
+    stats = cache.stats()
+    assert stats['evictions'] == 3
+    assert stats['disk_bytes'] <= cache.disk_max_bytes * 0.9
+
+
+def test_async_api(tmp_path):
+    """aget / aput 与同步接口行为一致"""
+    cache = AnalysisResultCache(max_entries=1, disk_dir=str(tmp_path))
+
+    async def run():
+        await cache.aput('a', _value(1))
+        await cache.aput('b', _value(2))
+        return await cache.aget('a'), await cache.aget('missing')
+
+    hit, miss = asyncio.run(run())
+    assert hit['match']['singer_name'] == "歌手1"
+    assert miss is None
+    assert cache.stats()['disk_hits'] == 1
@@ -0,0 +1,55 @@
+"""
+测试文件名 -> 歌曲匹配的排序规则
+"""
+from service.title_matcher import TitleMatcher
+
+SONGS = [
+    {'id': 1, 'title': '晴天', 'artist': '周杰伦'},
+    {'id': 2, 'title': '晴天娃娃', 'artist': '王筝'},
+    {'id': 3, 'title': '爱', 'artist': '小虎队'},
+    {'id': 4, 'title': '童话', 'artist': '光良'},
+    {'id': 5, 'title': '童话', 'artist': '王心凌'},
+    {'id': 6, 'title': 'Hi', 'artist': 'Foo'},
+]
+
+matcher = TitleMatcher(SONGS)
+
+
+def test_covered_title_loses_to_longer_hit():
+    """被更长歌名覆盖的短歌名不抢匹配"""
+    result = matcher.match('王筝 - 晴天娃娃')
+    assert result.song['id'] == 2
+    assert not result.ambiguous
+
+
+def test_artist_breaks_tie():
+    """同名歌曲由文件名中的歌手区分"""
+    assert matcher.match('光良 - 童话').song['id'] == 4
+    assert matcher.match('童话 (Live) - 王心凌').song['id'] == 5
+
+
+def test_tie_is_ambiguous():
+    """排名最高的候选并列时不自动匹配"""
+    result = matcher.match('童话')
+    assert result.ambiguous
+    assert result.song is None
+    assert {c.song['id'] for c in result.candidates[:2]} == {4, 5}
+
+
+def test_short_title_needs_segment_or_artist():
+    """单字歌名偶然出现在文件名中时视为歧义"""
+    result = matcher.match('我的爱')
+    assert result.ambiguous
+    assert result.song is None
+    assert matcher.match('小虎队 - 爱').song['id'] == 3
+    assert matcher.match('爱 (Live)').song['id'] == 3
+    assert matcher.match('this').song is None
+    assert matcher.match('Foo - Hi').song['id'] == 6
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_'):
+            func()
+            print(f"✓ {name}")
+    print("\n✅ 所有测试通过！")
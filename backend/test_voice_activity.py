@@ -0,0 +1,63 @@
+"""
+测试人声活动检测 (VAD) 的裁剪和拒绝规则
+"""
+import numpy as np
+import pytest
+
+from service.voice_activity import InsufficientVoiceError, trim_to_voiced
+
+SR = 16000
+
+
+def _singing(seconds: float, amplitude: float = 0.3) -> np.ndarray:
+    """带颤音和音量起伏的谐波信号,模拟连续演唱"""
+    t = np.arange(int(seconds * SR)) / SR
+    f0 = 220 * (1 + 0.01 * np.sin(2 * np.pi * 5 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / SR
+    y = sum(np.sin(k * phase) / k for k in (1, 2, 3))
+    envelope = 0.75 + 0.25 * np.sin(2 * np.pi * 0.5 * t)
+    return (y * envelope * amplitude / 1.5).astype(np.float32)
+
+
+def test_continuous_singing_is_kept_whole():
+    """没有静音段的录音整段保留"""
+    y = _singing(10)
+    activity = trim_to_voiced(y, SR)
+    assert activity.voiced_ratio == 1.0
+    assert len(activity.y) == len(y)
+
+
+def test_steady_sine_is_kept():
+    """能量完全平稳的正弦 (test_analyze 使用的信号) 不会被拒绝"""
+    t = np.arange(3 * SR) / SR
+    y = (np.sin(2 * np.pi * 440 * t) * 0.3).astype(np.float32)
+    assert trim_to_voiced(y, SR).voiced_seconds == pytest.approx(3.0, abs=0.05)
+
+
+def test_leading_and_trailing_silence_are_trimmed():
+    """首尾静音和底噪被裁掉,只保留演唱片段"""
+    rng = np.random.default_rng(0)
+    for lead in (0.5, 1.0, 2.0):
+        noise = lambda seconds: (rng.standard_normal(int(seconds * SR)) * 0.002).astype(np.float32)
+        y = np.concatenate([noise(lead), _singing(6), noise(1.0)])
+        activity = trim_to_voiced(y, SR)
+        # hangover 会在片段两端多保留几帧
+        assert activity.voiced_seconds == pytest.approx(6.0, abs=0.2)
+
+
+def test_near_silent_clip_is_rejected():
+    """几乎无声的录音被拒绝"""
+    rng = np.random.default_rng(0)
+    y = (rng.standard_normal(10 * SR) * 5e-4).astype(np.float32)
+    with pytest.raises(InsufficientVoiceError):
+        trim_to_voiced(y, SR)
+    with pytest.raises(InsufficientVoiceError):
+        trim_to_voiced(np.zeros(10 * SR, dtype=np.float32), SR)
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_'):
+            func()
+            print(f"✓ {name}")
+    print("\n✅ 所有测试通过！")